@@ -5,7 +5,9 @@ import sys
 from pprint import pprint
 
 from backupZ.backups_manager import BackupsManager
+from backupZ.config_cache import ConfigCache
 from backupZ.config_parser import ConfigParser
+from backupZ.config_watcher import ConfigWatcher
 from backupZ.patterns.singleton import Singleton
 
 
@@ -14,26 +16,84 @@ class App(Singleton):
         self._current_directory = os.path.dirname(os.path.abspath(sys.argv[0]))
         self._parser = ConfigParser()
         self._backups_manager = BackupsManager()
+        self._envs_dirs = []
         self.__parse_arguments()
+        self._configs_dir = self.args.config_dir or f"{self._current_directory}/configs"
 
     def __parse_arguments(self):
         parser = argparse.ArgumentParser()
 
         parser.add_argument("-cd", "--config-dir", help="Путь к папке конфигов", default="")
+        parser.add_argument("-mj", "--max-jobs", help="Сколько бэкапов может выполняться одновременно", type=int,
+                            default=2)
+        parser.add_argument("--no-config-cache", help="Не использовать снимок разобранной конфигурации",
+                            action="store_true")
+        parser.add_argument("-w", "--watch", help="Применять изменения конфигов на лету, без перезапуска",
+                            action="store_true")
+        parser.add_argument("--audit", help="Проверить все сохранённые бэкапы по контрольным суммам хранилищ и выйти",
+                            action="store_true")
+        parser.add_argument("--catch-up", help="Что делать с пропущенными запусками после рестарта",
+                            choices=["once", "skip"], default="once")
+        parser.add_argument("--device-jobs", help="Сколько бэкапов могут одновременно читать один диск", type=int,
+                            default=1)
+        parser.add_argument("--run-now", help="Один раз выполнить все бэкапы и выйти", action="store_true")
+        parser.add_argument("--restore", help="Восстановить архив с этим именем и выйти", metavar="ARCHIVE")
+        parser.add_argument("--restore-to", help="Куда восстанавливать", default="./restore")
+        parser.add_argument("--restore-path", help="Восстановить только этот файл или папку архива (можно несколько раз)",
+                            action="append")
+        parser.add_argument("--restore-storage", help="Из какого хранилища восстанавливать")
+        parser.add_argument("--restore-workers", help="Сколько файлов и диапазонов качать одновременно", type=int,
+                            default=8)
+        parser.add_argument("--queue", help="Общая очередь запусков (файл SQLite, можно на сетевой папке): "
+                                            "бэкапы выполняют рабочие процессы этого и других хостов",
+                            metavar="QUEUE_DB")
+        parser.add_argument("--workers", help="Сколько рабочих процессов очереди запустить на этом хосте", type=int,
+                            default=1)
+        parser.add_argument("--no-enqueue", help="Только выполнять задачи из очереди, расписание ведут другие хосты",
+                            action="store_true")
+        parser.add_argument("--metrics-dir", help="Папка textfile collector node_exporter для метрик запусков",
+                            default="")
 
         self.args = parser.parse_args()
 
     def __parse_config(self):
-        self._parser.parse_directory(f"{self._current_directory}/configs")
+        self._load_config(self._parser)
 
         self._config = self._parser.get_config()
         pprint(self._config)
 
+    def _load_config(self, parser):
+        if self.args.no_config_cache:
+            parser.parse_directory(self._configs_dir)
+        else:
+            ConfigCache(f"{self._configs_dir}/.state/config_snapshot.bin").load(parser, self._configs_dir)
+        self._envs_dirs = [envs_dir for dirs in parser.envs_dirs.values() for envs_dir in dirs]
+
+    def _get_envs_dirs(self):
+        """Папки Envs последней разобранной конфигурации: их .env тоже входы конфигурации."""
+        return self._envs_dirs
+
     def _set_parser_variables(self):
-        self._parser.variables = {
+        self._parser.variables = self._get_parser_variables()
+
+    def _get_parser_variables(self):
+        return {
             "OS": platform.system()
         }
 
+    def _reload_config(self):
+        """Перечитывает изменившиеся конфиги и применяет их к работающему менеджеру."""
+        parser = ConfigParser()
+        parser.variables = self._get_parser_variables()
+        self._load_config(parser)
+
+        if parser.errors_exists:
+            print("Изменения конфигурации не применены: исправьте ошибки")
+            return
+
+        self._config = parser.get_config()
+        self._backups_manager.apply_config(self._config)
+
     def main(self):
         self._set_parser_variables()
         self.__parse_config()
@@ -43,6 +103,28 @@ class App(Singleton):
             return
 
         self._backups_manager.set_config(self._config)
+        self._backups_manager.set_state_dir(f"{self._configs_dir}/.state")
+        self._backups_manager.set_scheduling(self.args.max_jobs, self.args.catch_up, self.args.device_jobs)
+        self._backups_manager.set_metrics_dir(self.args.metrics_dir or f"{self._configs_dir}/.state/metrics")
+        if self.args.queue:
+            self._backups_manager.set_queue(self.args.queue, self.args.workers, not self.args.no_enqueue)
+
+        if self.args.audit:
+            self._backups_manager.audit()
+            return
+
+        if self.args.restore:
+            self._backups_manager.restore(self.args.restore, self.args.restore_to, self.args.restore_path,
+                                          self.args.restore_storage, self.args.restore_workers)
+            return
+
+        if self.args.run_now:
+            self._backups_manager.run_all()
+            return
+
+        if self.args.watch:
+            ConfigWatcher(self._configs_dir, self._reload_config, get_envs_dirs=self._get_envs_dirs).start()
+
         self._backups_manager.start_watching_time()
 
 
@@ -0,0 +1,199 @@
+import io
+import queue
+import threading
+
+
+class StreamAborted(Exception):
+    """Поток был прерван читающей или пишущей стороной."""
+    pass
+
+
+class ChunkStreamWriter:
+    """Пишущий конец ChunkStream без tell()/seek().
+
+    zipfile, не найдя tell(), переходит в режим записи в непозиционируемый
+    поток (дескрипторы данных после каждого файла) и не пытается вернуться назад.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, data):
+        return self._stream.write(data)
+
+    def flush(self):
+        pass
+
+
+class ChunkStream(io.RawIOBase):
+    """Ограниченный по памяти поток байтов между архиватором и загрузчиками.
+
+    Пишущая сторона (архиватор) складывает данные в блоки по chunk_size байт,
+    читающая сторона (загрузчик) забирает их через read() или итерацию.
+    Очередь ограничена max_chunks блоками, поэтому при медленной загрузке
+    архиватор блокируется на write() — это и есть обратное давление.
+    """
+
+    _EOF = object()
+
+    def __init__(self, chunk_size=8 * 1024 * 1024, max_chunks=4):
+        super().__init__()
+        self.chunk_size = chunk_size
+        self._queue = queue.Queue(maxsize=max_chunks)
+        self._aborted = threading.Event()
+
+        self._write_buffer = bytearray()
+        self._bytes_written = 0
+
+        self._read_buffer = b""
+        self._read_offset = 0
+        self._bytes_read = 0
+        self._eof = False
+        self._error = None
+
+    # Пишущая сторона
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if self._aborted.is_set():
+            raise StreamAborted("Чтение потока прервано")
+
+        self._write_buffer += data
+        self._bytes_written += len(data)
+
+        while len(self._write_buffer) >= self.chunk_size:
+            chunk = bytes(self._write_buffer[:self.chunk_size])
+            del self._write_buffer[:self.chunk_size]
+            self._put(chunk)
+
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def put_chunk(self, chunk):
+        """Кладёт готовый блок в очередь без копирования."""
+        if self._write_buffer:
+            self._put(bytes(self._write_buffer))
+            self._write_buffer.clear()
+        self._bytes_written += len(chunk)
+        self._put(chunk)
+
+    def finish(self):
+        """Отправляет остаток буфера и признак конца потока."""
+        if self._write_buffer:
+            self._put(bytes(self._write_buffer))
+            self._write_buffer.clear()
+        self._put(self._EOF)
+
+    def fail(self, error):
+        """Передаёт ошибку пишущей стороны читателю."""
+        self._put(error)
+
+    @property
+    def writer(self):
+        return ChunkStreamWriter(self)
+
+    @property
+    def bytes_written(self):
+        return self._bytes_written
+
+    def _put(self, item):
+        while True:
+            if self._aborted.is_set():
+                raise StreamAborted("Чтение потока прервано")
+            try:
+                self._queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    # Читающая сторона
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def tell(self):
+        return self._bytes_read
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        # Клиенты HTTP запоминают позицию перед отправкой и возвращаются к ней;
+        # переход на текущую позицию разрешён, любой другой — нет.
+        if whence == io.SEEK_SET and offset == self._bytes_read:
+            return self._bytes_read
+        if whence == io.SEEK_CUR and offset == 0:
+            return self._bytes_read
+        raise io.UnsupportedOperation("Поток не поддерживает произвольный доступ")
+
+    def next_chunk(self):
+        """Возвращает следующий блок данных или None в конце потока."""
+        if self._read_offset < len(self._read_buffer):
+            chunk = self._read_buffer[self._read_offset:]
+            self._read_buffer = b""
+            self._read_offset = 0
+            self._bytes_read += len(chunk)
+            return chunk
+
+        if self._eof:
+            return None
+
+        item = self._queue.get()
+        if item is self._EOF:
+            self._eof = True
+            return None
+        if isinstance(item, BaseException):
+            self._eof = True
+            self._error = item
+            raise item
+
+        self._bytes_read += len(item)
+        return item
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return b"".join(iter(self.next_chunk, None))
+
+        result = bytearray()
+        while len(result) < size:
+            if self._read_offset >= len(self._read_buffer):
+                if self._eof:
+                    break
+                item = self._queue.get()
+                if item is self._EOF:
+                    self._eof = True
+                    break
+                if isinstance(item, BaseException):
+                    self._eof = True
+                    self._error = item
+                    raise item
+                self._read_buffer = item
+                self._read_offset = 0
+
+            part = self._read_buffer[self._read_offset:self._read_offset + size - len(result)]
+            self._read_offset += len(part)
+            result += part
+
+        self._bytes_read += len(result)
+        return bytes(result)
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def __iter__(self):
+        return iter(self.next_chunk, None)
+
+    def abort(self):
+        """Прерывает поток со стороны читателя, освобождая пишущую сторону."""
+        self._aborted.set()
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
@@ -0,0 +1,55 @@
+import os
+import zlib
+
+from backupZ.archive.zip_stream_writer import ZIP_DEFLATED, ZIP_STORED
+
+# Форматы, которые уже сжаты: deflate их почти не уменьшит
+DEFAULT_STORE_EXTENSIONS = frozenset((
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".txz", ".zst", ".lz4", ".lzma", ".7z", ".rar",
+    ".jar", ".apk", ".war", ".docx", ".xlsx", ".pptx", ".odt", ".ods", ".epub",
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".avif",
+    ".mp3", ".aac", ".m4a", ".ogg", ".opus", ".flac",
+    ".mp4", ".m4v", ".mkv", ".mov", ".avi", ".webm",
+    ".pdf", ".woff", ".woff2",
+))
+
+
+class CodecSelector:
+    """Выбирает для каждого файла архива, сжимать его или хранить как есть.
+
+    Сначала правила по расширению: compress_extensions всегда сжимаются,
+    store_extensions (и уже сжатые форматы из DEFAULT_STORE_EXTENSIONS)
+    хранятся как есть. Остальные файлы проверяются пробным быстрым сжатием
+    первых SAMPLE_SIZE байт: если оно не уменьшило образец хотя бы до
+    incompressible_ratio исходного, файл тоже хранится без сжатия.
+    incompressible_ratio=0 отключает пробу.
+    """
+
+    SAMPLE_SIZE = 64 * 1024
+    MIN_SAMPLE_SIZE = 1024
+
+    def __init__(self, store_extensions=(), compress_extensions=(), incompressible_ratio=0.9):
+        self._compress_extensions = {self._normalize(ext) for ext in compress_extensions}
+        self._store_extensions = (DEFAULT_STORE_EXTENSIONS | {self._normalize(ext) for ext in store_extensions}) \
+            - self._compress_extensions
+        self._incompressible_ratio = incompressible_ratio
+
+    @staticmethod
+    def _normalize(extension):
+        extension = extension.strip().lower()
+        return extension if extension.startswith(".") else f".{extension}"
+
+    def choose(self, arcname, head):
+        """Метод записи (ZIP_DEFLATED или ZIP_STORED) по имени файла и его первому блоку head."""
+        extension = os.path.splitext(arcname)[1].lower()
+        if extension in self._compress_extensions:
+            return ZIP_DEFLATED
+        if extension in self._store_extensions:
+            return ZIP_STORED
+        if not self._incompressible_ratio or len(head) < self.MIN_SAMPLE_SIZE:
+            return ZIP_DEFLATED
+
+        sample = head[:self.SAMPLE_SIZE]
+        if len(zlib.compress(sample, 1)) >= len(sample) * self._incompressible_ratio:
+            return ZIP_STORED
+        return ZIP_DEFLATED
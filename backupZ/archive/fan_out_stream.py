@@ -0,0 +1,48 @@
+from backupZ.archive.chunk_stream import ChunkStream, StreamAborted
+
+
+class FanOutStream:
+    """Раздаёт один поток архива сразу нескольким загрузчикам.
+
+    Каждый блок исходного потока читается один раз и один и тот же объект
+    bytes кладётся в ветку каждого хранилища. Ветки ограничены по размеру,
+    поэтому скорость чтения определяется самым медленным из живых хранилищ.
+    Упавшая ветка (загрузчик вызвал abort()) просто перестаёт получать данные.
+    Если передан digest (ArchiveDigest), контрольные суммы считаются здесь же,
+    без второго чтения архива.
+    """
+
+    def __init__(self, source, branches_count, max_chunks=4, digest=None):
+        self._source = source
+        self._digest = digest
+        self._branches = [ChunkStream(source.chunk_size, max_chunks) for _ in range(branches_count)]
+        self._alive = [True] * branches_count
+
+    @property
+    def branches(self):
+        return self._branches
+
+    def pump(self):
+        """Перекачивает исходный поток в ветки до конца или до отказа всех веток."""
+        try:
+            for chunk in self._source:
+                if self._digest is not None:
+                    self._digest.update(chunk)
+                if not self._send(lambda branch: branch.put_chunk(chunk)):
+                    self._source.abort()
+                    return
+        except Exception as e:
+            self._send(lambda branch: branch.fail(e))
+            return
+
+        self._send(lambda branch: branch.finish())
+
+    def _send(self, action):
+        for index, branch in enumerate(self._branches):
+            if not self._alive[index]:
+                continue
+            try:
+                action(branch)
+            except StreamAborted:
+                self._alive[index] = False
+        return any(self._alive)
@@ -0,0 +1,122 @@
+import errno
+import os
+
+# Блоки нулей, общие для всех читателей: дыры разреженных файлов отдаются ими без чтения и выделения памяти
+_zero_blocks = {}
+
+# Нулевые куски от такого размера write_sparse не пишет, а оставляет дырами
+HOLE_SIZE = 64 * 1024
+
+
+def zero_block(size):
+    block = _zero_blocks.get(size)
+    if block is None:
+        block = _zero_blocks.setdefault(size, bytes(size))
+    return block
+
+
+def is_zero_block(data):
+    return data is _zero_blocks.get(len(data))
+
+
+def write_sparse(file, data, hole_size=HOLE_SIZE):
+    """Пишет данные, пропуская нули: на месте нулевых кусков по hole_size в файле остаются дыры.
+
+    В конце записи нужен file.truncate(размер), иначе файл, который кончается дырой, окажется короче.
+    """
+    view = memoryview(data)
+    for offset in range(0, len(data), hole_size):
+        end = offset + hole_size
+        if end <= len(data) and data.count(0, offset, end) == hole_size:
+            file.seek(hole_size, os.SEEK_CUR)
+        else:
+            file.write(view[offset:end])
+
+
+class LargeFileReader:
+    """Чтение больших файлов (образы ВМ, файлы БД) блоками для архиватора.
+
+    Данные читаются os.pread сразу в объект блока, без промежуточного буфера
+    BufferedReader. Дыры разреженного файла находятся через SEEK_DATA /
+    SEEK_HOLE и не читаются с диска: вместо них отдаётся общий блок нулей
+    (zero_block), так что архиватор может узнать его по is_zero_block и не
+    сжимать заново. Прочитанные страницы сбрасываются из кэша
+    (POSIX_FADV_DONTNEED), чтобы бэкап образа на сотни гигабайт не вытеснял
+    из памяти рабочие данные системы.
+    """
+
+    def __init__(self, path, block_size=1024 * 1024):
+        self._fd = os.open(path, os.O_RDONLY)
+        self._block_size = block_size
+        self._size = os.fstat(self._fd).st_size
+        self._position = 0
+        self._hole_end = 0
+        self._data_end = 0
+        self._sparse = hasattr(os, "SEEK_DATA")
+        self._advise(0, 0, "POSIX_FADV_SEQUENTIAL")
+
+    def _advise(self, offset, length, advice):
+        if hasattr(os, "posix_fadvise"):
+            try:
+                os.posix_fadvise(self._fd, offset, length, getattr(os, advice))
+            except OSError:
+                pass
+
+    def _next_extent(self):
+        """Находит дыру с текущей позиции и участок данных за ней."""
+        self._hole_end = self._position
+        self._data_end = self._size
+        if not self._sparse:
+            return
+        try:
+            self._hole_end = os.lseek(self._fd, self._position, os.SEEK_DATA)
+        except OSError as e:
+            if e.errno == errno.ENXIO:
+                # До конца файла только дыра
+                self._hole_end = self._size
+            else:
+                # ФС не умеет SEEK_DATA - читаем файл целиком
+                self._sparse = False
+            return
+        self._data_end = os.lseek(self._fd, self._hole_end, os.SEEK_HOLE)
+
+    def _zeros(self, length):
+        # Кэшируем только полный блок, чтобы не копить блоки нулей всех размеров
+        return zero_block(length) if length == self._block_size else bytes(length)
+
+    def read(self, size=-1):
+        if size < 0:
+            size = self._block_size
+        if self._position >= self._size:
+            return b""
+        if self._position >= self._data_end:
+            self._next_extent()
+
+        if self._position < self._hole_end:
+            length = min(size, self._hole_end - self._position)
+            self._position += length
+            return self._zeros(length)
+
+        length = min(size, self._data_end - self._position)
+        data = os.pread(self._fd, length, self._position)
+        if not data:
+            # Файл укоротили во время чтения
+            self._size = self._position
+            return b""
+        self._advise(self._position, len(data), "POSIX_FADV_DONTNEED")
+        self._position += len(data)
+        # Выделенные, но нулевые блоки (предразмеченные файлы БД) тоже заменяем общим блоком
+        if len(data) == self._block_size and data == zero_block(len(data)):
+            return zero_block(len(data))
+        return data
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
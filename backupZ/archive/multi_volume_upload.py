@@ -0,0 +1,152 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from backupZ.archive.volume_splitter import VolumeSplitter
+
+INDEX_SUFFIX = ".volumes.json"
+INDEX_VERSION = 1
+
+
+class VolumeTarget:
+    """Хранилище, куда загружаются тома: загрузчик, папка и ограничение на одновременные загрузки."""
+
+    def __init__(self, name, uploader, remote_path, semaphore):
+        self.name = name
+        self.uploader = uploader
+        self.remote_path = remote_path
+        self.semaphore = semaphore
+        self.error = None
+
+
+class MultiVolumeUpload:
+    """Загружает архив томами "<имя>.001", "<имя>.002", ... сразу в несколько хранилищ.
+
+    Тома одного хранилища загружаются параллельно (сколько позволяет его
+    семафор), поэтому один медленный TCP-поток больше не ограничивает
+    скорость, а сбой стоит одного тома, а не всего архива. После всех томов
+    загружается индекс "<имя>.volumes.json" с размерами, MD5 и SHA-256 томов:
+    бэкап считается полным, только если индекс на месте.
+    Если передан metrics (RunMetrics), очистка места и загрузки томов
+    пишутся в фазы cleanup:<хранилище> и upload:<хранилище>.
+    """
+
+    def __init__(self, stream, file_name, volume_size, targets, max_pending=None, spool_dir=None, metrics=None):
+        self._stream = stream
+        self._file_name = file_name
+        self._volume_size = volume_size
+        self._targets = targets
+        self._max_pending = max_pending or 2 * len(targets) + 1
+        self._spool_dir = spool_dir
+        self._metrics = metrics
+        self.volumes = []
+        self.digest = None
+
+    @staticmethod
+    def volume_name(file_name, index):
+        return f"{file_name}.{index:03}"
+
+    @staticmethod
+    def index_name(file_name):
+        return f"{file_name}{INDEX_SUFFIX}"
+
+    def _alive_targets(self):
+        return [target for target in self._targets if target.error is None]
+
+    @contextmanager
+    def _phase(self, name):
+        if self._metrics is None:
+            yield None
+        else:
+            with self._metrics.phase(name) as phase:
+                yield phase
+
+    def _upload(self, target, path, name):
+        if target.error is not None:
+            return
+        try:
+            with target.semaphore:
+                with self._phase(f"upload:{target.name}") as phase:
+                    if phase is not None:
+                        phase.bytes_out = os.path.getsize(path)
+                    target.uploader.upload_volume(path, name, target.remote_path)
+        except Exception as e:
+            if target.error is None:
+                target.error = e
+                print(f"Не удалось загрузить том {name} в хранилище {target.name}: {e}")
+
+    def run(self, expected_size=0):
+        """Возвращает словарь {имя хранилища: исключение или None}."""
+        for target in self._targets:
+            try:
+                with self._phase(f"cleanup:{target.name}"):
+                    target.uploader.prepare_space(expected_size, target.remote_path)
+            except Exception as e:
+                target.error = e
+
+        splitter = VolumeSplitter(self._stream, self._volume_size, self._max_pending, self._spool_dir)
+        volumes = self.volumes
+        try:
+            max_workers = max(1, self._max_pending) * max(1, len(self._targets))
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                for volume in splitter:
+                    targets = self._alive_targets()
+                    if not targets:
+                        splitter.release(volume.path)
+                        self._stream.abort()
+                        break
+
+                    name = self.volume_name(self._file_name, volume.index)
+                    volumes.append(dict(volume.digest.to_dict(), name=name))
+                    self._submit_volume(pool, splitter, volume, name, targets)
+
+            self.digest = splitter.digest.to_dict()
+            if self._alive_targets():
+                self._upload_index(volumes, os.path.join(splitter.spool_dir, "index.json"))
+        except Exception as e:
+            self._stream.abort()
+            for target in self._alive_targets():
+                target.error = e
+        finally:
+            splitter.cleanup()
+
+        return {target.name: target.error for target in self._targets}
+
+    def _submit_volume(self, pool, splitter, volume, name, targets):
+        # Том удаляется с диска, когда его загрузили (или не смогли) все хранилища
+        remaining = [len(targets)]
+        lock = threading.Lock()
+
+        def upload(target):
+            try:
+                self._upload(target, volume.path, name)
+            finally:
+                with lock:
+                    remaining[0] -= 1
+                    done = remaining[0] == 0
+                if done:
+                    splitter.release(volume.path)
+
+        for target in targets:
+            pool.submit(upload, target)
+
+    def _upload_index(self, volumes, index_file):
+        index = {
+            "version": INDEX_VERSION,
+            "name": self._file_name,
+            "volume_size": self._volume_size,
+            "total_size": self.digest["size"],
+            "md5": self.digest["md5"],
+            "sha256": self.digest["sha256"],
+            "volumes": volumes
+        }
+        with open(index_file, 'w') as file:
+            json.dump(index, file, indent=2)
+
+        name = self.index_name(self._file_name)
+        targets = self._alive_targets()
+        with ThreadPoolExecutor(max_workers=len(targets)) as pool:
+            for target in targets:
+                pool.submit(self._upload, target, index_file, name)
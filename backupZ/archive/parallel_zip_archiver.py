@@ -0,0 +1,188 @@
+import os
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from backupZ.archive.large_file_reader import LargeFileReader, is_zero_block, zero_block
+from backupZ.archive.zip_stream_writer import ZIP_DEFLATED, ZIP_STORED, ZipStreamWriter
+
+_DICTIONARY_SIZE = 32 * 1024
+
+
+def compress_block(data, dictionary, level, last):
+    """Сжимает блок в сырой deflate, продолжающий предыдущие блоки (как pigz).
+
+    Окно заполняется последними 32 КБ предыдущего блока, а блок завершается
+    Z_FULL_FLUSH, поэтому склейка результатов — один корректный поток deflate.
+    """
+    if dictionary:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=dictionary)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_FULL_FLUSH)
+
+
+class _Block:
+    def __init__(self, path, arcname, stat, data, dictionary, first, last, method):
+        self.path = path
+        self.arcname = arcname
+        self.stat = stat
+        self.data = data
+        self.dictionary = dictionary
+        self.first = first
+        self.last = last
+        self.method = method
+        self.crc = 0
+        self.file_size = 0
+
+
+class ParallelZipArchiver:
+    """Многоядерная упаковка файлов в стандартный zip.
+
+    Файлы режутся на блоки по block_size, блоки сжимаются в пуле процессов
+    и записываются строго по порядку. Маленькие файлы идут одним блоком,
+    поэтому параллелизм есть и на множестве мелких файлов. В пути находится
+    не больше workers * 2 блоков, так что память ограничена.
+    С throttle (AdaptiveThrottle) чтение замедляется, а число блоков в пути
+    уменьшается, когда система под нагрузкой.
+    При сжатии deflate codec_selector (CodecSelector) по первому блоку файла
+    решает, сжимать ли его: уже сжатые файлы пишутся как есть, мимо пула.
+    Файлы от large_file_size байт читаются LargeFileReader: дыры разреженных
+    файлов не читаются с диска, а блоки нулей сжимаются один раз и дальше
+    берутся из кэша, не попадая в пул.
+    """
+
+    METHODS = {"deflate": ZIP_DEFLATED, "store": ZIP_STORED}
+
+    def __init__(self, method="deflate", level=6, workers=0, block_size=1024 * 1024, throttle=None,
+                 codec_selector=None, large_file_size=64 * 1024 * 1024):
+        if method not in self.METHODS:
+            raise ValueError(f"Неизвестный метод сжатия: {method}")
+        self._method = self.METHODS[method]
+        self._level = level
+        self._workers = workers or os.cpu_count() or 1
+        self._block_size = block_size
+        self._throttle = throttle
+        self._codec_selector = codec_selector
+        self._large_file_size = large_file_size
+        self._zero_compressed = {}
+
+    def _read(self, file):
+        data = file.read(self._block_size)
+        if self._throttle is not None:
+            self._throttle.throttle("read", len(data))
+        return data
+
+    def _max_pending(self):
+        workers = self._workers if self._throttle is None else self._throttle.allowed_workers(self._workers)
+        return workers * 2
+
+    def _open(self, path, stat):
+        # Вместо пути может прийти источник с open() - например вывод команды (ScriptSource)
+        if hasattr(path, "open"):
+            return path.open()
+        if self._large_file_size and stat.st_size >= self._large_file_size:
+            return LargeFileReader(path, self._block_size)
+        return open(path, "rb")
+
+    def _iter_blocks(self, files):
+        for path, arcname, stat in files:
+            try:
+                file = self._open(path, stat)
+            except OSError as e:
+                print(f"Не удалось прочитать файл {path}: {e}")
+                continue
+
+            with file:
+                crc = 0
+                size = 0
+                dictionary = b""
+                data = self._read(file)
+                method = self._method
+                if method == ZIP_DEFLATED and self._codec_selector is not None:
+                    method = self._codec_selector.choose(arcname, data)
+                first = True
+                while True:
+                    next_data = self._read(file) if data else b""
+                    crc = zlib.crc32(data, crc)
+                    size += len(data)
+                    block = _Block(path, arcname, stat, data, dictionary, first, not next_data, method)
+                    if block.last:
+                        block.crc = crc
+                        block.file_size = size
+                    yield block
+                    if block.last:
+                        break
+                    # За блоком нулей окно тоже из нулей: общий объект вместо среза, чтобы узнать его в кэше
+                    dictionary = zero_block(_DICTIONARY_SIZE) if is_zero_block(data) else data[-_DICTIONARY_SIZE:]
+                    data = next_data
+                    first = False
+
+    def _cached_zero_block(self, block):
+        """Сжатый блок нулей из кэша или None, если блок не из нулей.
+
+        Результат compress_block зависит только от данных, окна и признака
+        последнего блока, поэтому для блоков нулей с окном из нулей он один и тот же.
+        """
+        if not is_zero_block(block.data) or (block.dictionary and not is_zero_block(block.dictionary)):
+            return None
+        key = (len(block.data), len(block.dictionary), block.last)
+        compressed = self._zero_compressed.get(key)
+        if compressed is None:
+            compressed = compress_block(block.data, block.dictionary, self._level, block.last)
+            self._zero_compressed[key] = compressed
+        return compressed
+
+    def _write_block(self, writer, block, compressed):
+        if block.first:
+            writer.begin_file(block.arcname, block.stat.st_mtime, block.stat.st_mode, block.method)
+        writer.write_compressed(compressed)
+        if block.last:
+            writer.end_file(block.crc, block.file_size)
+
+    def _write_pending(self, writer, pending):
+        block, future = pending
+        self._write_block(writer, block, block.data if future is None else future.result())
+
+    def write_archive(self, fileobj, files):
+        """Пишет архив из троек (путь на диске или источник с open(), путь в архиве, stat) в файловый объект.
+
+        Возвращает индекс записей архива (ZipStreamWriter.get_index()).
+        """
+        writer = ZipStreamWriter(fileobj)
+
+        if self._method == ZIP_STORED:
+            for block in self._iter_blocks(files):
+                self._write_block(writer, block, block.data)
+        elif self._workers == 1:
+            for block in self._iter_blocks(files):
+                if block.method == ZIP_STORED:
+                    compressed = block.data
+                else:
+                    compressed = self._cached_zero_block(block)
+                    if compressed is None:
+                        compressed = compress_block(block.data, block.dictionary, self._level, block.last)
+                self._write_block(writer, block, compressed)
+        else:
+            with ProcessPoolExecutor(max_workers=self._workers) as pool:
+                pending = deque()
+                for block in self._iter_blocks(files):
+                    compressed = None if block.method == ZIP_STORED else self._cached_zero_block(block)
+                    if block.method == ZIP_STORED:
+                        # Несжимаемый блок не гоняем через пул, но пишем в общем порядке
+                        future = None
+                    elif compressed is not None:
+                        future = None
+                        block.data = compressed
+                    else:
+                        future = pool.submit(compress_block, block.data, block.dictionary, self._level, block.last)
+                        block.data = None
+                    block.dictionary = None
+                    pending.append((block, future))
+                    while len(pending) >= self._max_pending():
+                        self._write_pending(writer, pending.popleft())
+                while pending:
+                    self._write_pending(writer, pending.popleft())
+
+        writer.close()
+        return writer.get_index()
@@ -0,0 +1,103 @@
+import threading
+
+from backupZ.archive.chunk_stream import ChunkStream, StreamAborted
+from backupZ.archive.parallel_zip_archiver import ParallelZipArchiver
+from backupZ.scan.parallel_scanner import ParallelScanner
+from backupZ.throttle.adaptive_throttle import ThrottledWriter
+
+
+def walk_files(source_dir, matcher=None, workers=1):
+    """Возвращает тройки (путь на диске, путь относительно source_dir, stat); при workers=1 в стабильном порядке."""
+    return ParallelScanner(source_dir, matcher, workers).scan()
+
+
+class StreamArchiver:
+    """Упаковывает директорию в zip на лету, без временного файла на диске.
+
+    Архив пишется в ChunkStream из отдельного потока, загрузчик читает его
+    блоками. В памяти одновременно находится не больше max_chunks блоков.
+    Если передан metrics (RunMetrics), обход Dir пишется в фазу scan,
+    а остальное время потока архивации - в фазу compression.
+    throttle (AdaptiveThrottle) замедляет чтение, сжатие и запись архива под нагрузкой.
+    """
+
+    def __init__(self, source_dir, chunk_size=8 * 1024 * 1024, max_chunks=4, compression="deflate",
+                 compresslevel=6, workers=1, scanner=None, metrics=None, sources=None, throttle=None,
+                 codec_selector=None):
+        self._source_dir = source_dir
+        self._scanner = scanner or ParallelScanner(source_dir, workers=1)
+        self._chunk_size = chunk_size
+        self._max_chunks = max_chunks
+        self._metrics = metrics
+        self._sources = list(sources or [])
+        self.index = None
+        self._throttle = throttle
+        self._zip_archiver = ParallelZipArchiver(compression, compresslevel, workers, throttle=throttle,
+                                                 codec_selector=codec_selector)
+
+    def iter_files(self):
+        """Возвращает тройки (путь на диске, путь внутри архива, stat) по мере обхода Dir."""
+        return self._scanner.scan()
+
+    def iter_entries(self):
+        """Файлы Dir, а за ними источники вроде вывода команд (ScriptSource) - в порядке записи в архив."""
+        files = self.iter_files()
+        if self._metrics is not None:
+            files = self._metrics.timed_iter("scan", files, size=lambda entry: entry[2].st_size)
+        try:
+            yield from files
+        finally:
+            files.close()
+        yield from self._sources
+
+    def estimate_size(self):
+        """Оценка сверху размера архива — суммарный размер файлов (по stat из обхода, без лишних запросов).
+
+        Размер вывода команд заранее неизвестен и в оценку не входит.
+        """
+        return sum(stat.st_size for _, _, stat in self.iter_files())
+
+    def open_stream(self):
+        """Запускает архивацию в фоне и возвращает поток с архивом."""
+        stream = ChunkStream(self._chunk_size, self._max_chunks)
+        thread = threading.Thread(target=self._produce, args=(stream,), daemon=True)
+        thread.start()
+        return stream
+
+    def _produce(self, stream):
+        try:
+            if self._metrics is None:
+                self.write_archive(stream.writer)
+            else:
+                self._write_archive_measured(stream)
+            stream.finish()
+        except StreamAborted:
+            pass
+        except Exception as e:
+            try:
+                stream.fail(e)
+            except StreamAborted:
+                pass
+
+    def _write_archive_measured(self, stream):
+        scan_before = self._metrics.get("scan")
+        with self._metrics.phase("compression") as phase:
+            try:
+                self.write_archive(stream.writer)
+            finally:
+                # Обход Dir идёт в этом же потоке: его время вычитается из сжатия
+                scan = self._metrics.get("scan")
+                phase.excluded = scan.get("duration", 0.0) - scan_before.get("duration", 0.0)
+                phase.bytes_in = scan.get("bytes_in", 0) - scan_before.get("bytes_in", 0)
+                phase.bytes_out = stream.bytes_written
+
+    def write_archive(self, fileobj):
+        """Пишет zip-архив директории в произвольный файловый объект; индекс записей остаётся в self.index."""
+        if self._throttle is not None:
+            # Всё, что записано в архив, уходит в хранилища - так ограничивается и отдача
+            fileobj = ThrottledWriter(fileobj, self._throttle, "upload")
+        entries = self.iter_entries()
+        try:
+            self.index = self._zip_archiver.write_archive(fileobj, entries)
+        finally:
+            entries.close()
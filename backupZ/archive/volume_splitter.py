@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import threading
+
+from backupZ.integrity.archive_digest import ArchiveDigest
+
+
+class Volume:
+    def __init__(self, index, path, digest):
+        self.index = index
+        self.path = path
+        self.digest = digest
+
+
+class VolumeSplitter:
+    """Режет поток архива на тома по volume_size байт во временные файлы.
+
+    Контрольные суммы каждого тома и всего архива считаются при записи.
+
+    На диске одновременно лежит не больше max_pending томов: следующий том
+    начинает писаться только после release() одного из предыдущих, так что
+    чтение архива притормаживает вслед за загрузкой.
+    """
+
+    def __init__(self, stream, volume_size, max_pending=2, spool_dir=None, read_size=1024 * 1024):
+        if volume_size <= 0:
+            raise ValueError("Размер тома должен быть больше нуля")
+        self._stream = stream
+        self._volume_size = volume_size
+        self._read_size = read_size
+        self._slots = threading.Semaphore(max_pending)
+        self._spool_dir = tempfile.mkdtemp(prefix="backupZ-volumes-", dir=spool_dir)
+        self.digest = ArchiveDigest()
+
+    @property
+    def spool_dir(self):
+        return self._spool_dir
+
+    def __iter__(self):
+        index = 0
+        pending = b""
+        while True:
+            self._slots.acquire()
+            index += 1
+            path = os.path.join(self._spool_dir, f"{index:03}")
+            digest = ArchiveDigest()
+            with open(path, 'wb') as file:
+                data = pending
+                pending = b""
+                while True:
+                    if data:
+                        file.write(data)
+                        digest.update(data)
+                        self.digest.update(data)
+                    if digest.size >= self._volume_size:
+                        break
+                    data = self._stream.read(min(self._read_size, self._volume_size - digest.size))
+                    if not data:
+                        break
+            size = digest.size
+
+            # Проверяем, не кончился ли поток ровно на границе тома
+            if size == self._volume_size:
+                pending = self._stream.read(min(self._read_size, self._volume_size))
+
+            yield Volume(index, path, digest)
+            if not pending:
+                return
+
+    def release(self, path):
+        """Удаляет загруженный том и даёт место следующему."""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        self._slots.release()
+
+    def cleanup(self):
+        shutil.rmtree(self._spool_dir, ignore_errors=True)
@@ -0,0 +1,142 @@
+import struct
+import time
+
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+
+_ZIP64_LIMIT = 0xFFFFFFFF
+_VERSION_ZIP64 = 45
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+
+
+def _dos_datetime(mtime):
+    t = time.localtime(mtime)
+    year = max(t.tm_year, 1980)
+    dos_date = (year - 1980) << 9 | t.tm_mon << 5 | t.tm_mday
+    dos_time = t.tm_hour << 11 | t.tm_min << 5 | t.tm_sec // 2
+    return dos_date, dos_time
+
+
+class _Entry:
+    def __init__(self, name, method, dos_date, dos_time, mode, offset):
+        self.name = name
+        self.method = method
+        self.dos_date = dos_date
+        self.dos_time = dos_time
+        self.mode = mode
+        self.offset = offset
+        self.mtime = 0
+        self.data_offset = 0
+        self.crc = 0
+        self.compressed_size = 0
+        self.file_size = 0
+
+
+class ZipStreamWriter:
+    """Запись zip-архива в непозиционируемый поток из уже сжатых данных.
+
+    В отличие от zipfile позволяет передать готовый поток deflate, поэтому
+    сжатие может выполняться где угодно (например, в пуле процессов).
+    Размеры и CRC пишутся в дескриптор данных после содержимого файла,
+    все записи сразу оформлены как zip64 — архив читают zipfile, unzip и 7-Zip.
+    """
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self._offset = 0
+        self._entries = []
+        self._current = None
+
+    def _write(self, data):
+        self._fileobj.write(data)
+        self._offset += len(data)
+
+    def begin_file(self, arcname, mtime, mode, method=ZIP_DEFLATED):
+        dos_date, dos_time = _dos_datetime(mtime)
+        name = arcname.replace("\\", "/").encode("utf-8")
+        entry = _Entry(name, method, dos_date, dos_time, mode, self._offset)
+
+        # Размеры неизвестны до конца файла: 0xFFFFFFFF + пустой zip64 extra
+        extra = struct.pack("<HHQQ", 0x0001, 16, 0, 0)
+        header = struct.pack(
+            "<IHHHHHIIIHH", 0x04034b50, _VERSION_ZIP64, _FLAG_DATA_DESCRIPTOR | _FLAG_UTF8, method,
+            dos_time, dos_date, 0, _ZIP64_LIMIT, _ZIP64_LIMIT, len(name), len(extra)
+        )
+        self._write(header + name + extra)
+        entry.mtime = mtime
+        entry.data_offset = self._offset
+        self._current = entry
+
+    def write_compressed(self, data):
+        self._current.compressed_size += len(data)
+        self._write(data)
+
+    def end_file(self, crc, file_size):
+        entry = self._current
+        entry.crc = crc
+        entry.file_size = file_size
+        self._write(struct.pack("<IIQQ", 0x08074b50, crc, entry.compressed_size, file_size))
+        self._entries.append(entry)
+        self._current = None
+
+    def get_index(self):
+        """Записи архива со смещениями сжатых данных - по ним файл достаётся одним запросом диапазона."""
+        return [
+            {
+                "name": entry.name.decode("utf-8"),
+                "offset": entry.offset,
+                "data_offset": entry.data_offset,
+                "compressed_size": entry.compressed_size,
+                "size": entry.file_size,
+                "crc": entry.crc,
+                "method": entry.method,
+                "mtime": entry.mtime,
+                "mode": entry.mode
+            }
+            for entry in self._entries
+        ]
+
+    def close(self):
+        central_directory_offset = self._offset
+        for entry in self._entries:
+            self._write(self._central_directory_record(entry))
+        central_directory_size = self._offset - central_directory_offset
+
+        count = len(self._entries)
+        zip64_end_offset = self._offset
+        self._write(struct.pack(
+            "<IQHHIIQQQQ", 0x06064b50, 44, _VERSION_ZIP64, _VERSION_ZIP64, 0, 0,
+            count, count, central_directory_size, central_directory_offset
+        ))
+        self._write(struct.pack("<IIQI", 0x07064b50, 0, zip64_end_offset, 1))
+        self._write(struct.pack(
+            "<IHHHHIIH", 0x06054b50, 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+            min(central_directory_size, _ZIP64_LIMIT), min(central_directory_offset, _ZIP64_LIMIT), 0
+        ))
+
+    def _central_directory_record(self, entry):
+        extra_values = []
+        file_size = entry.file_size
+        compressed_size = entry.compressed_size
+        offset = entry.offset
+        if file_size >= _ZIP64_LIMIT:
+            extra_values.append(file_size)
+            file_size = _ZIP64_LIMIT
+        if compressed_size >= _ZIP64_LIMIT:
+            extra_values.append(compressed_size)
+            compressed_size = _ZIP64_LIMIT
+        if offset >= _ZIP64_LIMIT:
+            extra_values.append(offset)
+            offset = _ZIP64_LIMIT
+
+        extra = b""
+        if extra_values:
+            extra = struct.pack(f"<HH{len(extra_values)}Q", 0x0001, 8 * len(extra_values), *extra_values)
+
+        return struct.pack(
+            "<IHHHHHHIIIHHHHHII", 0x02014b50, 3 << 8 | _VERSION_ZIP64, _VERSION_ZIP64,
+            _FLAG_DATA_DESCRIPTOR | _FLAG_UTF8, entry.method, entry.dos_time, entry.dos_date,
+            entry.crc, compressed_size, file_size, len(entry.name), len(extra), 0, 0, 0,
+            (entry.mode & 0xFFFF) << 16, offset
+        ) + entry.name + extra
@@ -1,3 +1,5 @@
+import hashlib
+import os
 
 
 class Scripts:
@@ -6,6 +8,78 @@ class Scripts:
         self._before_command = None
         self._after_command = None
         self._script_exit_code = 0
+        self._source_command = None
+        self._source_name = None
+        self._timeout = None
+
+    def set_dir(self, _dir):
+        self._dir = _dir
+
+    def set_before_command(self, command):
+        self._before_command = command
+
+    def set_after_command(self, command):
+        self._after_command = command
+
+    def set_script_exit_code(self, exit_code):
+        self._script_exit_code = exit_code
+
+    def set_source_command(self, command):
+        self._source_command = command
+
+    def set_source_name(self, name):
+        self._source_name = name
+
+    def set_timeout(self, timeout):
+        self._timeout = timeout
+
+    def get_dir(self):
+        return self._dir
+
+    def get_before_command(self):
+        return self._before_command
+
+    def get_after_command(self):
+        return self._after_command
+
+    def get_script_exit_code(self):
+        return self._script_exit_code
+
+    def get_source_command(self):
+        """Команда, чей stdout архивируется под именем SourceName вместо файла из Dir."""
+        return self._source_command
+
+    def get_source_name(self):
+        return self._source_name
+
+    def get_timeout(self):
+        """Ограничение на каждую команду в секундах; None - без ограничения."""
+        return self._timeout
+
+
+class Storage:
+    def __init__(self, name):
+        self._name = name
+        self._dir = None
+        self._params = {}
+
+    def set_dir(self, _dir):
+        self._dir = _dir
+
+    def set_param(self, key, value):
+        self._params[key] = value
+
+    def get_name(self):
+        return self._name
+
+    def get_dir(self):
+        return self._dir
+
+    def get_param(self, key, default=None):
+        return self._params.get(key, default)
+
+    def get_fingerprint(self):
+        return self._name, self._dir, tuple(sorted(self._params.items()))
 
 
 class BackupConfig:
@@ -14,6 +88,19 @@ class BackupConfig:
         self._day = 1
         self._time = None
         self._dir = None
+        self._format = "zip"
+        self._compression = "deflate"
+        self._compression_level = 6
+        self._compression_workers = 0
+        self._volume_size = 0
+        self._includes = []
+        self._excludes = []
+        self._scan_workers = 8
+        self._store_extensions = []
+        self._compress_extensions = []
+        self._incompressible_ratio = 90
+        self._throttle_limits = {}
+        self._throttle_minimum = 10
 
         self._storages = []
         self._scripts = []
@@ -30,10 +117,127 @@ class BackupConfig:
     def set_dir(self, _dir):
         self._dir = _dir
 
+    def set_format(self, _format):
+        self._format = _format
+
+    def set_compression(self, compression):
+        self._compression = compression
+
+    def set_compression_level(self, level):
+        self._compression_level = level
+
+    def set_compression_workers(self, workers):
+        self._compression_workers = workers
+
+    def set_volume_size(self, volume_size):
+        self._volume_size = volume_size
+
+    def add_include(self, pattern):
+        self._includes.append(pattern)
+
+    def add_exclude(self, pattern):
+        self._excludes.append(pattern)
+
+    def set_scan_workers(self, workers):
+        self._scan_workers = workers
+
+    def add_store_extensions(self, extensions):
+        self._store_extensions.extend(extensions)
+
+    def add_compress_extensions(self, extensions):
+        self._compress_extensions.extend(extensions)
+
+    def set_incompressible_ratio(self, percent):
+        self._incompressible_ratio = percent
+
+    def set_throttle_limit(self, key, value):
+        """Порог нагрузки для троттлинга: load, io_pressure или latency."""
+        self._throttle_limits[key] = value
+
+    def set_throttle_minimum(self, percent):
+        self._throttle_minimum = percent
+
     def add_storage(self, storage):
         self._storages.append(storage)
 
     def add_script(self, script):
         self._scripts.append(script)
 
+    def get_id(self):
+        """Стабильный идентификатор блока: не меняется между перезапусками, пока те же Dir и FileName."""
+        key = f"{os.path.abspath(self._dir)}\0{self._filename}"
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+    def get_fingerprint(self):
+        """Все настройки блока: по нему видно, изменился ли блок с тем же get_id()."""
+        settings = {key: value for key, value in vars(self).items() if key not in ("_storages", "_scripts")}
+        return (
+            tuple(sorted((key, repr(value)) for key, value in settings.items())),
+            tuple(storage.get_fingerprint() for storage in self._storages),
+            tuple(repr(vars(script)) for script in self._scripts)
+        )
+
+    def get_filename(self, moment):
+        """Имя файла бэкапа с подставленными датой и временем запуска."""
+        return moment.strftime(self._filename)
+
+    def get_day(self):
+        return self._day
+
+    def get_time(self):
+        return self._time
+
+    def get_dir(self):
+        return self._dir
+
+    def get_format(self):
+        return self._format
+
+    def get_compression(self):
+        return self._compression
+
+    def get_compression_level(self):
+        return self._compression_level
+
+    def get_compression_workers(self):
+        return self._compression_workers
+
+    def get_volume_size(self):
+        """Размер тома в МБ; 0 - архив загружается одним файлом."""
+        return self._volume_size
+
+    def get_includes(self):
+        return self._includes
+
+    def get_excludes(self):
+        return self._excludes
+
+    def get_scan_workers(self):
+        return self._scan_workers
+
+    def get_store_extensions(self):
+        """Расширения файлов, которые кладутся в архив без сжатия (вдобавок к уже сжатым форматам)."""
+        return self._store_extensions
+
+    def get_compress_extensions(self):
+        """Расширения файлов, которые сжимаются всегда, без пробы."""
+        return self._compress_extensions
+
+    def get_incompressible_ratio(self):
+        """Процент: если пробное сжатие начала файла не опустилось ниже него, файл не сжимается; 0 - без пробы."""
+        return self._incompressible_ratio
+
+    def get_throttle_limits(self):
+        """Пороги троттлинга; пустой словарь - бэкап идёт на полной скорости."""
+        return self._throttle_limits
+
+    def get_throttle_minimum(self):
+        """Ниже скольких процентов полной скорости троттлинг не опускается."""
+        return self._throttle_minimum
+
+    def get_storages(self):
+        return self._storages
+
+    def get_scripts(self):
+        return self._scripts
 
@@ -1,20 +1,670 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+from queue import Empty
+
+from backupZ.archive.codec_selector import CodecSelector
+from backupZ.archive.fan_out_stream import FanOutStream
+from backupZ.archive.multi_volume_upload import MultiVolumeUpload, VolumeTarget
+from backupZ.archive.stream_archiver import StreamArchiver
+from backupZ.archive.zip_stream_writer import ZIP_DEFLATED, ZIP_STORED
 from backupZ.create_backup_configs import CreateBackupConfigs
+from backupZ.dedup.chunk_store import ChunkStore
+from backupZ.dedup.dedup_backup import DedupBackup
+from backupZ.index.file_state_index import FileStateIndex
+from backupZ.integrity.archive_digest import ArchiveDigest
+from backupZ.integrity.backup_verifier import BackupVerifier
+from backupZ.integrity.run_manifest import RunManifest
+from backupZ.metrics.run_metrics import RunMetrics
+from backupZ.metrics.run_report import RunReport
+from backupZ.restore.archive_index import ArchiveIndex
+from backupZ.restore.backup_restorer import BackupRestorer
+from backupZ.scan.parallel_scanner import ParallelScanner
+from backupZ.scan.path_matcher import PathMatcher
+from backupZ.scheduler.backup_engine import BackupEngine
+from backupZ.scheduler.backup_scheduler import BackupScheduler
+from backupZ.scheduler.job_queue import JobQueue
+from backupZ.scheduler.job_worker import JobWorker
+from backupZ.scripts.script_runner import ScriptError, ScriptRunner
+from backupZ.storages.storage_registry import StorageRegistry
+from backupZ.throttle.adaptive_throttle import AdaptiveThrottle
 
 
 class BackupsManager:
-    def __init__(self):
+    # Архив мог вырасти с прошлого запуска: место освобождается с запасом
+    ESTIMATE_GROWTH = 1.2
+
+    def __init__(self, default_storage_concurrency=2):
         self._config = None
         self._backup_configs = None
+        self._state_dir = None
+        self._metrics_dir = None
+        self._scheduler = None
+        self._max_concurrent_jobs = 2
+        self._device_jobs = 1
+        self._catch_up_policy = "once"
+        self._queue_path = None
+        self._queue_workers = 0
+        self._enqueue = True
+        self._worker_configs = {}
+
+        self._default_storage_concurrency = default_storage_concurrency
+        self._storage_semaphores = {}
+        self._storage_semaphores_lock = threading.Lock()
 
     def set_config(self, config):
         self._config = config
 
+    def set_state_dir(self, state_dir):
+        """Папка для локального состояния: индексы файлов блоков и время последних запусков."""
+        self._state_dir = state_dir
+
+    def set_metrics_dir(self, metrics_dir):
+        """Папка для файлов <id блока>.prom, которые читает textfile collector node_exporter."""
+        self._metrics_dir = metrics_dir
+
+    def set_scheduling(self, max_concurrent_jobs, catch_up_policy, device_jobs=1):
+        """device_jobs - сколько бэкапов могут одновременно читать один диск."""
+        self._max_concurrent_jobs = max_concurrent_jobs
+        self._catch_up_policy = catch_up_policy
+        self._device_jobs = device_jobs
+
+    def set_queue(self, queue_path, workers=0, enqueue=True):
+        """Режим очереди: наступившие запуски идут в общую очередь queue_path (JobQueue),
+        а выполняют их workers рабочих процессов этого хоста и рабочие других хостов.
+
+        enqueue=False - хост только выполняет задачи, расписание ведут другие.
+        """
+        self._queue_path = queue_path
+        self._queue_workers = workers
+        self._enqueue = enqueue
+
+    def _create_engine(self):
+        return BackupEngine(self._max_concurrent_jobs, self._device_jobs, self._default_storage_concurrency)
+
+    def _open_file_index(self, backup_config):
+        if not self._state_dir:
+            return None
+        return FileStateIndex(os.path.join(self._state_dir, "index", f"{backup_config.get_id()}.sqlite"))
+
     def _create_backup_configs(self):
         cbc = CreateBackupConfigs(self._config)
         self._backup_configs = cbc.create_configs()
 
+    def _create_scanner(self, backup_config, metrics=None):
+        matcher = None
+        if backup_config.get_includes() or backup_config.get_excludes():
+            matcher = PathMatcher(backup_config.get_includes(), backup_config.get_excludes())
+        return ParallelScanner(backup_config.get_dir(), matcher, backup_config.get_scan_workers(), metrics)
+
+    def _create_uploader(self, storage):
+        return StorageRegistry.create_uploader(storage, self._state_dir)
+
+    def _get_storage_concurrency(self, storage):
+        return int(storage.get_param("Concurrency", self._default_storage_concurrency))
+
+    def _get_storage_semaphore(self, storage):
+        """Ограничивает число одновременных загрузок в одно хранилище (директива Concurrency).
+
+        Хранилище определяется блоком целиком (тип, Dir и параметры), а не
+        типом: два <GoogleDrive> с разными аккаунтами или Concurrency получают
+        свои слоты, одинаковые блоки в разных бэкапах - общие.
+        """
+        key = storage.get_fingerprint()
+        with self._storage_semaphores_lock:
+            semaphore = self._storage_semaphores.get(key)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self._get_storage_concurrency(storage))
+                self._storage_semaphores[key] = semaphore
+            return semaphore
+
+    @contextmanager
+    def _storage_slots(self, storages):
+        """Занимает слоты всех хранилищ запуска сразу и в одном порядке (по ключу хранилища) для всех блоков.
+
+        Ветки FanOutStream читают один поток: если бы каждая ветка ждала свой
+        слот уже после старта, блок мог бы держать слот одного хранилища и ждать
+        другого, а соседний блок - наоборот, и оба зависли бы на заполненных очередях.
+        """
+        with ExitStack() as stack:
+            slots = {storage.get_fingerprint(): storage for storage in storages}
+            for key in sorted(slots, key=repr):
+                stack.enter_context(self._get_storage_semaphore(slots[key]))
+            yield
+
+    def _upload_to_storage(self, storage, stream, file_name, expected_size, metrics):
+        try:
+            uploader = self._create_uploader(storage)
+            with metrics.phase(f"cleanup:{storage.get_name()}"):
+                uploader.prepare_space(expected_size, storage.get_dir())
+            with metrics.phase(f"upload:{storage.get_name()}") as phase:
+                try:
+                    uploader.upload_stream_recorded(stream, file_name, storage.get_dir(), expected_size)
+                finally:
+                    phase.bytes_out = stream.tell()
+                    phase.retries = uploader.retries
+        except Exception:
+            stream.abort()
+            raise
+
+    def run_backup(self, backup_config):
+        """Читает Dir блока один раз и параллельно загружает архив во все хранилища.
+
+        Контрольные суммы считаются по ходу загрузки и сверяются с метаданными
+        хранилищ; итог записывается в локальный манифест запуска, а метрики
+        по фазам - в отчёт запуска (JSON и textfile для Prometheus).
+        Возвращает словарь {имя хранилища: исключение или None}.
+        """
+        started = datetime.now()
+        file_name = backup_config.get_filename(started)
+        metrics = RunMetrics(file_name)
+        results = {}
+        try:
+            results = self._run_backup(backup_config, started, file_name, metrics)
+        except Exception as e:
+            results = {storage.get_name(): e for storage in backup_config.get_storages()}
+            raise
+        finally:
+            metrics.finish()
+            self._save_run_report(backup_config, metrics, results)
+        return results
+
+    def _run_backup(self, backup_config, started, file_name, metrics):
+        """Выполняет BeforeCommand блоков <Scripts>, сам бэкап и AfterCommand.
+
+        Если BeforeCommand завершилась не с ScriptExitCode, бэкап отменяется.
+        Вывод SourceCommand архивируется вместе с файлами Dir.
+        """
+        runners = [ScriptRunner(scripts) for scripts in backup_config.get_scripts()]
+        try:
+            with metrics.phase("scripts"):
+                for runner in runners:
+                    runner.run_before()
+        except ScriptError as e:
+            print(f"Бэкап {file_name} отменён: {e}")
+            return {storage.get_name(): e for storage in backup_config.get_storages()}
+
+        throttle = self._create_throttle(backup_config)
+        try:
+            sources = [entry for entry in (runner.get_source_entry() for runner in runners) if entry]
+            if backup_config.get_format() == "dedup" and sources:
+                print(f"Вывод команд SourceCommand не поддерживается форматом dedup, бэкап {file_name} без него")
+            if throttle is not None:
+                throttle.start()
+            if backup_config.get_format() == "dedup":
+                return self._run_dedup_backup(backup_config, os.path.splitext(file_name)[0], metrics, throttle)
+            return self._run_archive_backup(backup_config, started, file_name, metrics, sources, throttle)
+        finally:
+            if throttle is not None:
+                throttle.stop()
+                self._record_throttle_stats(throttle, metrics)
+            with metrics.phase("scripts"):
+                for runner in runners:
+                    try:
+                        runner.run_after()
+                    except ScriptError as e:
+                        print(f"Ошибка после бэкапа {file_name}: {e}")
+
+    def _create_throttle(self, backup_config):
+        if not backup_config.get_throttle_limits():
+            return None
+        return AdaptiveThrottle(
+            backup_config.get_dir(),
+            backup_config.get_throttle_limits(),
+            min_factor=backup_config.get_throttle_minimum() / 100
+        )
+
+    @staticmethod
+    def _record_throttle_stats(throttle, metrics):
+        stats = throttle.get_stats()
+        metrics.set_value("throttle_lowest_factor", stats["lowest_factor"])
+        metrics.set_value("throttle_adjustments", stats["adjustments"])
+        for kind, waited in stats["waited"].items():
+            metrics.record(f"throttle:{kind}", duration=waited)
+
+    def _run_archive_backup(self, backup_config, started, file_name, metrics, sources, throttle):
+        archiver = StreamArchiver(
+            backup_config.get_dir(),
+            compression=backup_config.get_compression(),
+            compresslevel=backup_config.get_compression_level(),
+            workers=backup_config.get_compression_workers(),
+            scanner=self._create_scanner(backup_config),
+            metrics=metrics,
+            sources=sources,
+            throttle=throttle,
+            codec_selector=CodecSelector(
+                backup_config.get_store_extensions(),
+                backup_config.get_compress_extensions(),
+                backup_config.get_incompressible_ratio() / 100
+            )
+        )
+        with metrics.phase("estimate") as phase:
+            expected_size = self._estimate_archive_size(backup_config, archiver)
+            phase.bytes_in = expected_size
+        if not backup_config.get_storages():
+            return {}
+
+        if backup_config.get_volume_size():
+            results, files, digest = self._run_volume_backup(backup_config, archiver, file_name, expected_size, metrics)
+        else:
+            results, files, digest = self._run_stream_backup(backup_config, archiver, file_name, expected_size, metrics)
+
+        for name, error in results.items():
+            if error:
+                print(f"Не удалось загрузить бэкап {file_name} в хранилище {name}: {error}")
+
+        if archiver.index is not None and digest:
+            self._record_codec_stats(archiver.index, metrics)
+            index = ArchiveIndex(file_name, archiver.index, digest["size"], backup_config.get_volume_size() * 1024 * 1024)
+            self._upload_archive_index(backup_config, index, results)
+
+        with metrics.phase("verify"):
+            verification = self._verify_uploads(backup_config, files, results)
+        self._save_run_manifest(backup_config, {
+            "backup": file_name,
+            "started": started.isoformat(timespec="seconds"),
+            "finished": datetime.now().isoformat(timespec="seconds"),
+            "archive": digest,
+            "files": files,
+            "storages": {
+                storage.get_name(): {
+                    "dir": storage.get_dir(),
+                    "error": str(results[storage.get_name()]) if results.get(storage.get_name()) else None,
+                    "verification": verification.get(storage.get_name())
+                }
+                for storage in backup_config.get_storages()
+            }
+        })
+
+        return results
+
+    def _estimate_archive_size(self, backup_config, archiver):
+        """Сколько места освободить под архив: размер архива последнего успешного запуска с запасом ESTIMATE_GROWTH.
+
+        Так Dir обходится один раз, при архивации. Отдельным обходом
+        (сумма размеров файлов) размер оценивается только при первом запуске
+        блока или без state_dir.
+        """
+        if self._state_dir:
+            for record in self._open_run_manifest(backup_config).iter_records(newest_first=True):
+                size = (record.get("archive") or {}).get("size")
+                if size and any(not entry["error"] for entry in record["storages"].values()):
+                    return int(size * self.ESTIMATE_GROWTH)
+        return archiver.estimate_size()
+
+    def _run_stream_backup(self, backup_config, archiver, file_name, expected_size, metrics):
+        storages = backup_config.get_storages()
+        digest = ArchiveDigest()
+
+        with self._storage_slots(storages), ThreadPoolExecutor(max_workers=len(storages)) as pool:
+            fan_out = FanOutStream(archiver.open_stream(), len(storages), digest=digest)
+            futures = [
+                pool.submit(self._upload_to_storage, storage, branch, file_name, expected_size, metrics)
+                for storage, branch in zip(storages, fan_out.branches)
+            ]
+            fan_out.pump()
+
+        results = {storage.get_name(): future.exception() for storage, future in zip(storages, futures)}
+        return results, [dict(digest.to_dict(), name=file_name)], digest.to_dict()
+
+    def _run_volume_backup(self, backup_config, archiver, file_name, expected_size, metrics):
+        """Архив делится на тома по VolumeSize МБ, тома загружаются параллельно во все хранилища."""
+        storages = backup_config.get_storages()
+        targets = [
+            VolumeTarget(storage.get_name(), self._create_uploader(storage), storage.get_dir(),
+                         self._get_storage_semaphore(storage))
+            for storage in storages
+        ]
+        max_pending = max(self._get_storage_concurrency(storage) for storage in storages) + 1
+        upload = MultiVolumeUpload(
+            archiver.open_stream(),
+            file_name,
+            backup_config.get_volume_size() * 1024 * 1024,
+            targets,
+            max_pending=max_pending,
+            metrics=metrics
+        )
+
+        results = upload.run(expected_size)
+        for target in targets:
+            metrics.record(f"upload:{target.name}", retries=target.uploader.retries, calls=0)
+        return results, upload.volumes, upload.digest
+
+    @staticmethod
+    def _record_codec_stats(entries, metrics):
+        """Сколько файлов и байт ушло в сжатие, а сколько записано как есть."""
+        for method, codec in ((ZIP_DEFLATED, "deflate"), (ZIP_STORED, "store")):
+            selected = [entry for entry in entries if entry["method"] == method]
+            metrics.set_value(f"codec_{codec}_files", len(selected))
+            metrics.set_value(f"codec_{codec}_bytes_in", sum(entry["size"] for entry in selected))
+            metrics.set_value(f"codec_{codec}_bytes_out", sum(entry["compressed_size"] for entry in selected))
+
+    def _upload_archive_index(self, backup_config, index, results):
+        """Кладёт индекс файлов архива рядом с ним в каждое хранилище, куда архив загрузился."""
+        with tempfile.TemporaryDirectory(prefix="backupZ-index-") as directory:
+            index_file = os.path.join(directory, "index.json")
+            with open(index_file, 'w') as file:
+                file.write(index.to_json())
+            for storage in backup_config.get_storages():
+                if results.get(storage.get_name()) is not None:
+                    continue
+                try:
+                    self._create_uploader(storage).upload_volume(
+                        index_file, ArchiveIndex.index_name(index.archive), storage.get_dir())
+                except Exception as e:
+                    print(f"Не удалось загрузить индекс архива {index.archive} в хранилище {storage.get_name()}: {e}")
+
+    def _verify_uploads(self, backup_config, files, results):
+        """Сверяет загруженные файлы с метаданными хранилищ, не скачивая их; возвращает {хранилище: итог}."""
+        verifier = BackupVerifier()
+        verification = {}
+        for storage in backup_config.get_storages():
+            if results.get(storage.get_name()) is not None:
+                continue
+            try:
+                statuses = verifier.verify(self._create_uploader(storage), storage.get_dir(), files)
+            except Exception as e:
+                print(f"Не удалось проверить бэкап в хранилище {storage.get_name()}: {e}")
+                continue
+            verification[storage.get_name()] = verifier.summarize(statuses)
+            if verification[storage.get_name()] != "verified":
+                print(f"Проверка бэкапа в хранилище {storage.get_name()}: {verification[storage.get_name()]}")
+        return verification
+
+    def _open_run_manifest(self, backup_config):
+        return RunManifest(os.path.join(self._state_dir, "manifests"), backup_config.get_id())
+
+    def _save_run_manifest(self, backup_config, record):
+        if not self._state_dir:
+            return
+        try:
+            self._open_run_manifest(backup_config).save(record)
+        except OSError as e:
+            print(f"Не удалось сохранить манифест запуска: {e}")
+
+    def _save_run_report(self, backup_config, metrics, results):
+        """Пишет отчёт запуска в .state/reports/<id блока>/ и метрики последнего запуска в <metrics_dir>/<id блока>.prom."""
+        report = RunReport(backup_config.get_id(), metrics, results)
+        try:
+            if self._state_dir:
+                started = datetime.fromtimestamp(metrics.started).strftime("%Y%m%d-%H%M%S")
+                report.write_json(os.path.join(self._state_dir, "reports", backup_config.get_id(), f"{started}.json"))
+            if self._metrics_dir:
+                report.write_prometheus(os.path.join(self._metrics_dir, f"backupz_{backup_config.get_id()}.prom"))
+        except OSError as e:
+            print(f"Не удалось сохранить отчёт запуска: {e}")
+
+    def audit(self):
+        """Проверяет все бэкапы из локальных манифестов только по метаданным хранилищ.
+
+        Возвращает словарь {итог: число бэкапов}. Бэкапы, удалённые ротацией, попадают в missing.
+        """
+        if self._backup_configs is None:
+            self._create_backup_configs()
+
+        verifier = BackupVerifier()
+        totals = {}
+        for backup_config in self._backup_configs:
+            storages = {storage.get_name(): storage for storage in backup_config.get_storages()}
+            uploaders = {}
+            for record in self._open_run_manifest(backup_config).iter_records():
+                for name, entry in record["storages"].items():
+                    if entry["error"] or name not in storages:
+                        continue
+                    if name not in uploaders:
+                        uploaders[name] = self._create_uploader(storages[name])
+                    status = verifier.summarize(verifier.verify(uploaders[name], entry["dir"], record["files"]))
+                    totals[status] = totals.get(status, 0) + 1
+                    print(f"{record['backup']} ({name}): {status}")
+
+        print(f"Проверка завершена: {', '.join(f'{status} {count}' for status, count in sorted(totals.items())) or 'нет бэкапов'}")
+        return totals
+
+    def restore(self, archive, target_dir, paths=None, storage_name=None, workers=8):
+        """Восстанавливает архив (или только paths из него) в target_dir из локального снимка или первого хранилища, где есть его индекс."""
+        if self._backup_configs is None:
+            self._create_backup_configs()
+
+        index_name = ArchiveIndex.index_name(archive)
+        candidates = [
+            (storage, self._create_uploader(storage))
+            for backup_config in self._backup_configs
+            for storage in backup_config.get_storages()
+            if not storage_name or storage.get_name() == storage_name
+        ]
+        # Локальные снимки (LocalSnapshot) восстанавливаются простым копированием - пробуем их первыми
+        candidates.sort(key=lambda candidate: not hasattr(candidate[1], "restore_snapshot"))
+        for storage, uploader in candidates:
+            try:
+                names = uploader.list_file_names(storage.get_dir())
+            except Exception as e:
+                print(f"Не удалось получить список файлов хранилища {storage.get_name()}: {e}")
+                continue
+            if hasattr(uploader, "restore_snapshot"):
+                if archive in names:
+                    print(f"Восстанавливаю {archive} из локального снимка в хранилище {storage.get_name()}")
+                    return uploader.restore_snapshot(archive, storage.get_dir(), target_dir, paths)
+            elif index_name in names:
+                print(f"Восстанавливаю {archive} из хранилища {storage.get_name()}")
+                return BackupRestorer(uploader, storage.get_dir(), workers).restore(archive, target_dir, paths)
+
+        print(f"Архив {archive} с индексом не найден ни в одном хранилище")
+        return None
+
+    def _run_dedup_backup(self, backup_config, run_name, metrics, throttle=None):
+        """Инкрементальный бэкап: загружаются только блоки, которых ещё нет в хранилищах."""
+        results = {}
+        stores = {}
+        for storage in backup_config.get_storages():
+            try:
+                store = ChunkStore(self._create_uploader(storage), storage.get_dir(), throttle=throttle)
+                store.open()
+                stores[store] = storage
+            except Exception as e:
+                results[storage.get_name()] = e
+
+        file_index = self._open_file_index(backup_config)
+        try:
+            with metrics.phase("dedup"):
+                errors = DedupBackup(
+                    backup_config.get_dir(), stores.keys(), file_index=file_index,
+                    scanner=self._create_scanner(backup_config, metrics), throttle=throttle
+                ).run(run_name)
+        finally:
+            if file_index:
+                file_index.close()
+        for store, error in errors.items():
+            results[stores[store].get_name()] = error
+
+        for name, error in results.items():
+            if error:
+                print(f"Не удалось загрузить бэкап {run_name} в хранилище {name}: {error}")
+
+        return results
+
+    def apply_config(self, config):
+        """Применяет новую конфигурацию без перезапуска.
+
+        Блоки сопоставляются по BackupConfig.get_id(): новые ставятся в
+        расписание, пропавшие снимаются, изменённые перепланируются.
+        Остальные задачи не трогаются, а уже идущие бэкапы доработают со
+        старыми настройками.
+        """
+        new_configs = {c.get_id(): c for c in CreateBackupConfigs(config).create_configs()}
+        old_configs = {c.get_id(): c for c in self._backup_configs or []}
+
+        added = [job_id for job_id in new_configs if job_id not in old_configs]
+        removed = [job_id for job_id in old_configs if job_id not in new_configs]
+        updated = [
+            job_id for job_id in new_configs
+            if job_id in old_configs and new_configs[job_id].get_fingerprint() != old_configs[job_id].get_fingerprint()
+        ]
+
+        self._config = config
+        self._backup_configs = list(new_configs.values())
+
+        if self._scheduler:
+            for job_id in removed:
+                self._scheduler.remove_job(job_id)
+            for job_id in added + updated:
+                self._scheduler.add_job(job_id, new_configs[job_id])
+
+        if added or removed or updated:
+            # Рабочие процессы очереди применят её перед следующей задачей
+            for config_updates in list(self._worker_configs.values()):
+                config_updates.put(config)
+
+        print(f"Конфигурация обновлена: добавлено {len(added)}, удалено {len(removed)}, изменено {len(updated)}")
+
+    def run_all(self):
+        """Один раз запускает все блоки, не дожидаясь расписания: блоки с разных дисков идут параллельно."""
+        self._create_backup_configs()
+
+        engine = self._create_engine()
+        try:
+            results = engine.run_all(self.run_backup, self._backup_configs)
+        finally:
+            engine.shutdown()
+
+        for backup_config in self._backup_configs:
+            result = results[backup_config.get_id()]
+            if isinstance(result, Exception):
+                print(f"Ошибка при выполнении бэкапа {backup_config.get_dir()}: {result}")
+        return results
+
     def start_watching_time(self):
         self._create_backup_configs()
+        if self._queue_path:
+            self._start_queue_mode()
+            return
+
+        self._scheduler = BackupScheduler(
+            self.run_backup,
+            os.path.join(self._state_dir or ".", "schedule.json"),
+            max_concurrent_jobs=self._max_concurrent_jobs,
+            catch_up_policy=self._catch_up_policy,
+            executor=self._create_engine()
+        )
+        for backup_config in self._backup_configs:
+            self._scheduler.add_job(backup_config.get_id(), backup_config)
+
+        try:
+            self._scheduler.run_forever()
+        except KeyboardInterrupt:
+            print("Остановка: дожидаюсь завершения запущенных бэкапов")
+            self._scheduler.stop()
+
+    def _enqueue_backup(self, backup_config, due_time):
+        """Ставит наступивший запуск в очередь вместо выполнения.
+
+        Слот - время запуска по расписанию, а не момент вызова: планировщики
+        разных хостов ставят один и тот же запуск с одним слотом, и он
+        попадает в очередь один раз, даже если хост догоняет его после полуночи.
+        """
+        slot = f"{due_time:%Y-%m-%dT%H:%M}"
+        queue = JobQueue(self._queue_path)
+        try:
+            if queue.enqueue(backup_config.get_id(), slot):
+                print(f"Бэкап {backup_config.get_id()} ({slot}) поставлен в очередь")
+        finally:
+            queue.close()
+
+    def _start_worker_process(self, number):
+        config_updates = multiprocessing.Queue()
+        self._worker_configs[number] = config_updates
+        process = multiprocessing.Process(
+            target=run_queue_worker,
+            args=(self._config, self._state_dir, self._metrics_dir, self._queue_path, number, config_updates),
+            name=f"backup-worker-{number}"
+        )
+        process.start()
+        return process
+
+    def _supervise_workers(self, processes, stopped):
+        """Перезапускает упавшие рабочие процессы; их задачи вернутся в очередь по истечении аренды."""
+        while not stopped.wait(5):
+            for number, process in enumerate(processes):
+                if not process.is_alive() and not stopped.is_set():
+                    print(f"Рабочий процесс {process.name} завершился с кодом {process.exitcode}, перезапускаю")
+                    processes[number] = self._start_worker_process(number)
+
+    def _start_queue_mode(self):
+        processes = [self._start_worker_process(number) for number in range(self._queue_workers)]
+        stopped = threading.Event()
+        threading.Thread(target=self._supervise_workers, args=(processes, stopped), daemon=True).start()
+
+        try:
+            if self._enqueue:
+                # Постановка в очередь быстрая, поэтому хватает одного потока и без ограничений по дискам
+                self._scheduler = BackupScheduler(
+                    self._enqueue_backup,
+                    os.path.join(self._state_dir or ".", "schedule.json"),
+                    max_concurrent_jobs=1,
+                    catch_up_policy=self._catch_up_policy,
+                    pass_due_time=True
+                )
+                for backup_config in self._backup_configs:
+                    self._scheduler.add_job(backup_config.get_id(), backup_config)
+                self._scheduler.run_forever()
+            else:
+                while True:
+                    time.sleep(60)
+        except KeyboardInterrupt:
+            print("Остановка: рабочие процессы возвращают невыполненные задачи в очередь")
+            stopped.set()
+            if self._scheduler:
+                self._scheduler.stop()
+        finally:
+            stopped.set()
+            for process in processes:
+                process.join()
+
+    def run_worker(self, number=0, config_updates=None):
+        """Выполняет задачи из очереди, пока процесс не остановят.
+
+        В config_updates (multiprocessing.Queue) основной процесс присылает
+        новую конфигурацию после apply_config; она применяется перед
+        следующей задачей, а текущая дорабатывает со старыми настройками.
+        """
+        self._create_backup_configs()
+        queue = JobQueue(self._queue_path)
+        worker = JobWorker(
+            queue,
+            self.run_backup,
+            lambda job_id: self._get_worker_config(job_id, config_updates),
+            f"{JobQueue.default_worker_name()}/{number}"
+        )
+        try:
+            worker.run_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            queue.close()
 
+    def _get_worker_config(self, job_id, config_updates):
+        config = None
+        while config_updates is not None:
+            try:
+                config = config_updates.get_nowait()
+            except Empty:
+                break
+        if config is not None:
+            self._config = config
+            self._create_backup_configs()
+            print(f"Рабочий процесс {os.getpid()} применил новую конфигурацию")
+        return next((c for c in self._backup_configs if c.get_id() == job_id), None)
 
 
+def run_queue_worker(config, state_dir, metrics_dir, queue_path, number, config_updates=None):
+    """Точка входа рабочего процесса очереди: свой BackupsManager на те же конфиги."""
+    manager = BackupsManager()
+    manager.set_config(config)
+    manager.set_state_dir(state_dir)
+    manager.set_metrics_dir(metrics_dir)
+    manager.set_queue(queue_path)
+    manager.run_worker(number, config_updates)
@@ -5,10 +5,14 @@ from backupZ.check_directives.check_directives import CheckDirectives
 
 
 class CheckMainBlockDirectives(CheckDirectives):
+    FORMATS = ("zip", "dedup")
+    COMPRESSIONS = ("deflate", "store")
+
     def __init__(self, main_block):
         super().__init__(main_block)
         self._dir_directive_found = False
         self._time_directive_found = False
+        self._invalid_directive_found = False
 
     def check_directives(self):
         for directive in self._main_block.directives:
@@ -18,8 +22,44 @@ class CheckMainBlockDirectives(CheckDirectives):
             elif directive.key == "Time":
                 if self._validate_time_directive(directive):
                     self._time_directive_found = True
+            elif directive.key == "Day":
+                if not self._validate_day_directive(directive):
+                    self._invalid_directive_found = True
+            elif directive.key == "Format":
+                if not self._validate_format_directive(directive):
+                    self._invalid_directive_found = True
+            elif directive.key == "Compression":
+                if not self._validate_compression_directive(directive):
+                    self._invalid_directive_found = True
+            elif directive.key == "CompressionLevel":
+                if not self._validate_compression_level_directive(directive):
+                    self._invalid_directive_found = True
+            elif directive.key == "CompressionWorkers":
+                if not self._validate_compression_workers_directive(directive):
+                    self._invalid_directive_found = True
+            elif directive.key == "VolumeSize":
+                if not self._validate_volume_size_directive(directive):
+                    self._invalid_directive_found = True
+            elif directive.key in ("Include", "Exclude"):
+                if not self._validate_pattern_directive(directive):
+                    self._invalid_directive_found = True
+            elif directive.key == "ScanWorkers":
+                if not self._validate_scan_workers_directive(directive):
+                    self._invalid_directive_found = True
+            elif directive.key in ("StoreExtensions", "CompressExtensions"):
+                if not self._validate_extensions_directive(directive):
+                    self._invalid_directive_found = True
+            elif directive.key == "IncompressibleRatio":
+                if not self._validate_incompressible_ratio_directive(directive):
+                    self._invalid_directive_found = True
+            elif directive.key in ("ThrottleLoad", "ThrottleIOPressure", "ThrottleLatency"):
+                if not self._validate_throttle_limit_directive(directive):
+                    self._invalid_directive_found = True
+            elif directive.key == "ThrottleMinimum":
+                if not self._validate_throttle_minimum_directive(directive):
+                    self._invalid_directive_found = True
 
-        if self._dir_directive_found and self._time_directive_found:
+        if self._dir_directive_found and self._time_directive_found and not self._invalid_directive_found:
             return True
 
     def _validate_dir_directive(self, directive):
@@ -35,3 +75,77 @@ class CheckMainBlockDirectives(CheckDirectives):
         except ValueError:
             print(f"Не верно указано время бэкапа у директивы Time. В файле: {directive.source_file} строка: {directive.line_num}")
 
+
+    def _validate_day_directive(self, directive):
+        if directive.value.isdigit() and int(directive.value) > 0:
+            return True
+        else:
+            print(f"Не верно указан интервал в днях у директивы Day. В файле: {directive.source_file} строка: {directive.line_num}")
+
+    def _validate_format_directive(self, directive):
+        if directive.value in self.FORMATS:
+            return True
+        else:
+            print(f"Не верно указан формат бэкапа у директивы Format (допустимо: {', '.join(self.FORMATS)}). В файле: {directive.source_file} строка: {directive.line_num}")
+
+    def _validate_compression_directive(self, directive):
+        if directive.value in self.COMPRESSIONS:
+            return True
+        else:
+            print(f"Не верно указан метод сжатия у директивы Compression (допустимо: {', '.join(self.COMPRESSIONS)}). В файле: {directive.source_file} строка: {directive.line_num}")
+
+    def _validate_compression_level_directive(self, directive):
+        if directive.value.isdigit() and 0 <= int(directive.value) <= 9:
+            return True
+        else:
+            print(f"Уровень сжатия у директивы CompressionLevel должен быть от 0 до 9. В файле: {directive.source_file} строка: {directive.line_num}")
+
+    def _validate_compression_workers_directive(self, directive):
+        if directive.value.isdigit():
+            return True
+        else:
+            print(f"Не верно указано число процессов у директивы CompressionWorkers (0 — по числу ядер). В файле: {directive.source_file} строка: {directive.line_num}")
+
+    def _validate_volume_size_directive(self, directive):
+        if directive.value.isdigit():
+            return True
+        else:
+            print(f"Не верно указан размер тома в МБ у директивы VolumeSize (0 — не делить). В файле: {directive.source_file} строка: {directive.line_num}")
+
+    def _validate_pattern_directive(self, directive):
+        if directive.value.strip("/"):
+            return True
+        else:
+            print(f"Пустой шаблон у директивы {directive.key}. В файле: {directive.source_file} строка: {directive.line_num}")
+
+    def _validate_scan_workers_directive(self, directive):
+        if directive.value.isdigit() and int(directive.value) > 0:
+            return True
+        else:
+            print(f"Не верно указано число потоков обхода у директивы ScanWorkers. В файле: {directive.source_file} строка: {directive.line_num}")
+
+    def _validate_extensions_directive(self, directive):
+        if directive.value.replace(",", " ").split():
+            return True
+        else:
+            print(f"Не указаны расширения у директивы {directive.key} (например \".bak .dump\"). В файле: {directive.source_file} строка: {directive.line_num}")
+
+    def _validate_incompressible_ratio_directive(self, directive):
+        if directive.value.isdigit() and int(directive.value) <= 100:
+            return True
+        else:
+            print(f"Порог у директивы IncompressibleRatio указывается в процентах от 0 до 100 (0 — без пробы). В файле: {directive.source_file} строка: {directive.line_num}")
+
+    def _validate_throttle_limit_directive(self, directive):
+        try:
+            if float(directive.value) > 0:
+                return True
+        except ValueError:
+            pass
+        print(f"Порог у директивы {directive.key} должен быть положительным числом. В файле: {directive.source_file} строка: {directive.line_num}")
+
+    def _validate_throttle_minimum_directive(self, directive):
+        if directive.value.isdigit() and 1 <= int(directive.value) <= 100:
+            return True
+        else:
+            print(f"Минимальная скорость у директивы ThrottleMinimum указывается в процентах от 1 до 100. В файле: {directive.source_file} строка: {directive.line_num}")
@@ -1,20 +1,80 @@
+import os
+import shlex
+
 from backupZ.check_directives.check_directives import CheckDirectives
 
 
 class CheckScriptBlockDirectives(CheckDirectives):
+    COMMAND_DIRECTIVES = ("BeforeCommand", "AfterCommand", "SourceCommand")
+
     def __init__(self, main_block):
         super().__init__(main_block)
         self._scripts_block_found = False
-        self._dir_directive_found = False
-        self._before_command_found = False
-        self._after_command_found = False
+        self._invalid_directive_found = False
 
     def check_directives(self):
         for block in self._main_block.blocks:
             if block.name == "Scripts":
                 self._scripts_block_found = True
+                if not self._check_scripts_block(block):
+                    self._invalid_directive_found = True
+
+        return not self._invalid_directive_found
+
+    def _check_scripts_block(self, block):
+        valid = True
+        keys = set()
+        for directive in block.directives:
+            keys.add(directive.key)
+            if directive.key == "Dir":
+                valid = self._validate_dir_directive(directive) and valid
+            elif directive.key in self.COMMAND_DIRECTIVES:
+                valid = self._validate_command_directive(directive) and valid
+            elif directive.key == "ScriptExitCode":
+                valid = self._validate_exit_code_directive(directive) and valid
+            elif directive.key == "SourceName":
+                valid = self._validate_source_name_directive(directive) and valid
+            elif directive.key == "Timeout":
+                valid = self._validate_timeout_directive(directive) and valid
+
+        if not keys & set(self.COMMAND_DIRECTIVES):
+            print(f"В блоке Scripts не указана ни одна команда ({', '.join(self.COMMAND_DIRECTIVES)}). "
+                  f"В файле: {block.source_file} строка: {block.line_num}")
+            valid = False
+        if ("SourceCommand" in keys) != ("SourceName" in keys):
+            print(f"Директивы SourceCommand и SourceName в блоке Scripts указываются вместе. "
+                  f"В файле: {block.source_file} строка: {block.line_num}")
+            valid = False
+        return valid
+
+    def _validate_dir_directive(self, directive):
+        if os.path.isdir(directive.value):
+            return True
+        else:
+            print(f"Не верно указан путь у директивы Dir блока Scripts. В файле: {directive.source_file} строка: {directive.line_num}")
+
+    def _validate_command_directive(self, directive):
+        try:
+            if shlex.split(directive.value):
+                return True
+        except ValueError:
+            pass
+        print(f"Не верно указана команда у директивы {directive.key}. В файле: {directive.source_file} строка: {directive.line_num}")
+
+    def _validate_exit_code_directive(self, directive):
+        if directive.value.lstrip("-").isdigit():
+            return True
+        else:
+            print(f"Не верно указан код завершения у директивы ScriptExitCode. В файле: {directive.source_file} строка: {directive.line_num}")
 
-                for directive in block.directives:
-                    if directive.name == "Dir":
-                        pass
+    def _validate_source_name_directive(self, directive):
+        if directive.value.strip("/"):
+            return True
+        else:
+            print(f"Пустое имя у директивы SourceName. В файле: {directive.source_file} строка: {directive.line_num}")
 
+    def _validate_timeout_directive(self, directive):
+        if directive.value.isdigit() and int(directive.value) > 0:
+            return True
+        else:
+            print(f"Не верно указано время в секундах у директивы Timeout. В файле: {directive.source_file} строка: {directive.line_num}")
@@ -0,0 +1,247 @@
+import gc
+import hashlib
+import marshal
+import os
+import sys
+
+from backupZ.config_parser import Block, BlockArgs, Config, Directive
+
+
+class ConfigCache:
+    """Снимок разобранной конфигурации, чтобы не разбирать .conf при каждом старте.
+
+    Для каждого входного файла (.conf и подключённых через Envs .env)
+    хранится путь, mtime, размер и sha256. При старте файл считается
+    неизменным, если совпали mtime и размер, либо размер и хеш. Если не
+    изменилось ничего, конфигурация целиком берётся из снимка; изменённые
+    и новые .conf разбираются заново по одному и встраиваются на своё место.
+    Изменение .env, базовых переменных или директив Envs ведёт к полному разбору.
+
+    Снимок хранится в marshal из кортежей: это в разы быстрее JSON и pickle
+    для сотен тысяч мелких объектов. Формат marshal зависит от версии Python,
+    поэтому она входит в заголовок снимка.
+
+    Значения переменных из .env (токены, пароли) в снимок не попадают:
+    директивы с ${VAR} хранятся строкой конфига, переменные читаются из
+    .env и подставляются при загрузке. Сам снимок доступен только владельцу.
+    """
+
+    VERSION = 2
+
+    def __init__(self, cache_file):
+        self._cache_file = cache_file
+
+    @staticmethod
+    def _file_hash(path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for data in iter(lambda: file.read(1024 * 1024), b''):
+                digest.update(data)
+        return digest.hexdigest()
+
+    def _signature(self, path):
+        stat = os.stat(path)
+        return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "hash": self._file_hash(path)}
+
+    def _unchanged(self, path, signature):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if stat.st_size != signature["size"]:
+            return False
+        if stat.st_mtime_ns == signature["mtime_ns"]:
+            return True
+        return self._file_hash(path) == signature["hash"]
+
+    @staticmethod
+    def _list_env_files(envs_dir):
+        if not os.path.isdir(envs_dir):
+            return []
+        return sorted(os.path.join(envs_dir, name) for name in os.listdir(envs_dir) if name.endswith('.env'))
+
+    @staticmethod
+    def _format_key():
+        return f"{ConfigCache.VERSION}:{sys.version_info[0]}.{sys.version_info[1]}:{marshal.version}"
+
+    def _read_snapshot(self):
+        try:
+            with open(self._cache_file, 'rb') as file:
+                snapshot = marshal.loads(file.read())
+        except (OSError, ValueError, EOFError, TypeError):
+            return None
+        if not isinstance(snapshot, dict) or snapshot.get("format") != self._format_key():
+            return None
+        return snapshot
+
+    @staticmethod
+    def _pack_directives(directives, lines):
+        # Директива с переменными хранится исходной строкой (line_num, строка), остальные - (ключ, значение, line_num)
+        packed = []
+        for d in directives:
+            line = lines[d.line_num - 1].strip()
+            packed.append((d.line_num, line) if '$' in line else (d.key, d.value, d.line_num))
+        return tuple(packed)
+
+    def _pack_block(self, block, lines):
+        return (
+            block.name, block.args.raw_args, block.args.parsed_args,
+            self._pack_directives(block.directives, lines),
+            tuple(self._pack_block(b, lines) for b in block.blocks),
+            block.line_num
+        )
+
+    def _pack_config(self, config, path):
+        with open(path, 'r') as file:
+            lines = file.readlines()
+        return (
+            tuple(self._pack_block(b, lines) for b in config.blocks),
+            self._pack_directives(config.directives, lines)
+        )
+
+    @staticmethod
+    def _unpack_directives(packed, source_file, parser):
+        # Объекты собираются без вызова __init__ dataclass: на больших
+        # конфигурациях это основная часть времени загрузки
+        directives = []
+        for item in packed:
+            if len(item) == 2:
+                line_num, line = item
+                resolved = parser.resolve_directive(line, line_num, source_file)
+                if resolved is None:
+                    continue
+                key, value = resolved
+            else:
+                key, value, line_num = item
+            directive = object.__new__(Directive)
+            directive.__dict__ = {"key": key, "value": value, "source_file": source_file, "line_num": line_num}
+            directives.append(directive)
+        return directives
+
+    def _unpack_block(self, packed, source_file, parser):
+        name, raw_args, parsed_args, directives, blocks, line_num = packed
+        args = object.__new__(BlockArgs)
+        args.__dict__ = {"raw_args": raw_args, "parsed_args": parsed_args}
+        block = object.__new__(Block)
+        block.__dict__ = {
+            "name": name,
+            "args": args,
+            "directives": self._unpack_directives(directives, source_file, parser),
+            "blocks": [self._unpack_block(b, source_file, parser) for b in blocks],
+            "source_file": source_file,
+            "line_num": line_num
+        }
+        return block
+
+    def _unpack_config(self, packed, source_file, parser):
+        blocks, directives = packed
+        return Config(
+            blocks=[self._unpack_block(b, source_file, parser) for b in blocks],
+            directives=self._unpack_directives(directives, source_file, parser)
+        )
+
+    def _envs_unchanged(self, snapshot):
+        envs_dirs = sorted({d for dirs in snapshot["envs_dirs"].values() for d in dirs})
+        env_files = [path for envs_dir in envs_dirs for path in self._list_env_files(envs_dir)]
+        if sorted(env_files) != sorted(snapshot["env_files"]):
+            return False
+        return all(self._unchanged(path, signature) for path, signature in snapshot["env_files"].items())
+
+    @staticmethod
+    def _contains_envs(path):
+        with open(path, 'r') as file:
+            return any(line.strip().startswith("Envs") for line in file)
+
+    def load(self, parser, directory):
+        """Заполняет parser.config из снимка или разбором; возвращает True, если снимок использован."""
+        # Сборщик мусора на сотнях тысяч новых объектов отнимает до половины времени загрузки
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return self._load(parser, directory)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def _load(self, parser, directory):
+        filepaths = parser.list_config_files(directory)
+        base_variables = dict(parser.variables)
+        snapshot = self._read_snapshot()
+
+        if snapshot and snapshot["base_variables"] == base_variables and self._envs_unchanged(snapshot):
+            changed = [path for path in filepaths
+                       if path not in snapshot["files"] or not self._unchanged(path, snapshot["files"][path]["signature"])]
+            envs_touched = any(
+                snapshot["envs_dirs"].get(path) or self._contains_envs(path) for path in changed
+            ) or any(path not in filepaths for path in snapshot["envs_dirs"])
+
+            if not envs_touched:
+                self._load_incremental(parser, filepaths, snapshot, set(changed))
+                if changed and not parser.errors_exists:
+                    reuse = {path: snapshot["files"][path] for path in filepaths if path not in changed}
+                    self._save(parser, filepaths, base_variables, reuse)
+                return True
+
+        parser.parse_directory(directory)
+        if not parser.errors_exists:
+            self._save(parser, filepaths, base_variables)
+        return False
+
+    def _load_incremental(self, parser, filepaths, snapshot, changed):
+        parser.envs_dirs = {path: dirs for path, dirs in snapshot["envs_dirs"].items() if path in filepaths}
+        # Переменные читаются из .env в том же порядке, что и при полном разборе
+        for path in filepaths:
+            for envs_dir in parser.envs_dirs.get(path, []):
+                parser.load_envs_dir(envs_dir)
+
+        for path in filepaths:
+            if path in changed:
+                config, errors = parser.parse_file_isolated(path)
+                parser.errors.extend(errors)
+            else:
+                config = self._unpack_config(snapshot["files"][path]["config"], path, parser)
+            parser._report_errors(path)
+            parser.config.blocks.extend(config.blocks)
+            parser.config.directives.extend(config.directives)
+
+        if changed:
+            print(f"Конфигурация загружена из снимка, разобраны заново: {', '.join(sorted(changed))}")
+
+    def _split_by_file(self, parser, filepaths):
+        configs = {path: Config() for path in filepaths}
+        for block in parser.config.blocks:
+            configs[block.source_file].blocks.append(block)
+        for directive in parser.config.directives:
+            configs[directive.source_file].directives.append(directive)
+        return configs
+
+    def _save(self, parser, filepaths, base_variables, reuse=None):
+        reuse = reuse or {}
+        configs = self._split_by_file(parser, filepaths)
+        env_files = {}
+        for dirs in parser.envs_dirs.values():
+            for envs_dir in dirs:
+                for path in self._list_env_files(envs_dir):
+                    env_files[path] = self._signature(path)
+
+        snapshot = {
+            "format": self._format_key(),
+            "base_variables": base_variables,
+            "envs_dirs": parser.envs_dirs,
+            "env_files": env_files,
+            "files": {
+                path: reuse.get(path) or {
+                    "signature": self._signature(path),
+                    "config": self._pack_config(configs[path], path)
+                }
+                for path in filepaths
+            }
+        }
+
+        os.makedirs(os.path.dirname(os.path.abspath(self._cache_file)), exist_ok=True)
+        tmp_file = f"{self._cache_file}.tmp"
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        with os.fdopen(os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), 'wb') as file:
+            marshal.dump(snapshot, file)
+        os.replace(tmp_file, self._cache_file)
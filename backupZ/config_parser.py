@@ -3,6 +3,7 @@ import re
 import json
 import yaml
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
 from typing import List, Dict, Optional
 from dotenv import dotenv_values  # Для загрузки переменных из .env файлов
@@ -60,6 +61,28 @@ class Config:
     blocks: List[Block] = field(default_factory=list)  # Список блоков верхнего уровня
     directives: List[Directive] = field(default_factory=list)  # Список директив верхнего уровня
 
+# Предкомпилированные шаблоны строк конфигурации
+_IF_RE = re.compile(r'<If\s+(.*?)>')
+_BLOCK_OPEN_RE = re.compile(r'<(\w+)(?:\s+(.*?))?>')
+_BLOCK_CLOSE_RE = re.compile(r'</(\w+)>')
+_DIRECTIVE_RE = re.compile(r'(\w+)\s+(.*)')
+_ENVS_RE = re.compile(r'Envs\s+(.*)')
+_VARIABLE_RE = re.compile(r'\$\{([\w\.]+)\}')
+
+# Параллельный разбор включается, только если файлов конфигурации много:
+# запуск пула процессов стоит дороже разбора пары небольших файлов
+PARALLEL_MIN_BYTES = 1024 * 1024
+
+
+def _parse_file_worker(filename: str, variables: Dict[str, str]):
+    """Разбирает один файл в отдельном процессе (переменные из Envs уже загружены)."""
+    parser = ConfigParser()
+    parser.variables = variables
+    parser.load_envs = False
+    parser._parse_file_lines(filename)
+    return parser.config, parser.errors
+
+
 class ConfigParser:
     def __init__(self):
         self.config = Config()  # Конфигурация
@@ -68,14 +91,27 @@ class ConfigParser:
         self.variables: Dict[str, str] = {}  # Словарь для хранения переменных
         self.current_file: Optional[str] = None  # Текущий файл, который парсится
         self.errors_exists: bool = False
+        self.load_envs: bool = True  # Загружать ли переменные по директиве Envs при разборе
+        self.envs_dirs: Dict[str, List[str]] = {}  # Папки .env, подключённые каждым файлом
 
     def parse_file(self, filename: str):
         """Парсит один файл конфигурации."""
+        self._parse_file_lines(filename)
+        self._report_errors(filename)
+
+    def _parse_file_lines(self, filename: str):
         self.current_file = filename  # Устанавливаем текущий файл
+        parse_line = self._parse_line
         with open(filename, 'r') as file:
             for line_num, line in enumerate(file, start=1):
-                self._parse_line(line.strip(), line_num, filename)
+                parse_line(line.strip(), line_num, filename)
 
+        # Блоки не переходят из файла в файл
+        for block in reversed(self.current_context):
+            self.errors.append(f"Не закрыт блок <{block.name}> в файле {filename}, строка {block.line_num}")
+        self.current_context = []
+
+    def _report_errors(self, filename: str):
         # Выводим ошибки, если они есть, после завершения парсинга файла
         if self.errors:
             print(f"Ошибки при парсинге файла {filename}:")
@@ -84,74 +120,136 @@ class ConfigParser:
             self.errors = []  # Очищаем список ошибок после вывода
             self.errors_exists = True
 
-    def parse_directory(self, directory: str):
-        """Рекурсивно парсит все файлы в указанной папке."""
-        for root, _, files in os.walk(directory):
-            for file in files:
-                if file.endswith('.conf'):  # Парсим только .conf файлы
-                    filepath = os.path.join(root, file)
+    def parse_directory(self, directory: str, workers: Optional[int] = None):
+        """Рекурсивно парсит все файлы в указанной папке.
+
+        Файлы разбираются в порядке сортировки путей. Переменные из Envs
+        загружаются заранее из всех файлов, после чего файлы независимы и
+        при большом объёме разбираются параллельно в пуле процессов;
+        результат сливается в том же порядке, что и при последовательном разборе.
+        """
+        filepaths = self.list_config_files(directory)
+        self._preload_envs(filepaths)
+
+        total_size = sum(os.path.getsize(filepath) for filepath in filepaths)
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(filepaths) < 2 or total_size < PARALLEL_MIN_BYTES:
+            load_envs, self.load_envs = self.load_envs, False
+            try:
+                for filepath in filepaths:
                     self.parse_file(filepath)
+            finally:
+                self.load_envs = load_envs
+            return
+
+        with ProcessPoolExecutor(max_workers=min(workers, len(filepaths))) as pool:
+            results = pool.map(_parse_file_worker, filepaths, [self.variables] * len(filepaths))
+            for filepath, (config, errors) in zip(filepaths, results):
+                self.config.blocks.extend(config.blocks)
+                self.config.directives.extend(config.directives)
+                self.errors.extend(errors)
+                self._report_errors(filepath)
+
+    @staticmethod
+    def list_config_files(directory: str) -> List[str]:
+        """Пути всех .conf файлов папки в порядке разбора; скрытые папки (.state) пропускаются."""
+        filepaths = []
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = sorted(name for name in dirs if not name.startswith("."))
+            for file in sorted(files):
+                if file.endswith('.conf'):  # Парсим только .conf файлы
+                    filepaths.append(os.path.join(root, file))
+        return filepaths
+
+    def parse_file_isolated(self, filename: str):
+        """Разбирает файл отдельно от общей конфигурации. Возвращает (Config, ошибки)."""
+        return _parse_file_worker(filename, self.variables)
+
+    def _preload_envs(self, filepaths: List[str]):
+        """Загружает переменные из всех директив Envs до разбора файлов."""
+        for filepath in filepaths:
+            with open(filepath, 'r') as file:
+                content = file.read()
+            if "Envs" not in content:
+                continue
+            for line_num, line in enumerate(content.splitlines(), start=1):
+                line = line.strip()
+                if line.startswith("Envs"):
+                    self._handle_envs_directive(line, line_num, filepath)
+            self._report_errors(filepath)
 
     def _parse_line(self, line: str, line_num: int, filename: str):
         """Парсит одну строку конфигурации."""
         try:
             # Пропускаем пустые строки и комментарии
-            if not line or line.startswith('#'):
-                return
-
-            # Обработка директивы Envs
-            if line.startswith("Envs"):
-                self._handle_envs_directive(line, line_num, filename)
-
-            # Обработка условий <If ...>
-            if_match = re.match(r'<If\s+(.*?)>', line)
-            if if_match:
-                condition = if_match.group(1)
-                self._enter_block(f"If[{condition}]", "", line_num, filename)
+            if not line or line[0] == '#':
                 return
 
-            # Обработка блоков <BlockName ...> или <BlockName>
-            block_match = re.match(r'<(\w+)(?:\s+(.*?))?>', line)
-            if block_match:
-                block_name, block_args = block_match.groups()
-                block_args = block_args if block_args else ""  # Если аргументов нет, используем пустую строку
-                self._enter_block(block_name, block_args, line_num, filename)
-                return
+            if line[0] == '<':
+                # Обработка закрывающих тегов </BlockName>
+                if line.startswith('</'):
+                    self._exit_block(line, line_num, filename)
+                    return
+
+                # Обработка условий <If ...>
+                if line.startswith('<If'):
+                    if_match = _IF_RE.match(line)
+                    if if_match:
+                        self._enter_block(f"If[{if_match.group(1)}]", "", line_num, filename)
+                        return
+
+                # Обработка блоков <BlockName ...> или <BlockName>
+                block_match = _BLOCK_OPEN_RE.match(line)
+                if block_match:
+                    block_name, block_args = block_match.groups()
+                    self._enter_block(block_name, block_args or "", line_num, filename)
+                    return
 
-            # Обработка закрывающих тегов </BlockName>
-            if line.startswith('</'):
-                self._exit_block(line, line_num, filename)
+            # Обработка директивы Envs
+            elif line.startswith("Envs"):
+                if self.load_envs:
+                    self._handle_envs_directive(line, line_num, filename)
                 return
 
-            # Обработка переменных ${VAR}
-            line = self._replace_variables(line, line_num, filename)
-
             # Обработка директив
-            directive_match = re.match(r'(\w+)\s+(.*)', line)
-            if directive_match:
-                key, value = directive_match.groups()
-                value = self._clean_value(value)  # Убираем лишние кавычки
+            directive = self.resolve_directive(line, line_num, filename)
+            if directive:
+                key, value = directive
                 self._validate_directive(key, value, line_num, filename)
                 self._add_directive(key, value, line_num, filename)
-            else:
-                self.errors.append(f"Синтаксическая ошибка в файле {filename}, строка {line_num}: {line}")
 
         except Exception as e:
             self.errors.append(f"Ошибка в файле {filename}, строка {line_num}: {str(e)}")
 
+    def resolve_directive(self, line: str, line_num: int, filename: str):
+        """Подставляет переменные ${VAR} в строку директивы; возвращает (ключ, значение) или None при ошибке."""
+        if '$' in line:
+            line = self._replace_variables(line, line_num, filename)
+
+        directive_match = _DIRECTIVE_RE.match(line)
+        if not directive_match:
+            self.errors.append(f"Синтаксическая ошибка в файле {filename}, строка {line_num}: {line}")
+            return None
+        key, value = directive_match.groups()
+        return key, self._clean_value(value)  # Убираем лишние кавычки
+
     def _handle_envs_directive(self, line: str, line_num: int, filename: str):
         """Обрабатывает директиву Envs."""
-        envs_match = re.match(r'Envs\s+(.*)', line)
+        envs_match = _ENVS_RE.match(line)
         if not envs_match:
             self.errors.append(f"Неправильный формат директивы Envs в файле {filename}, строка {line_num}: {line}")
             return
 
         envs_dir = envs_match.group(1).strip('"\'')  # Убираем кавычки
+        self.envs_dirs.setdefault(filename, []).append(envs_dir)
         if not os.path.isdir(envs_dir):
             self.errors.append(f"Директория с .env файлами не найдена: {envs_dir} в файле {filename}, строка {line_num}")
             return
 
-        # Загружаем переменные из всех .env файлов в указанной директории
+        self.load_envs_dir(envs_dir)
+
+    def load_envs_dir(self, envs_dir: str):
+        """Загружает переменные из всех .env файлов в указанной директории."""
         for env_file in os.listdir(envs_dir):
             if env_file.endswith('.env'):
                 env_path = os.path.join(envs_dir, env_file)
@@ -180,7 +278,7 @@ class ConfigParser:
 
     def _exit_block(self, line: str, line_num: int, filename: str):
         """Обрабатывает выход из блока."""
-        block_close_match = re.match(r'</(\w+)>', line)
+        block_close_match = _BLOCK_CLOSE_RE.match(line)
         if not block_close_match:
             self.errors.append(f"Неправильный закрывающий тег в файле {filename}, строка {line_num}: {line}")
             return
@@ -217,8 +315,8 @@ class ConfigParser:
                 return match.group(0)
             return self.variables[var_name]
 
-        # Исправленное регулярное выражение: поддерживает точки в именах переменных
-        return re.sub(r'\$\{([\w\.]+)\}', replace_var, line)
+        # Регулярное выражение поддерживает точки в именах переменных
+        return _VARIABLE_RE.sub(replace_var, line)
 
     def _validate_directive(self, key: str, value: str, line_num: int, filename: str):
         """Проверяет допустимость значений директив."""
@@ -258,4 +356,4 @@ class ConfigParser:
             "blocks": [self._block_to_dict(b) for b in block.blocks],  # Рекурсивно преобразуем вложенные блоки
             "source_file": block.source_file,
             "line_num": block.line_num
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,231 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_ISDIR = 0x40000000
+
+_WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class _Inotify:
+    """Минимальная обёртка над inotify через ctypes (только Linux)."""
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library("c")
+        if not libc_name:
+            raise OSError("libc не найдена")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError("inotify недоступен")
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self._watches = {}
+
+    def add_watch(self, path):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch {path}")
+        self._watches[wd] = path
+
+    def read_events(self):
+        """Возвращает список (путь, mask) из накопившихся событий."""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            directory = self._watches.get(wd)
+            if directory is not None:
+                events.append((os.path.join(directory, os.fsdecode(name)), mask))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ConfigWatcher:
+    """Следит за папкой конфигов и вызывает on_change() после изменений .conf файлов.
+
+    Использует inotify, а если он недоступен (не Linux, исчерпан лимит
+    наблюдений) — периодически сравнивает mtime и размеры файлов. Серия
+    событий (редактор пишет файл в несколько приёмов) сглаживается: колбэк
+    вызывается один раз, когда изменения затихли на debounce секунд.
+
+    Скрытые папки (.state с индексами, кэшем и состоянием запусков) не
+    просматриваются. Папка сама по себе вызывает перезагрузку, только если
+    в ней есть или были .conf файлы.
+
+    get_envs_dirs возвращает папки из директив Envs текущей конфигурации:
+    .env файлы в них - такие же входы конфигурации, как .conf (их
+    отслеживает и ConfigCache). Список перечитывается после каждого
+    on_change(), поэтому новые Envs подхватываются вместе с конфигом.
+    """
+
+    def __init__(self, directory, on_change, poll_interval=5.0, debounce=1.0, get_envs_dirs=None):
+        self._directory = directory
+        self._on_change = on_change
+        self._poll_interval = poll_interval
+        self._debounce = debounce
+        self._get_envs_dirs = get_envs_dirs
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._config_dirs = set()
+        self._envs_dirs = set()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        try:
+            inotify = self._create_inotify()
+        except OSError as e:
+            print(f"inotify недоступен ({e}), слежу за конфигами опросом раз в {self._poll_interval} с")
+            self._run_polling()
+            return
+
+        try:
+            self._run_inotify(inotify)
+        finally:
+            inotify.close()
+
+    @staticmethod
+    def _walk(directory):
+        """Папки с файлами, как os.walk, но без скрытых папок."""
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = [name for name in dirs if not name.startswith(".")]
+            yield root, files
+
+    def _watch_tree(self, inotify, directory):
+        """Ставит наблюдение на папку и её подпапки; возвращает True, если в них есть конфиги."""
+        found = False
+        for root, files in self._walk(directory):
+            inotify.add_watch(root)
+            if any(file.endswith(".conf") for file in files):
+                self._config_dirs.add(root)
+                found = True
+        return found
+
+    def _forget_tree(self, directory):
+        """Забывает папки с конфигами внутри удалённой папки; возвращает True, если такие были."""
+        removed = {path for path in self._config_dirs if path == directory or path.startswith(directory + os.sep)}
+        self._config_dirs -= removed
+        return bool(removed)
+
+    def _list_envs_dirs(self):
+        if not self._get_envs_dirs:
+            return set()
+        return {os.path.normpath(envs_dir) for envs_dir in self._get_envs_dirs()}
+
+    def _watch_envs(self, inotify):
+        """Ставит наблюдение на папки Envs (без подпапок: .env читаются только из самой папки)."""
+        self._envs_dirs = self._list_envs_dirs()
+        for envs_dir in self._envs_dirs:
+            if os.path.isdir(envs_dir):
+                try:
+                    inotify.add_watch(envs_dir)
+                except OSError as e:
+                    print(f"Не удалось следить за папкой {envs_dir}: {e}")
+
+    def _create_inotify(self):
+        inotify = _Inotify()
+        try:
+            self._watch_tree(inotify, self._directory)
+        except OSError:
+            inotify.close()
+            raise
+        self._watch_envs(inotify)
+        return inotify
+
+    def _run_inotify(self, inotify):
+        pending = False
+        while not self._stop_event.is_set():
+            timeout = self._debounce if pending else 1.0
+            ready, _, _ = select.select([inotify.fd], [], [], timeout)
+            if not ready:
+                if pending:
+                    pending = False
+                    self._notify()
+                    self._watch_envs(inotify)
+                continue
+
+            for path, mask in inotify.read_events():
+                if mask & IN_ISDIR:
+                    if os.path.basename(path).startswith("."):
+                        continue
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        try:
+                            pending |= self._watch_tree(inotify, path)
+                        except OSError as e:
+                            print(f"Не удалось следить за папкой {path}: {e}")
+                    elif mask & (IN_DELETE | IN_MOVED_FROM):
+                        pending |= self._forget_tree(path)
+                elif path.endswith(".conf"):
+                    self._config_dirs.add(os.path.dirname(path))
+                    pending = True
+                elif path.endswith(".env") and os.path.dirname(path) in self._envs_dirs:
+                    pending = True
+
+    def _snapshot(self):
+        state = {}
+        for root, files in self._walk(self._directory):
+            for file in files:
+                if file.endswith(".conf"):
+                    path = os.path.join(root, file)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    state[path] = (stat.st_mtime_ns, stat.st_size)
+        for envs_dir in self._list_envs_dirs():
+            try:
+                names = os.listdir(envs_dir)
+            except OSError:
+                continue
+            for name in names:
+                if name.endswith(".env"):
+                    path = os.path.join(envs_dir, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    state[path] = (stat.st_mtime_ns, stat.st_size)
+        return state
+
+    def _run_polling(self):
+        state = self._snapshot()
+        while not self._stop_event.wait(self._poll_interval):
+            new_state = self._snapshot()
+            if new_state != state:
+                state = new_state
+                self._notify()
+
+    def _notify(self):
+        try:
+            self._on_change()
+        except Exception as e:
+            print(f"Ошибка при применении изменений конфигурации: {e}")
@@ -1,6 +1,7 @@
-from backupZ.backup_config import BackupConfig
+from backupZ.backup_config import BackupConfig, Scripts, Storage
 from backupZ.check_directives.check_main_block_directives import CheckMainBlockDirectives
 from backupZ.check_directives.check_script_block_directives import CheckScriptBlockDirectives
+from backupZ.storages.storage_registry import StorageRegistry
 
 
 class CreateBackupConfigs:
@@ -25,11 +26,76 @@ class CreateBackupConfigs:
                 backup_config.set_time(directive.value)
             elif directive.key == "FileName":
                 backup_config.set_filename(directive.value)
+            elif directive.key == "Format":
+                backup_config.set_format(directive.value)
+            elif directive.key == "Compression":
+                backup_config.set_compression(directive.value)
+            elif directive.key == "CompressionLevel":
+                backup_config.set_compression_level(int(directive.value))
+            elif directive.key == "CompressionWorkers":
+                backup_config.set_compression_workers(int(directive.value))
+            elif directive.key == "VolumeSize":
+                backup_config.set_volume_size(int(directive.value))
+            elif directive.key == "Include":
+                backup_config.add_include(directive.value)
+            elif directive.key == "Exclude":
+                backup_config.add_exclude(directive.value)
+            elif directive.key == "ScanWorkers":
+                backup_config.set_scan_workers(int(directive.value))
+            elif directive.key == "StoreExtensions":
+                backup_config.add_store_extensions(directive.value.replace(",", " ").split())
+            elif directive.key == "CompressExtensions":
+                backup_config.add_compress_extensions(directive.value.replace(",", " ").split())
+            elif directive.key == "IncompressibleRatio":
+                backup_config.set_incompressible_ratio(int(directive.value))
+            elif directive.key == "ThrottleLoad":
+                backup_config.set_throttle_limit("load", float(directive.value))
+            elif directive.key == "ThrottleIOPressure":
+                backup_config.set_throttle_limit("io_pressure", float(directive.value))
+            elif directive.key == "ThrottleLatency":
+                backup_config.set_throttle_limit("latency", float(directive.value))
+            elif directive.key == "ThrottleMinimum":
+                backup_config.set_throttle_minimum(int(directive.value))
 
     def _fill_backup_config_blocks(self, main_block, backup_config):
         for block in main_block.blocks:
             if block.name == "Scripts":
-                pass
+                self._fill_backup_config_scripts(block, backup_config)
+            elif block.name == "Storages":
+                self._fill_backup_config_storages(block, backup_config)
+
+    def _fill_backup_config_scripts(self, scripts_block, backup_config):
+        scripts = Scripts()
+        for directive in scripts_block.directives:
+            if directive.key == "Dir":
+                scripts.set_dir(directive.value)
+            elif directive.key == "BeforeCommand":
+                scripts.set_before_command(directive.value)
+            elif directive.key == "AfterCommand":
+                scripts.set_after_command(directive.value)
+            elif directive.key == "ScriptExitCode":
+                scripts.set_script_exit_code(int(directive.value))
+            elif directive.key == "SourceCommand":
+                scripts.set_source_command(directive.value)
+            elif directive.key == "SourceName":
+                scripts.set_source_name(directive.value)
+            elif directive.key == "Timeout":
+                scripts.set_timeout(int(directive.value))
+        backup_config.add_script(scripts)
+
+    def _fill_backup_config_storages(self, storages_block, backup_config):
+        for block in storages_block.blocks:
+            if not StorageRegistry.is_registered(block.name):
+                print(f"Неизвестное хранилище {block.name} в файле: {block.source_file} строка: {block.line_num}. "
+                      f"Доступны: {', '.join(StorageRegistry.get_names())}. Пропускаю его.")
+                continue
+            storage = Storage(block.name)
+            for directive in block.directives:
+                if directive.key == "Dir":
+                    storage.set_dir(directive.value)
+                else:
+                    storage.set_param(directive.key, directive.value)
+            backup_config.add_storage(storage)
 
     def create_configs(self):
         backup_configs = []
@@ -51,5 +117,7 @@ class CreateBackupConfigs:
 
             self._fill_backup_config_blocks(main_block, backup_config)
 
-            print(backup_config)
+            backup_configs.append(backup_config)
+
+        return backup_configs
 
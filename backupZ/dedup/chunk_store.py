@@ -0,0 +1,64 @@
+import hashlib
+import io
+import zlib
+
+from backupZ.throttle.adaptive_throttle import ThrottledReader
+
+
+class ChunkStore:
+    """Хранилище блоков с адресацией по содержимому поверх BackupUploader.
+
+    Блоки лежат в папке chunks внутри Dir хранилища под именем sha256 от
+    несжатых данных, манифесты запусков — в папке manifests. Список уже
+    загруженных блоков читается один раз при open(), поэтому проверка
+    существования блока не требует запросов к хранилищу.
+    С throttle (AdaptiveThrottle) загрузка блоков учитывается как "upload".
+    """
+
+    CHUNKS_DIR = "chunks"
+    MANIFESTS_DIR = "manifests"
+
+    def __init__(self, uploader, remote_path, compresslevel=6, throttle=None):
+        self._uploader = uploader
+        self._remote_path = remote_path
+        self._compresslevel = compresslevel
+        self._throttle = throttle
+        self._chunks_path = None
+        self._manifests_path = None
+        self._known_chunks = set()
+
+    def open(self):
+        self._chunks_path = self._uploader.ensure_dir(self.CHUNKS_DIR, self._remote_path)
+        self._manifests_path = self._uploader.ensure_dir(self.MANIFESTS_DIR, self._remote_path)
+        self._known_chunks = set(self._uploader.list_file_names(self._chunks_path))
+
+    def has(self, digest):
+        return digest in self._known_chunks
+
+    def put(self, digest, data):
+        """Загружает блок, если его ещё нет в хранилище. Возвращает True, если блок загружен."""
+        if digest in self._known_chunks:
+            return False
+        compressed = zlib.compress(data, self._compresslevel)
+        stream = io.BytesIO(compressed)
+        if self._throttle is not None:
+            stream = ThrottledReader(stream, self._throttle, "upload")
+        self._uploader.upload_stream(stream, digest, self._chunks_path)
+        self._known_chunks.add(digest)
+        return True
+
+    def get(self, digest):
+        buffer = io.BytesIO()
+        self._uploader.download_stream(digest, self._chunks_path, buffer)
+        data = zlib.decompress(buffer.getvalue())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Блок {digest} повреждён: хеш не совпадает")
+        return data
+
+    def put_manifest(self, name, data):
+        self._uploader.upload_stream(io.BytesIO(data), name, self._manifests_path)
+
+    def get_manifest(self, name):
+        buffer = io.BytesIO()
+        self._uploader.download_stream(name, self._manifests_path, buffer)
+        return buffer.getvalue()
@@ -0,0 +1,162 @@
+import hashlib
+import os
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+
+
+def _build_gear_table():
+    """Детерминированная таблица случайных 64-битных значений для gear-хеша."""
+    table = []
+    for i in range(256):
+        digest = hashlib.sha256(b"backupZ-gear" + bytes([i])).digest()
+        table.append(int.from_bytes(digest[:8], "little"))
+    return table
+
+
+_GEAR = _build_gear_table()
+
+
+_MASK64 = (1 << 64) - 1
+# Хеш на позиции зависит только от последних 64 байт: остальные уже вытеснены сдвигом
+_WINDOW = 64
+
+
+def find_cut_points(data, mask):
+    """Позиции p (от _WINDOW до len(data)), где у gear-хеша байтов data[p - 64:p] нулевые биты mask.
+
+    Выполняется в пуле процессов на отрезках файла: отрезки перекрываются на
+    _WINDOW - 1 байт, поэтому кандидаты в границы на них ищутся независимо.
+    """
+    gear = _GEAR
+    mask64 = _MASK64
+    h = 0
+    for byte in data[:_WINDOW - 1]:
+        h = ((h << 1) + gear[byte]) & mask64
+    points = []
+    position = _WINDOW - 1
+    for byte in data[_WINDOW - 1:]:
+        h = ((h << 1) + gear[byte]) & mask64
+        position += 1
+        if not h & mask:
+            points.append(position)
+    return points
+
+
+class ContentChunker:
+    """Разбиение данных на блоки по содержимому (rolling gear hash, как в FastCDC).
+
+    Граница блока ставится там, где младшие биты скользящего хеша равны нулю,
+    поэтому вставка байта в начало файла сдвигает только соседние границы,
+    а остальные блоки и их хеши остаются прежними.
+
+    Хеш считается побайтно на Python, поэтому кандидаты в границы ищутся в
+    пуле из workers процессов отрезками по segment_size (find_cut_points),
+    а границы из них выбираются по порядку; разбиение то же, что без пула.
+    Файлы меньше отрезка обрабатываются без пула. После работы пул
+    закрывается close().
+    """
+
+    _GEAR = _GEAR
+
+    def __init__(self, min_size=256 * 1024, avg_size=1024 * 1024, max_size=4 * 1024 * 1024, workers=0,
+                 segment_size=4 * 1024 * 1024):
+        if not min_size <= avg_size <= max_size:
+            raise ValueError("Должно выполняться min_size <= avg_size <= max_size")
+        self.min_size = min_size
+        self.avg_size = avg_size
+        self.max_size = max_size
+        bits = max(avg_size.bit_length() - 1, 1)
+        # Маска на старших битах: у gear-хеша они зависят от более длинного окна
+        self._mask = ((1 << bits) - 1) << (64 - bits)
+        self._workers = workers or os.cpu_count() or 1
+        self._segment_size = segment_size
+        self._pool = None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _read_ahead(self):
+        # С пулом в буфере держим по отрезку на каждый процесс
+        return 0 if self._workers == 1 else self._workers * self._segment_size
+
+    def _scan(self, data, position, end):
+        """Хеш от position, как у одиночного блока: до первых _WINDOW байт окно ещё не заполнено."""
+        gear = self._GEAR
+        mask = self._mask
+        h = 0
+        for byte in data[position:end]:
+            h = ((h << 1) + gear[byte]) & _MASK64
+            position += 1
+            if not h & mask:
+                return position
+        return None
+
+    def _find_cut_points(self, data, start, end):
+        """Кандидаты в границы на позициях (start, end] буфера data по возрастанию."""
+        if end - start <= self._segment_size:
+            offset = max(start - _WINDOW + 1, 0)
+            return [offset + point for point in find_cut_points(data[offset:end], self._mask)]
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self._workers)
+        futures = []
+        with memoryview(data) as view:
+            for segment_start in range(start, end, self._segment_size):
+                offset = max(segment_start - _WINDOW + 1, 0)
+                segment = view[offset:min(segment_start + self._segment_size, end)].tobytes()
+                futures.append((offset, self._pool.submit(find_cut_points, segment, self._mask)))
+        return [offset + point for offset, future in futures for point in future.result()]
+
+    def _next_boundary(self, data, start, cut_points):
+        """Конец блока, начинающегося с start; cut_points - кандидаты на всём буфере по возрастанию или None."""
+        remaining = len(data) - start
+        if remaining <= self.min_size:
+            return len(data)
+
+        end = start + min(remaining, self.max_size)
+        position = start + self.min_size
+        if cut_points is None:
+            # Без пула хеш считается только от min_size до границы, как раньше
+            boundary = self._scan(data, position, end)
+            return end if boundary is None else boundary
+        # Первые _WINDOW байт хеш считается с нуля, дальше он совпадает с хешем окна
+        boundary = self._scan(data, position, min(position + _WINDOW - 1, end))
+        if boundary is not None:
+            return boundary
+        index = bisect_left(cut_points, position + _WINDOW)
+        if index < len(cut_points) and cut_points[index] <= end:
+            return cut_points[index]
+        return end
+
+    def iter_chunks(self, fileobj, read_size=8 * 1024 * 1024):
+        """Читает файловый объект и отдаёт блоки bytes."""
+        buffer = bytearray()
+        cut_points = None if self._workers == 1 else []
+        start = 0
+        eof = False
+        while True:
+            if not eof and len(buffer) - start < self.max_size:
+                # Сдвигаем буфер вместо среза на каждый блок
+                del buffer[:start]
+                scanned = len(buffer)
+                while not eof and len(buffer) < self.max_size + self._read_ahead():
+                    data = fileobj.read(max(read_size, self.max_size))
+                    if not data:
+                        eof = True
+                        break
+                    buffer += data
+                if cut_points is not None:
+                    cut_points = [point - start for point in cut_points if point > start]
+                    cut_points += self._find_cut_points(buffer, scanned, len(buffer))
+                start = 0
+
+            if start >= len(buffer):
+                return
+
+            end = self._next_boundary(buffer, start, cut_points)
+            with memoryview(buffer) as view:
+                chunk = view[start:end].tobytes()
+            start = end
+            yield chunk
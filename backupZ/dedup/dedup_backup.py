@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from backupZ.archive.stream_archiver import walk_files
+from backupZ.dedup.content_chunker import ContentChunker
+from backupZ.index.file_state_index import FileState
+from backupZ.throttle.adaptive_throttle import ThrottledReader
+
+
+class DedupBackup:
+    """Инкрементальный бэкап в формате блоков с дедупликацией.
+
+    Каждый файл из Dir режется ContentChunker'ом, новые блоки загружаются
+    во все хранилища, уже существующие пропускаются. Запуск описывается
+    манифестом: список файлов и хешей их блоков. Для восстановления любого
+    запуска достаточно его манифеста и папки с блоками.
+
+    С FileStateIndex файлы с неизменившимися метаданными не читаются:
+    их запись в манифесте берётся из индекса.
+    С throttle (AdaptiveThrottle) чтение файлов замедляется под нагрузкой;
+    загрузку блоков ограничивают ChunkStore с тем же throttle.
+    """
+
+    MANIFEST_VERSION = 1
+
+    def __init__(self, source_dir, chunk_stores, chunker=None, file_index=None, scanner=None, throttle=None):
+        self._source_dir = source_dir
+        self._throttle = throttle
+        self._scanner = scanner
+        self._chunk_stores = list(chunk_stores)
+        self._chunker = chunker or ContentChunker()
+        self._file_index = file_index
+
+    def _iter_file_states(self):
+        entries = self._scanner.scan() if self._scanner else walk_files(self._source_dir)
+        if self._file_index:
+            yield from self._file_index.scan(self._source_dir, entries)
+            return
+
+        for path, rel_path, stat in entries:
+            yield FileState(path, rel_path.replace(os.sep, "/"), stat.st_size, stat.st_mtime_ns, stat.st_ino,
+                            stat.st_mode, True)
+
+    def _all_chunks_stored(self, chunks, errors):
+        return all(store.has(digest) for store in self._chunk_stores if not errors[store] for digest, _ in chunks)
+
+    def _store_file(self, state, errors):
+        """Режет файл на блоки, загружает новые и возвращает запись манифеста и хеш файла."""
+        chunks = []
+        uploaded = 0
+        file_hash = hashlib.sha256()
+        with open(state.path, "rb") as file:
+            reader = file if self._throttle is None else ThrottledReader(file, self._throttle, "read")
+            for data in self._chunker.iter_chunks(reader):
+                digest = hashlib.sha256(data).hexdigest()
+                file_hash.update(data)
+                for store in self._chunk_stores:
+                    if errors[store]:
+                        continue
+                    try:
+                        if store.put(digest, data):
+                            uploaded += 1
+                    except Exception as e:
+                        errors[store] = e
+                chunks.append([digest, len(data)])
+
+        entry = {
+            "path": state.rel_path,
+            "size": state.size,
+            "mode": state.mode & 0o7777,
+            "mtime": state.mtime_ns / 1e9,
+            "chunks": chunks
+        }
+        return entry, file_hash.hexdigest(), uploaded
+
+    def run(self, run_name):
+        """Выполняет бэкап и возвращает словарь {хранилище: исключение или None}."""
+        errors = {store: None for store in self._chunk_stores}
+        manifest = {
+            "version": self.MANIFEST_VERSION,
+            "name": run_name,
+            "created": datetime.now().isoformat(),
+            "files": []
+        }
+        uploaded_chunks = 0
+        read_files = 0
+
+        if self._file_index:
+            self._file_index.begin_run()
+
+        try:
+            for state in self._iter_file_states():
+                if not state.changed and state.data:
+                    entry = json.loads(state.data)
+                    if self._all_chunks_stored(entry["chunks"], errors):
+                        manifest["files"].append(entry)
+                        continue
+
+                entry, file_hash, uploaded = self._store_file(state, errors)
+                uploaded_chunks += uploaded
+                read_files += 1
+                manifest["files"].append(entry)
+                if self._file_index:
+                    self._file_index.update(state, file_hash, json.dumps(entry, separators=(",", ":")))
+
+            manifest_data = json.dumps(manifest, separators=(",", ":")).encode("utf-8")
+            for store in self._chunk_stores:
+                if errors[store]:
+                    continue
+                try:
+                    store.put_manifest(self.manifest_name(run_name), manifest_data)
+                except Exception as e:
+                    errors[store] = e
+        except Exception:
+            if self._file_index:
+                self._file_index.finish_run(success=False)
+            raise
+        finally:
+            self._chunker.close()
+
+        if self._file_index:
+            self._file_index.finish_run(success=not any(errors.values()))
+
+        print(f"Бэкап {run_name}: файлов {len(manifest['files'])}, прочитано {read_files}, загружено новых блоков {uploaded_chunks}")
+        return errors
+
+    @staticmethod
+    def manifest_name(run_name):
+        return f"{run_name}.json"
+
+    @staticmethod
+    def restore(chunk_store, run_name, target_dir):
+        """Восстанавливает запуск run_name из манифеста в target_dir."""
+        manifest = json.loads(chunk_store.get_manifest(DedupBackup.manifest_name(run_name)))
+        if manifest.get("version") != DedupBackup.MANIFEST_VERSION:
+            raise ValueError(f"Неподдерживаемая версия манифеста: {manifest.get('version')}")
+
+        for entry in manifest["files"]:
+            path = os.path.join(target_dir, *entry["path"].split("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as file:
+                for digest, _ in entry["chunks"]:
+                    file.write(chunk_store.get(digest))
+            os.chmod(path, entry["mode"])
+            os.utime(path, (entry["mtime"], entry["mtime"]))
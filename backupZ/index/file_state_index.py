@@ -0,0 +1,195 @@
+import os
+import posixpath
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from backupZ.archive.stream_archiver import walk_files
+
+
+@dataclass
+class FileState:
+    """Состояние файла на диске и его сравнение с последним успешным запуском."""
+    path: str
+    rel_path: str
+    size: int
+    mtime_ns: int
+    inode: int
+    mode: int
+    changed: bool
+    content_hash: Optional[str] = None
+    data: Optional[str] = None
+
+
+class FileStateIndex:
+    """Локальный индекс состояния файлов одного блока <Backup> в SQLite.
+
+    Для каждого файла хранятся размер, mtime, inode и хеш содержимого на
+    момент последнего успешного запуска. Проход по Dir делает только stat(),
+    файлы с неизменившимися метаданными не открываются.
+
+    Индексом пользуется только дедуплицирующий бэкап (DedupBackup): в
+    zip-архив попадают данные каждого файла, поэтому обычный бэкап читает
+    Dir целиком при любом состоянии индекса.
+
+    Изменения запуска пишутся в таблицу pending и переносятся в files одной
+    транзакцией в finish_run(). Если процесс упадёт посередине, индекс
+    останется в состоянии последнего успешного запуска.
+    """
+
+    BATCH_SIZE = 1000
+    # Не больше 999 параметров в запросе - предел SQLite до 3.32
+    LOOKUP_BATCH = 500
+
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._connection = sqlite3.connect(db_path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._create_tables()
+        self._run_id = None
+        self._pending = []
+        self._seen = []
+
+    def _create_tables(self):
+        with self._connection:
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    inode INTEGER NOT NULL,
+                    content_hash TEXT,
+                    data TEXT
+                );
+                CREATE TABLE IF NOT EXISTS pending (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    inode INTEGER NOT NULL,
+                    content_hash TEXT,
+                    data TEXT
+                );
+                CREATE TABLE IF NOT EXISTS runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    started TEXT NOT NULL,
+                    finished TEXT,
+                    success INTEGER NOT NULL DEFAULT 0
+                );
+            """)
+            self._connection.execute("CREATE TEMP TABLE IF NOT EXISTS seen (path TEXT PRIMARY KEY)")
+
+    def begin_run(self):
+        """Начинает запуск, отбрасывая незавершённые изменения прошлого (упавшего) запуска."""
+        with self._connection:
+            self._connection.execute("DELETE FROM pending")
+            self._connection.execute("DELETE FROM seen")
+            cursor = self._connection.execute(
+                "INSERT INTO runs (started) VALUES (?)", (datetime.now().isoformat(),)
+            )
+        self._run_id = cursor.lastrowid
+        return self._run_id
+
+    def last_successful_run(self):
+        row = self._connection.execute(
+            "SELECT id, started, finished FROM runs WHERE success = 1 ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+        return row
+
+    def scan(self, source_dir, entries=None):
+        """Проходит Dir по метаданным и отдаёт FileState для каждого файла.
+
+        entries - готовый обход (тройки путь, относительный путь, stat), например от ParallelScanner.
+        Файлы одной папки сверяются с индексом одним запросом (до LOOKUP_BATCH файлов).
+        """
+        batch = []
+        directory = None
+        for path, rel_path, stat in entries if entries is not None else walk_files(source_dir):
+            rel_path = rel_path.replace(os.sep, "/")
+            parent = posixpath.dirname(rel_path)
+            if batch and (parent != directory or len(batch) >= self.LOOKUP_BATCH):
+                yield from self._check_batch(batch)
+                batch = []
+            directory = parent
+            batch.append((path, rel_path, stat))
+        if batch:
+            yield from self._check_batch(batch)
+
+    def check(self, path, rel_path, stat):
+        """Сравнивает stat файла с состоянием последнего успешного запуска."""
+        rel_path = rel_path.replace(os.sep, "/")
+        return self._compare(path, rel_path, stat, self._lookup([rel_path]).get(rel_path))
+
+    def _check_batch(self, batch):
+        rows = self._lookup([rel_path for _, rel_path, _ in batch])
+        for path, rel_path, stat in batch:
+            yield self._compare(path, rel_path, stat, rows.get(rel_path))
+
+    def _lookup(self, rel_paths):
+        placeholders = ", ".join("?" * len(rel_paths))
+        cursor = self._connection.execute(
+            f"SELECT path, size, mtime_ns, inode, content_hash, data FROM files WHERE path IN ({placeholders})",
+            rel_paths
+        )
+        return {row[0]: row[1:] for row in cursor}
+
+    def _compare(self, path, rel_path, stat, row):
+        self._seen.append((rel_path,))
+        if len(self._seen) >= self.BATCH_SIZE:
+            self._flush()
+
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns and row[2] == stat.st_ino:
+            return FileState(path, rel_path, stat.st_size, stat.st_mtime_ns, stat.st_ino,
+                             stat.st_mode, False, row[3], row[4])
+        return FileState(path, rel_path, stat.st_size, stat.st_mtime_ns, stat.st_ino, stat.st_mode, True)
+
+    def iter_changed(self, source_dir):
+        """Файлы, изменившиеся или появившиеся с последнего успешного запуска."""
+        return (state for state in self.scan(source_dir) if state.changed)
+
+    def iter_deleted(self):
+        """Пути файлов, пропавших с последнего успешного запуска (вызывать после scan)."""
+        self._flush()
+        for (path,) in self._connection.execute(
+                "SELECT path FROM files WHERE path NOT IN (SELECT path FROM seen)"):
+            yield path
+
+    def update(self, state, content_hash, data=None):
+        """Запоминает новое состояние файла; попадёт в индекс при успешном finish_run()."""
+        self._pending.append((state.rel_path, state.size, state.mtime_ns, state.inode, content_hash, data))
+        if len(self._pending) >= self.BATCH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        with self._connection:
+            if self._pending:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO pending (path, size, mtime_ns, inode, content_hash, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", self._pending
+                )
+                self._pending = []
+            if self._seen:
+                self._connection.executemany("INSERT OR IGNORE INTO seen (path) VALUES (?)", self._seen)
+                self._seen = []
+
+    def finish_run(self, success=True):
+        """Завершает запуск. При успехе атомарно применяет накопленные изменения."""
+        self._flush()
+        with self._connection:
+            if success:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO files (path, size, mtime_ns, inode, content_hash, data) "
+                    "SELECT path, size, mtime_ns, inode, content_hash, data FROM pending"
+                )
+                self._connection.execute("DELETE FROM files WHERE path NOT IN (SELECT path FROM seen)")
+            self._connection.execute("DELETE FROM pending")
+            self._connection.execute(
+                "UPDATE runs SET finished = ?, success = ? WHERE id = ?",
+                (datetime.now().isoformat(), int(success), self._run_id)
+            )
+            self._connection.execute("DELETE FROM seen")
+        self._run_id = None
+
+    def close(self):
+        self._connection.close()
@@ -0,0 +1,22 @@
+import hashlib
+
+
+class ArchiveDigest:
+    """MD5 и SHA-256 данных, которые считаются по ходу чтения потока.
+
+    MD5 нужен для сравнения с тем, что возвращают хранилища (Drive
+    md5Checksum, Яндекс md5), SHA-256 - как стойкая контрольная сумма.
+    """
+
+    def __init__(self):
+        self._md5 = hashlib.md5()
+        self._sha256 = hashlib.sha256()
+        self.size = 0
+
+    def update(self, data):
+        self._md5.update(data)
+        self._sha256.update(data)
+        self.size += len(data)
+
+    def to_dict(self):
+        return {"size": self.size, "md5": self._md5.hexdigest(), "sha256": self._sha256.hexdigest()}
@@ -0,0 +1,43 @@
+class BackupVerifier:
+    """Сверяет загруженные файлы с локальными контрольными суммами по метаданным хранилища.
+
+    Файлы не скачиваются: сравниваются размер и те хеши, которые хранилище
+    отдаёт само (MD5 и, если есть, SHA-256). Итог по файлу:
+    verified, mismatch, missing или unverifiable (хранилище не вернуло хешей).
+    """
+
+    @staticmethod
+    def compare(expected, remote):
+        if remote is None:
+            return "missing"
+        if remote.get("size") is not None and remote["size"] != expected["size"]:
+            return "mismatch"
+
+        compared = False
+        for key in ("sha256", "md5"):
+            if remote.get(key) and expected.get(key):
+                if remote[key].lower() != expected[key].lower():
+                    return "mismatch"
+                compared = True
+        return "verified" if compared else "unverifiable"
+
+    def verify(self, uploader, remote_path, files):
+        """files - список словарей name, size, md5, sha256; возвращает {имя файла: итог}."""
+        results = {}
+        for expected in files:
+            try:
+                remote = uploader.get_checksums(expected["name"], remote_path)
+            except Exception as e:
+                print(f"Не удалось получить контрольные суммы {expected['name']}: {e}")
+                results[expected["name"]] = "unverifiable"
+                continue
+            results[expected["name"]] = self.compare(expected, remote)
+        return results
+
+    @staticmethod
+    def summarize(results):
+        """Худший итог по набору файлов."""
+        for status in ("missing", "mismatch", "unverifiable"):
+            if status in results.values():
+                return status
+        return "verified"
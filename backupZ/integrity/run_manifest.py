@@ -0,0 +1,34 @@
+import json
+import os
+
+
+class RunManifest:
+    """Локальные манифесты запусков блока: что и куда загружено, контрольные суммы и итог проверки.
+
+    Каждый запуск - отдельный JSON в <manifests_dir>/<id блока>/, имя файла
+    по времени запуска, поэтому записи упорядочены и не мешают друг другу.
+    """
+
+    def __init__(self, manifests_dir, job_id):
+        self._dir = os.path.join(manifests_dir, job_id)
+
+    def save(self, record):
+        os.makedirs(self._dir, exist_ok=True)
+        path = os.path.join(self._dir, f"{record['started'].replace(':', '-')}.json")
+        tmp_file = f"{path}.tmp"
+        with open(tmp_file, 'w') as file:
+            json.dump(record, file, indent=2)
+        os.replace(tmp_file, path)
+        return path
+
+    def iter_records(self, newest_first=False):
+        if not os.path.isdir(self._dir):
+            return
+        for name in sorted(os.listdir(self._dir), reverse=newest_first):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self._dir, name), 'r') as file:
+                    yield json.load(file)
+            except (OSError, ValueError) as e:
+                print(f"Не удалось прочитать манифест {name}: {e}")
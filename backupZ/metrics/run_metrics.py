@@ -0,0 +1,220 @@
+import resource
+import threading
+import time
+from contextlib import contextmanager
+
+_STATUS_PATH = "/proc/self/status"
+_CLEAR_REFS_PATH = "/proc/self/clear_refs"
+
+
+def read_peak_rss():
+    """Пик резидентной памяти процесса (VmHWM) в байтах или None без /proc."""
+    try:
+        with open(_STATUS_PATH, 'r') as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def reset_peak_rss():
+    """Сбрасывает VmHWM до текущего RSS (Linux 4.0+); False, если ядро не позволяет."""
+    try:
+        with open(_CLEAR_REFS_PATH, 'w') as file:
+            file.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class PhaseHook:
+    """Базовый класс для своих профилировщиков: вызывается на входе и выходе из каждой фазы.
+
+    Регистрируется через RunMetrics.add_hook(); исключения в хуках не ломают бэкап.
+    """
+
+    def on_start(self, run_name, phase):
+        pass
+
+    def on_end(self, run_name, phase):
+        pass
+
+
+class Phase:
+    """Один замер фазы; счётчики можно дополнять внутри with metrics.phase(...)."""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.excluded = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.retries = 0
+        self.error = None
+
+
+class RunMetrics:
+    """Метрики одного запуска бэкапа по фазам: scan, scripts, compression, upload:<хранилище>, verify, cleanup:<хранилище>.
+
+    По каждой фазе копятся длительность, байты на входе и выходе, повторы
+    и ошибки; фазы одного имени из разных потоков складываются.
+
+    Пик памяти считается за время запуска: в начале VmHWM процесса
+    сбрасывается, а пики, набранные до сброса, достаются идущим
+    параллельно запускам. Это пик всего процесса, пока шёл запуск, включая
+    соседние запуски. Без /proc/self/clear_refs отдаётся пик за всё время
+    жизни процесса, и peak_rss_scope равен "process".
+    """
+
+    _hooks = []
+    _hooks_lock = threading.Lock()
+    # Запуски, у которых идёт замер пика памяти
+    _rss_runs = set()
+    _rss_lock = threading.Lock()
+
+    def __init__(self, run_name):
+        self.run_name = run_name
+        self.started = time.time()
+        self.finished = None
+        self._started_perf = time.perf_counter()
+        self._lock = threading.Lock()
+        self._phases = {}
+        self._values = {}
+        self._peak_rss = None
+        self._start_peak_rss()
+
+    def _start_peak_rss(self):
+        with self._rss_lock:
+            peak = read_peak_rss()
+            if peak is None:
+                return
+            for run in self._rss_runs:
+                run._peak_rss = max(run._peak_rss, peak)
+            if reset_peak_rss():
+                self._peak_rss = 0
+                self._rss_runs.add(self)
+
+    def _get_peak_rss(self):
+        """Пик памяти и его охват: "run" - за время запуска, "process" - за жизнь процесса."""
+        with self._rss_lock:
+            if self._peak_rss is None:
+                # ru_maxrss в КБ на Linux
+                return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024, "process"
+            if self in self._rss_runs:
+                return max(self._peak_rss, read_peak_rss() or 0), "run"
+            return self._peak_rss, "run"
+
+    @classmethod
+    def add_hook(cls, hook):
+        with cls._hooks_lock:
+            cls._hooks.append(hook)
+
+    @classmethod
+    def remove_hook(cls, hook):
+        with cls._hooks_lock:
+            cls._hooks.remove(hook)
+
+    def _call_hooks(self, method, phase):
+        for hook in list(self._hooks):
+            try:
+                getattr(hook, method)(self.run_name, phase)
+            except Exception as e:
+                print(f"Ошибка в хуке метрик {hook!r}: {e}")
+
+    @contextmanager
+    def phase(self, name):
+        phase = Phase(name)
+        self._call_hooks("on_start", phase)
+        try:
+            yield phase
+        except BaseException as e:
+            phase.error = e
+            raise
+        finally:
+            phase.duration = time.perf_counter() - phase.started - phase.excluded
+            self.record(name, phase.duration, phase.bytes_in, phase.bytes_out, phase.retries, phase.error is not None)
+            self._call_hooks("on_end", phase)
+
+    def record(self, name, duration=0.0, bytes_in=0, bytes_out=0, retries=0, failed=False, items=0, calls=1):
+        """Добавляет замер к фазе; calls=0 - только дополнить счётчики, не считая отдельным вызовом."""
+        with self._lock:
+            stats = self._phases.setdefault(name, {
+                "duration": 0.0, "bytes_in": 0, "bytes_out": 0, "retries": 0, "items": 0, "count": 0, "errors": 0
+            })
+            stats["duration"] += duration
+            stats["bytes_in"] += bytes_in
+            stats["bytes_out"] += bytes_out
+            stats["retries"] += retries
+            stats["items"] += items
+            stats["count"] += calls
+            stats["errors"] += int(failed)
+
+    def set_value(self, name, value):
+        """Отдельное числовое значение запуска, например наименьший коэффициент троттлинга."""
+        with self._lock:
+            self._values[name] = value
+
+    def get(self, name):
+        """Копия накопленных счётчиков фазы (пустой словарь, если фазы не было)."""
+        with self._lock:
+            return dict(self._phases.get(name, {}))
+
+    def timed_iter(self, name, iterable, size=None):
+        """Считает время, проведённое внутри итератора (например обхода Dir), число и объём его элементов.
+
+        Итог записывается, когда итератор исчерпан или закрыт, поэтому незавершённый обход стоит закрывать явно.
+        """
+        iterator = iter(iterable)
+        duration = 0.0
+        count = 0
+        total = 0
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    duration += time.perf_counter() - started
+                    break
+                duration += time.perf_counter() - started
+                count += 1
+                if size is not None:
+                    total += size(item)
+                yield item
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+            self.record(name, duration, bytes_in=total, items=count)
+
+    def finish(self):
+        self.finished = time.time()
+        with self._rss_lock:
+            if self in self._rss_runs:
+                self._peak_rss = max(self._peak_rss, read_peak_rss() or 0)
+                self._rss_runs.discard(self)
+
+    def to_dict(self):
+        with self._lock:
+            phases = {name: dict(stats) for name, stats in self._phases.items()}
+            values = dict(self._values)
+        for stats in phases.values():
+            moved = max(stats["bytes_in"], stats["bytes_out"])
+            stats["throughput_bytes_per_s"] = moved / stats["duration"] if moved and stats["duration"] > 0 else None
+
+        peak_rss, peak_rss_scope = self._get_peak_rss()
+        # Дочерние процессы - пулы сжатия и разбиения на блоки; ядро отдаёт только пик за жизнь процесса
+        return {
+            "run": self.run_name,
+            "started": self.started,
+            "finished": self.finished,
+            "duration": (self.finished or time.time()) - self.started,
+            "peak_rss_bytes": peak_rss,
+            "peak_rss_scope": peak_rss_scope,
+            "peak_rss_children_bytes": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024,
+            "phases": phases,
+            "values": values
+        }
@@ -0,0 +1,75 @@
+import json
+import os
+
+
+class RunReport:
+    """Пишет метрики запуска в JSON-отчёт и в файл для textfile collector node_exporter."""
+
+    PREFIX = "backupz"
+
+    def __init__(self, job_id, metrics, results):
+        self._job_id = job_id
+        self._metrics = metrics.to_dict()
+        self._results = {name: str(error) if error else None for name, error in results.items()}
+
+    def to_dict(self):
+        return dict(self._metrics, job=self._job_id, storages=self._results,
+                    success=all(error is None for error in self._results.values()))
+
+    @staticmethod
+    def _write_atomic(path, text):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_file = f"{path}.tmp"
+        with open(tmp_file, 'w') as file:
+            file.write(text)
+        os.replace(tmp_file, path)
+
+    def write_json(self, path):
+        self._write_atomic(path, json.dumps(self.to_dict(), indent=2))
+
+    @staticmethod
+    def _label(value):
+        return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+    def _phase_labels(self, job, phase):
+        # "upload:GoogleDrive" -> phase="upload",storage="GoogleDrive"
+        name, _, storage = phase.partition(":")
+        labels = f'{job},phase="{self._label(name)}"'
+        if storage:
+            labels += f',storage="{self._label(storage)}"'
+        return labels
+
+    def to_prometheus(self):
+        report = self.to_dict()
+        job = f'job_id="{self._label(self._job_id)}"'
+        lines = []
+
+        def metric(name, help_text, samples):
+            lines.append(f"# HELP {self.PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {self.PREFIX}_{name} gauge")
+            for labels, value in samples:
+                lines.append(f"{self.PREFIX}_{name}{{{labels}}} {value}")
+
+        metric("run_success", "1 if the last run uploaded to every storage", [(job, int(report["success"]))])
+        metric("run_timestamp_seconds", "Start time of the last run", [(job, report["started"])])
+        metric("run_duration_seconds", "Duration of the last run", [(job, report["duration"])])
+        metric("peak_rss_bytes", "Peak resident memory of the process during the last run "
+               "(over the process lifetime if scope is process)",
+               [(f'{job},scope="{report["peak_rss_scope"]}"', report["peak_rss_bytes"])])
+
+        for name, value in sorted(report["values"].items()):
+            metric(name, f"{name} of the last run", [(job, value)])
+
+        phases = sorted(report["phases"].items())
+        for key, name, help_text in (
+                ("duration", "phase_duration_seconds", "Time spent in a phase of the last run"),
+                ("bytes_in", "phase_bytes_in", "Bytes read by a phase of the last run"),
+                ("bytes_out", "phase_bytes_out", "Bytes written by a phase of the last run"),
+                ("retries", "phase_retries", "Retries in a phase of the last run"),
+                ("errors", "phase_errors", "Failed calls in a phase of the last run")):
+            metric(name, help_text, [(self._phase_labels(job, phase), stats[key]) for phase, stats in phases])
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        self._write_atomic(path, self.to_prometheus())
@@ -0,0 +1,73 @@
+import json
+import posixpath
+
+INDEX_SUFFIX = ".index.json"
+INDEX_VERSION = 1
+
+
+class ArchiveIndex:
+    """Индекс zip-архива бэкапа: где в архиве лежат сжатые данные каждого файла.
+
+    Загружается рядом с архивом как "<имя архива>.index.json". Для
+    многотомного бэкапа смещения считаются в архиве целиком, а locate()
+    переводит их в тома "<имя>.001", "<имя>.002", ...
+    """
+
+    def __init__(self, archive, entries, size=0, volume_size=0):
+        self.archive = archive
+        self.entries = entries
+        self.size = size
+        self.volume_size = volume_size
+
+    @staticmethod
+    def index_name(archive):
+        return f"{archive}{INDEX_SUFFIX}"
+
+    def to_json(self):
+        return json.dumps({
+            "version": INDEX_VERSION,
+            "archive": self.archive,
+            "size": self.size,
+            "volume_size": self.volume_size,
+            "entries": self.entries
+        })
+
+    @classmethod
+    def from_json(cls, data):
+        index = json.loads(data)
+        if index.get("version") != INDEX_VERSION:
+            raise ValueError(f"Неподдерживаемая версия индекса архива: {index.get('version')}")
+        return cls(index["archive"], index["entries"], index["size"], index["volume_size"])
+
+    def select(self, paths=None):
+        """Записи для восстановления: все или совпадающие с путями (путь папки выбирает её содержимое)."""
+        if not paths:
+            return list(self.entries)
+        prefixes = [path.strip("/") for path in paths]
+        return [
+            entry for entry in self.entries
+            if any(entry["name"] == prefix or entry["name"].startswith(f"{prefix}/") for prefix in prefixes)
+        ]
+
+    def _volume_name(self, number):
+        return f"{self.archive}.{number:03}"
+
+    def locate(self, offset, length):
+        """Куски [(имя файла в хранилище, смещение в нём, длина)], покрывающие length байт архива с offset."""
+        if not self.volume_size:
+            return [(self.archive, offset, length)] if length else []
+
+        pieces = []
+        while length > 0:
+            number, volume_offset = divmod(offset, self.volume_size)
+            piece = min(length, self.volume_size - volume_offset)
+            pieces.append((self._volume_name(number + 1), volume_offset, piece))
+            offset += piece
+            length -= piece
+        return pieces
+
+    @staticmethod
+    def safe_path(name):
+        """Путь записи без абсолютных путей и "..", чтобы архив не мог писать за пределы папки восстановления."""
+        parts = [part for part in posixpath.normpath("/" + name).split("/") if part not in ("", ".", "..")]
+        return "/".join(parts)
@@ -0,0 +1,159 @@
+import io
+import os
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from backupZ.archive.large_file_reader import write_sparse
+from backupZ.archive.zip_stream_writer import ZIP_DEFLATED, ZIP_STORED
+from backupZ.restore.archive_index import ArchiveIndex
+
+
+class BackupRestorer:
+    """Восстанавливает файлы из zip-бэкапа в хранилище по его индексу, не скачивая архив целиком.
+
+    Для каждого файла из индекса известно, где в архиве лежат его сжатые
+    данные, поэтому один файл достаётся одним-двумя запросами диапазона.
+    При полном восстановлении соседние мелкие файлы читаются одним
+    запросом до range_size байт, группы обрабатываются параллельно, а
+    большие файлы скачиваются кусками по range_size с упреждением на
+    workers кусков и распаковываются по мере прихода. Нулевые участки
+    файлов не пишутся, а остаются дырами, так что разреженные образы
+    восстанавливаются разреженными.
+    """
+
+    OUTPUT_SIZE = 4 * 1024 * 1024
+
+    def __init__(self, uploader, remote_path, workers=8, range_size=8 * 1024 * 1024, max_gap=64 * 1024):
+        self._uploader = uploader
+        self._remote_path = remote_path
+        self._workers = max(1, workers)
+        self._range_size = range_size
+        self._max_gap = max_gap
+
+    def load_index(self, archive):
+        buffer = io.BytesIO()
+        self._uploader.download_stream(ArchiveIndex.index_name(archive), self._remote_path, buffer)
+        return ArchiveIndex.from_json(buffer.getvalue())
+
+    def _read(self, index, offset, length):
+        return b"".join(
+            self._uploader.download_range(name, self._remote_path, piece_offset, piece_length)
+            for name, piece_offset, piece_length in index.locate(offset, length)
+        )
+
+    def _group(self, entries):
+        """Делит записи на группы, каждая из которых читается одним запросом; большие файлы - отдельно."""
+        groups = []
+        group = []
+        for entry in sorted(entries, key=lambda item: item["data_offset"]):
+            if entry["compressed_size"] > self._range_size:
+                groups.append([entry])
+                continue
+            if group:
+                group_start = group[0]["data_offset"]
+                group_end = group[-1]["data_offset"] + group[-1]["compressed_size"]
+                entry_end = entry["data_offset"] + entry["compressed_size"]
+                if entry["data_offset"] - group_end > self._max_gap or entry_end - group_start > self._range_size:
+                    groups.append(group)
+                    group = []
+            group.append(entry)
+        if group:
+            groups.append(group)
+        return groups
+
+    def restore(self, archive, target_dir, paths=None):
+        """Восстанавливает весь архив или только paths (файлы и папки внутри архива); возвращает число файлов."""
+        index = self.load_index(archive)
+        entries = index.select(paths)
+        if paths and not entries:
+            raise FileNotFoundError(f"В архиве {archive} нет {', '.join(paths)}")
+
+        with ThreadPoolExecutor(max_workers=self._workers) as pool, \
+                ThreadPoolExecutor(max_workers=self._workers) as download_pool:
+            futures = [pool.submit(self._restore_group, index, group, target_dir, download_pool)
+                       for group in self._group(entries)]
+            for future in futures:
+                future.result()
+
+        print(f"Восстановлено файлов: {len(entries)} из {archive} в {target_dir}")
+        return len(entries)
+
+    def _restore_group(self, index, group, target_dir, download_pool):
+        if len(group) == 1 and group[0]["compressed_size"] > self._range_size:
+            entry = group[0]
+            self._extract(entry, self._iter_large(index, entry, download_pool), target_dir)
+            return
+
+        start = group[0]["data_offset"]
+        end = group[-1]["data_offset"] + group[-1]["compressed_size"]
+        data = self._read(index, start, end - start)
+        for entry in group:
+            offset = entry["data_offset"] - start
+            self._extract(entry, [data[offset:offset + entry["compressed_size"]]], target_dir)
+
+    def _iter_large(self, index, entry, download_pool):
+        """Куски сжатых данных большого файла по порядку; следующие workers кусков качаются заранее."""
+        end = entry["data_offset"] + entry["compressed_size"]
+        offsets = iter(range(entry["data_offset"], end, self._range_size))
+        pending = deque()
+        for offset in offsets:
+            pending.append(download_pool.submit(self._read, index, offset, min(self._range_size, end - offset)))
+            if len(pending) >= self._workers:
+                break
+        while pending:
+            data = pending.popleft().result()
+            offset = next(offsets, None)
+            if offset is not None:
+                pending.append(download_pool.submit(self._read, index, offset, min(self._range_size, end - offset)))
+            yield data
+
+    @staticmethod
+    def _iter_data(chunks, decompressor):
+        """Распакованные данные кусками до OUTPUT_SIZE: нули сжимаются в тысячи раз и целиком не влезут в память."""
+        for chunk in chunks:
+            if decompressor is None:
+                yield chunk
+                continue
+            while chunk:
+                data = decompressor.decompress(chunk, BackupRestorer.OUTPUT_SIZE)
+                if data:
+                    yield data
+                chunk = decompressor.unconsumed_tail
+        if decompressor is not None:
+            data = decompressor.flush()
+            if data:
+                yield data
+
+    @staticmethod
+    def _extract(entry, chunks, target_dir):
+        if entry["method"] == ZIP_DEFLATED:
+            decompressor = zlib.decompressobj(-15)
+        elif entry["method"] == ZIP_STORED:
+            decompressor = None
+        else:
+            raise ValueError(f"Неподдерживаемый метод сжатия {entry['method']} у {entry['name']}")
+
+        path = os.path.join(target_dir, *ArchiveIndex.safe_path(entry["name"]).split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        part_path = f"{path}.part"
+        crc = 0
+        size = 0
+        try:
+            with open(part_path, "wb") as file:
+                for data in BackupRestorer._iter_data(chunks, decompressor):
+                    crc = zlib.crc32(data, crc)
+                    size += len(data)
+                    write_sparse(file, data)
+                # Если файл кончается дырой, задаём размер явно
+                file.truncate(size)
+            if crc != entry["crc"] or size != entry["size"]:
+                raise ValueError(f"Файл {entry['name']} повреждён: CRC или размер не совпадают с индексом")
+            os.replace(part_path, path)
+        except BaseException:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+
+        os.chmod(path, entry["mode"] & 0o7777)
+        os.utime(path, (entry["mtime"], entry["mtime"]))
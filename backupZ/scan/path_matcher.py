@@ -0,0 +1,74 @@
+import os
+import re
+
+
+class PathMatcher:
+    """Шаблоны Include/Exclude, один раз скомпилированные в регулярные выражения.
+
+    Шаблоны сравниваются с путём относительно Dir (через "/"):
+    "*" и "?" не переходят через "/", "**" - любое число папок.
+    Шаблон без "/" ищется на любой глубине ("*.log", "node_modules"),
+    шаблон с "/" в начале привязан к корню Dir ("/cache"). Совпадение с
+    папкой распространяется на всё её содержимое. Все шаблоны одного вида
+    объединяются в одно выражение, поэтому проверка пути - один вызов match.
+    """
+
+    def __init__(self, includes=(), excludes=()):
+        self._include = self._compile(includes)
+        self._exclude = self._compile(excludes)
+
+    @staticmethod
+    def _translate(pattern):
+        anchored = pattern.startswith("/")
+        pattern = pattern.strip("/")
+        result = [] if anchored or "/" in pattern else ["(?:.*/)?"]
+
+        i = 0
+        while i < len(pattern):
+            char = pattern[i]
+            if pattern.startswith("**/", i):
+                result.append("(?:.*/)?")
+                i += 3
+                continue
+            if pattern.startswith("**", i):
+                result.append(".*")
+                i += 2
+                continue
+            if char == "*":
+                result.append("[^/]*")
+            elif char == "?":
+                result.append("[^/]")
+            elif char == "[":
+                end = pattern.find("]", i + 2)
+                if end == -1:
+                    result.append(re.escape(char))
+                else:
+                    chars = pattern[i + 1:end].replace("\\", "\\\\")
+                    if chars.startswith("!"):
+                        chars = "^" + chars[1:]
+                    result.append(f"[{chars}]")
+                    i = end
+            else:
+                result.append(re.escape(char))
+            i += 1
+        return "".join(result)
+
+    @classmethod
+    def _compile(cls, patterns):
+        if not patterns:
+            return None
+        return re.compile("(?:" + "|".join(cls._translate(pattern) for pattern in patterns) + r")(?:/.*)?\Z")
+
+    @staticmethod
+    def _normalize(rel_path):
+        return rel_path.replace(os.sep, "/") if os.sep != "/" else rel_path
+
+    def is_excluded_dir(self, rel_path):
+        """Папку можно не обходить: она целиком подпадает под Exclude."""
+        return self._exclude is not None and self._exclude.match(self._normalize(rel_path)) is not None
+
+    def match_file(self, rel_path):
+        rel_path = self._normalize(rel_path)
+        if self._include is not None and self._include.match(rel_path) is None:
+            return False
+        return self._exclude is None or self._exclude.match(rel_path) is None
@@ -0,0 +1,136 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import AsyncExitStack
+
+
+class BackupEngine:
+    """Выполняет блоки <Backup> как независимые задачи asyncio с ограничениями по дискам.
+
+    Каждый BackupConfig - отдельная задача в цикле событий, который живёт
+    в своём потоке. Задача сначала занимает слот диска, на котором лежит
+    Dir (не больше device_jobs бэкапов на одно блочное устройство), затем
+    общий слот (не больше max_jobs бэкапов всего), и только потом уходит в
+    пул потоков: чтение, сжатие (оно дальше делится на процессы) и загрузки
+    блокирующие. Пока задача ждёт свой диск, она не держит ни общий слот,
+    ни поток, поэтому бэкапы с других дисков выполняются параллельно.
+    Перед общим слотом задача занимает ещё и слоты всех своих хранилищ
+    (директива Concurrency, по умолчанию storage_concurrency) - все сразу и
+    в одинаковом для всех блоков порядке, поэтому два блока с общими
+    хранилищами не могут держать по одному слоту и ждать друг друга.
+    Хранилища различаются блоком целиком, а не типом: у двух <GoogleDrive>
+    с разными аккаунтами свои слоты и свой Concurrency.
+
+    По интерфейсу совместим с concurrent.futures.Executor: submit(fn, backup_config)
+    возвращает Future, поэтому подключается к BackupScheduler вместо пула потоков.
+    """
+
+    def __init__(self, max_jobs=2, device_jobs=1, storage_concurrency=2):
+        self._max_jobs = max(1, max_jobs)
+        self._device_jobs = max(1, device_jobs)
+        self._storage_concurrency = storage_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=self._max_jobs, thread_name_prefix="backup")
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="backup-engine", daemon=True)
+        self._thread.start()
+
+        # Семафоры asyncio создаются внутри цикла событий, только из его потока
+        self._jobs_semaphore = None
+        self._device_semaphores = {}
+        self._storage_semaphores = {}
+        self._tasks = set()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    @staticmethod
+    def device_key(path):
+        """Блочное устройство, на котором лежит path; разделы одного диска считаются одним устройством."""
+        try:
+            st_dev = os.stat(path).st_dev
+        except OSError:
+            return path
+        device = f"{os.major(st_dev)}:{os.minor(st_dev)}"
+        sysfs_path = f"/sys/dev/block/{device}"
+        if not os.path.exists(sysfs_path):
+            return device
+        real_path = os.path.realpath(sysfs_path)
+        if os.path.exists(os.path.join(real_path, "partition")):
+            real_path = os.path.dirname(real_path)
+        return os.path.basename(real_path)
+
+    def _get_device_semaphore(self, device):
+        semaphore = self._device_semaphores.get(device)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self._device_jobs)
+            self._device_semaphores[device] = semaphore
+        return semaphore
+
+    def _get_storage_semaphores(self, backup_config):
+        """Семафоры хранилищ блока в порядке ключей; ключ - блок хранилища целиком (тип, Dir, параметры)."""
+        semaphores = []
+        storages = {storage.get_fingerprint(): storage for storage in backup_config.get_storages()}
+        for key in sorted(storages, key=repr):
+            semaphore = self._storage_semaphores.get(key)
+            if semaphore is None:
+                limit = int(storages[key].get_param("Concurrency", self._storage_concurrency))
+                semaphore = asyncio.Semaphore(max(1, limit))
+                self._storage_semaphores[key] = semaphore
+            semaphores.append(semaphore)
+        return semaphores
+
+    async def _run(self, fn, backup_config):
+        if self._jobs_semaphore is None:
+            self._jobs_semaphore = asyncio.Semaphore(self._max_jobs)
+
+        device = await self._loop.run_in_executor(None, self.device_key, backup_config.get_dir())
+        async with self._get_device_semaphore(device):
+            async with AsyncExitStack() as stack:
+                for semaphore in self._get_storage_semaphores(backup_config):
+                    await stack.enter_async_context(semaphore)
+                async with self._jobs_semaphore:
+                    return await self._loop.run_in_executor(self._executor, fn, backup_config)
+
+    def submit(self, fn, backup_config):
+        """Ставит fn(backup_config) в очередь; потокобезопасно, возвращает concurrent.futures.Future."""
+        future = Future()
+
+        def start():
+            task = self._loop.create_task(self._run(fn, backup_config))
+            self._tasks.add(task)
+            task.add_done_callback(lambda done: self._complete(done, future))
+
+        self._loop.call_soon_threadsafe(start)
+        return future
+
+    def _complete(self, task, future):
+        self._tasks.discard(task)
+        if task.cancelled():
+            future.cancel()
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+        else:
+            future.set_result(task.result())
+
+    def run_all(self, fn, backup_configs):
+        """Запускает fn для всех блоков сразу и ждёт их; возвращает {id блока: результат или исключение}."""
+        futures = {backup_config.get_id(): self.submit(fn, backup_config) for backup_config in backup_configs}
+        return {
+            job_id: future.exception() if future.exception() is not None else future.result()
+            for job_id, future in futures.items()
+        }
+
+    def shutdown(self, wait=True):
+        """Ждёт уже принятые задачи (если wait) и останавливает цикл событий."""
+        if wait:
+            async def drain():
+                while self._tasks:
+                    await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+            asyncio.run_coroutine_threadsafe(drain(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,181 @@
+import heapq
+import itertools
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+
+
+class ScheduledJob:
+    def __init__(self, job_id, backup_config):
+        self.job_id = job_id
+        self.backup_config = backup_config
+        self.next_run = None
+        self.due_time = None
+        self.running = False
+        self.generation = 0
+
+
+class BackupScheduler:
+    """Планировщик бэкапов на куче с ближайшим временем запуска на вершине.
+
+    Поток планировщика спит ровно до ближайшего запуска (или до изменения
+    набора задач), добавление и извлечение задачи стоят O(log n). Время
+    последнего запуска каждой задачи сохраняется в state_file, поэтому после
+    перезапуска пропущенные запуски обрабатываются по политике catch_up_policy:
+    "once" — выполнить один раз сразу, "skip" — дождаться следующего по расписанию.
+    Одновременно выполняется не больше max_concurrent_jobs задач, остальные ждут в очереди.
+    Вместо своего пула можно передать executor (например BackupEngine) -
+    тогда очередь и ограничения на одновременные запуски задаёт он.
+    С pass_due_time=True run_job получает вторым аргументом время запуска
+    по расписанию (у догоняющего запуска - пропущенное время, а не момент
+    выполнения).
+    """
+
+    CATCH_UP_POLICIES = ("once", "skip")
+
+    def __init__(self, run_job, state_file, max_concurrent_jobs=2, catch_up_policy="once", executor=None,
+                 pass_due_time=False):
+        if catch_up_policy not in self.CATCH_UP_POLICIES:
+            raise ValueError(f"Неизвестная политика догоняющих запусков: {catch_up_policy}")
+
+        self._run_job = run_job
+        self._state_file = state_file
+        self._catch_up_policy = catch_up_policy
+        self._pass_due_time = pass_due_time
+        self._pool = executor or ThreadPoolExecutor(max_workers=max_concurrent_jobs)
+
+        self._heap = []
+        self._jobs = {}
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._state_lock = threading.Lock()
+        self._stopped = False
+
+        self._last_runs = self._load_state()
+
+    def _load_state(self):
+        if not os.path.exists(self._state_file):
+            return {}
+        try:
+            with open(self._state_file, 'r') as file:
+                return {job_id: datetime.fromisoformat(value) for job_id, value in json.load(file).items()}
+        except (OSError, ValueError) as e:
+            print(f"Не удалось прочитать состояние планировщика {self._state_file}: {e}")
+            return {}
+
+    def _save_state(self):
+        with self._state_lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self._state_file)), exist_ok=True)
+            tmp_file = f"{self._state_file}.tmp"
+            with open(tmp_file, 'w') as file:
+                json.dump({job_id: value.isoformat() for job_id, value in self._last_runs.items()}, file, indent=4)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_file, self._state_file)
+
+    @staticmethod
+    def next_run_time(backup_config, last_run, now):
+        """Ближайший запуск: в Time каждые Day дней после последнего запуска."""
+        run_time = datetime.strptime(backup_config.get_time(), '%H:%M').time()
+        interval = timedelta(days=int(backup_config.get_day()))
+
+        if last_run is None:
+            candidate = datetime.combine(now.date(), run_time)
+            return candidate if candidate >= now else candidate + timedelta(days=1)
+
+        return datetime.combine(last_run.date() + interval, run_time)
+
+    def _first_run_time(self, job, now):
+        """Время первого запуска и его время по расписанию; различаются только у догоняющего запуска."""
+        next_run = self.next_run_time(job.backup_config, self._last_runs.get(job.job_id), now)
+        if next_run >= now:
+            return next_run, next_run
+
+        if self._catch_up_policy == "once":
+            print(f"Пропущен запуск бэкапа {job.job_id} ({next_run}), выполняю сейчас")
+            return now, next_run
+
+        interval = timedelta(days=int(job.backup_config.get_day()))
+        missed = (now - next_run) // interval + 1
+        return next_run + missed * interval, next_run + missed * interval
+
+    def _push(self, job):
+        heapq.heappush(self._heap, (job.next_run, next(self._counter), job.job_id, job.generation))
+
+    def add_job(self, job_id, backup_config):
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None:
+                job = ScheduledJob(job_id, backup_config)
+                self._jobs[job_id] = job
+            else:
+                job.backup_config = backup_config
+                job.generation += 1
+
+            job.next_run, job.due_time = self._first_run_time(job, datetime.now())
+            self._push(job)
+            self._condition.notify()
+
+    def remove_job(self, job_id):
+        """Снимает задачу с расписания; уже выполняющийся запуск доработает до конца."""
+        with self._condition:
+            job = self._jobs.pop(job_id, None)
+            if job:
+                job.generation += 1
+                self._condition.notify()
+
+    def stop(self, wait=True):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self._pool.shutdown(wait=wait)
+
+    def run_forever(self):
+        with self._condition:
+            while not self._stopped:
+                # Отбрасываем записи удалённых и перепланированных задач
+                while self._heap:
+                    _, _, job_id, generation = self._heap[0]
+                    job = self._jobs.get(job_id)
+                    if job is not None and job.generation == generation:
+                        break
+                    heapq.heappop(self._heap)
+
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+
+                next_run, _, job_id, _ = self._heap[0]
+                delay = (next_run - datetime.now()).total_seconds()
+                if delay > 0:
+                    self._condition.wait(timeout=delay)
+                    continue
+
+                heapq.heappop(self._heap)
+                job = self._jobs[job_id]
+                self._dispatch(job, next_run)
+
+    def _dispatch(self, job, scheduled_time):
+        if job.running:
+            print(f"Бэкап {job.job_id} ещё выполняется, запуск {scheduled_time} пропущен")
+        else:
+            job.running = True
+            started = datetime.now()
+            run_job = partial(self._run_job, due_time=job.due_time) if self._pass_due_time else self._run_job
+            future = self._pool.submit(run_job, job.backup_config)
+            future.add_done_callback(lambda done: self._finish(job, started, done))
+
+        job.next_run = job.due_time = self.next_run_time(job.backup_config, scheduled_time, scheduled_time)
+        self._push(job)
+
+    def _finish(self, job, started, future):
+        if not future.cancelled() and future.exception() is not None:
+            print(f"Ошибка при выполнении бэкапа {job.job_id}: {future.exception()}")
+        with self._condition:
+            job.running = False
+        with self._state_lock:
+            self._last_runs[job.job_id] = started
+        self._save_state()
@@ -0,0 +1,169 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+class QueuedJob:
+    def __init__(self, queue_id, job_id, slot, attempts):
+        self.queue_id = queue_id
+        self.job_id = job_id
+        self.slot = slot
+        self.attempts = attempts
+
+
+class JobQueue:
+    """Очередь запусков бэкапов в SQLite, общая для процессов этого и других хостов.
+
+    Планировщик кладёт в неё наступившие запуски, а рабочие процессы
+    забирают их с арендой (lease): пока задача выполняется, рабочий
+    продлевает аренду heartbeat(), а если процесс упал, аренда истекает и
+    задачу забирает другой рабочий. После max_attempts истёкших аренд
+    задача считается проваленной, чтобы бэкап, роняющий процесс, не
+    перезапускался бесконечно.
+
+    Запуск определяется парой (id блока, слот): один и тот же запуск,
+    поставленный планировщиками нескольких хостов, попадает в очередь один
+    раз. Одновременно выполняется не больше одного запуска каждого блока.
+
+    Файл базы открывается в режиме журнала DELETE, а не WAL: WAL держит
+    общую память в mmap и не работает, когда к базе на сетевой папке
+    обращаются с нескольких хостов. Время аренды сравнивается по часам
+    хостов, поэтому они должны быть синхронизированы (NTP).
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    HISTORY_SECONDS = 30 * 24 * 3600
+
+    def __init__(self, db_path, lease_seconds=120, max_attempts=3):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._connection = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=DELETE")
+        self._lease_seconds = lease_seconds
+        self._max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._create_tables()
+
+    def _create_tables(self):
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT NOT NULL,
+                slot TEXT NOT NULL,
+                state TEXT NOT NULL,
+                worker TEXT,
+                lease_until REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                enqueued REAL NOT NULL,
+                started REAL,
+                finished REAL,
+                error TEXT,
+                UNIQUE (job_id, slot)
+            );
+            CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, enqueued);
+        """)
+
+    @contextmanager
+    def _transaction(self):
+        """BEGIN IMMEDIATE сразу берёт блокировку записи: два рабочих не заберут одну задачу.
+
+        Соединение общее для потока задачи и потока heartbeat, поэтому транзакции идут по очереди.
+        """
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+    @property
+    def lease_seconds(self):
+        return self._lease_seconds
+
+    @staticmethod
+    def default_worker_name():
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def enqueue(self, job_id, slot):
+        """Ставит запуск в очередь; возвращает False, если этот запуск уже поставлен."""
+        now = time.time()
+        with self._transaction():
+            # Завершённые запуски храним месяц: этого хватает, чтобы не поставить повторно тот же слот
+            self._connection.execute(
+                "DELETE FROM jobs WHERE state IN (?, ?) AND finished < ?",
+                (self.DONE, self.FAILED, now - self.HISTORY_SECONDS)
+            )
+            cursor = self._connection.execute(
+                "INSERT OR IGNORE INTO jobs (job_id, slot, state, enqueued) VALUES (?, ?, ?, ?)",
+                (job_id, slot, self.QUEUED, now)
+            )
+        return cursor.rowcount == 1
+
+    def claim(self, worker):
+        """Забирает самую старую готовую задачу (или задачу с истёкшей арендой) и возвращает QueuedJob или None."""
+        now = time.time()
+        with self._transaction():
+            self._connection.execute(
+                "UPDATE jobs SET state = ?, finished = ?, error = ? "
+                "WHERE state = ? AND lease_until < ? AND attempts >= ?",
+                (self.FAILED, now, f"Аренда истекла {self._max_attempts} раз: рабочий процесс падает на этой задаче",
+                 self.RUNNING, now, self._max_attempts)
+            )
+            row = self._connection.execute(
+                "SELECT id, job_id, slot, attempts FROM jobs AS job "
+                "WHERE (state = ? OR (state = ? AND lease_until < ?)) "
+                "AND NOT EXISTS (SELECT 1 FROM jobs AS other WHERE other.job_id = job.job_id "
+                "AND other.id != job.id AND other.state = ? AND other.lease_until >= ?) "
+                "ORDER BY enqueued LIMIT 1",
+                (self.QUEUED, self.RUNNING, now, self.RUNNING, now)
+            ).fetchone()
+            if row is None:
+                return None
+            queue_id, job_id, slot, attempts = row
+            self._connection.execute(
+                "UPDATE jobs SET state = ?, worker = ?, lease_until = ?, attempts = ?, started = ? WHERE id = ?",
+                (self.RUNNING, worker, now + self._lease_seconds, attempts + 1, now, queue_id)
+            )
+        return QueuedJob(queue_id, job_id, slot, attempts + 1)
+
+    def heartbeat(self, job, worker):
+        """Продлевает аренду; False - аренду уже забрал другой рабочий."""
+        with self._transaction():
+            cursor = self._connection.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND state = ?",
+                (time.time() + self._lease_seconds, job.queue_id, worker, self.RUNNING)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, job, worker, error=None):
+        with self._transaction():
+            self._connection.execute(
+                "UPDATE jobs SET state = ?, finished = ?, error = ?, lease_until = NULL "
+                "WHERE id = ? AND worker = ? AND state = ?",
+                (self.FAILED if error else self.DONE, time.time(), error, job.queue_id, worker, self.RUNNING)
+            )
+
+    def release(self, job, worker):
+        """Возвращает задачу в очередь, например при остановке рабочего; попытка не засчитывается."""
+        with self._transaction():
+            self._connection.execute(
+                "UPDATE jobs SET state = ?, worker = NULL, lease_until = NULL, attempts = attempts - 1 "
+                "WHERE id = ? AND worker = ? AND state = ?",
+                (self.QUEUED, job.queue_id, worker, self.RUNNING)
+            )
+
+    def get_stats(self):
+        """Число задач по состояниям."""
+        with self._lock:
+            return dict(self._connection.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+
+    def close(self):
+        self._connection.close()
+
@@ -0,0 +1,80 @@
+import threading
+import traceback
+
+from backupZ.scheduler.job_queue import JobQueue
+
+
+class JobWorker:
+    """Рабочий процесс очереди бэкапов: забирает задачи из JobQueue и выполняет их по одной.
+
+    Пока бэкап выполняется, отдельный поток продлевает аренду каждые
+    lease_seconds / 3 секунд. При остановке (stop() или Ctrl+C) текущая
+    задача возвращается в очередь. Если аренду забрал другой рабочий
+    (процесс завис дольше аренды), итог этого запуска в очередь не пишется:
+    задачей уже владеет другой рабочий. get_config(job_id) возвращает
+    BackupConfig блока по его id или None, если блока нет в конфигурации
+    этого хоста - тогда задача проваливается с ошибкой.
+    """
+
+    def __init__(self, queue, run_job, get_config, worker=None, poll_interval=5.0):
+        self._queue = queue
+        self._run_job = run_job
+        self._get_config = get_config
+        self._worker = worker or JobQueue.default_worker_name()
+        self._poll_interval = poll_interval
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    def run_forever(self):
+        print(f"Рабочий {self._worker} ждёт задачи")
+        while not self._stopped.is_set():
+            job = self._queue.claim(self._worker)
+            if job is None:
+                self._stopped.wait(self._poll_interval)
+                continue
+            self.run_job(job)
+
+    def run_job(self, job):
+        backup_config = self._get_config(job.job_id)
+        if backup_config is None:
+            self._queue.complete(job, self._worker, f"Блок {job.job_id} не найден в конфигурации {self._worker}")
+            return
+
+        print(f"Рабочий {self._worker} выполняет бэкап {job.job_id} (слот {job.slot}, попытка {job.attempts})")
+        done = threading.Event()
+        lost = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job, done, lost), daemon=True)
+        heartbeat.start()
+        error = None
+        try:
+            results = self._run_job(backup_config)
+            errors = [f"{name}: {e}" for name, e in (results or {}).items() if e is not None]
+            error = "; ".join(errors) or None
+        except (KeyboardInterrupt, SystemExit):
+            done.set()
+            heartbeat.join()
+            self._queue.release(job, self._worker)
+            self.stop()
+            raise
+        except Exception as e:
+            traceback.print_exc()
+            error = str(e) or type(e).__name__
+        done.set()
+        heartbeat.join()
+        if lost.is_set():
+            print(f"Итог бэкапа {job.job_id} (слот {job.slot}) не записан: аренду забрал другой рабочий")
+            return
+        self._queue.complete(job, self._worker, error)
+
+    def _heartbeat(self, job, done, lost):
+        while not done.wait(self._queue.lease_seconds / 3):
+            try:
+                if not self._queue.heartbeat(job, self._worker):
+                    print(f"Аренда бэкапа {job.job_id} потеряна: задачу забрал другой рабочий")
+                    lost.set()
+                    return
+            except Exception as e:
+                # Сетевая папка недоступна - пробуем снова в следующий раз, пока аренда не истекла
+                print(f"Не удалось продлить аренду бэкапа {job.job_id}: {e}")
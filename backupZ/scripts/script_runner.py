@@ -0,0 +1,150 @@
+import os
+import shlex
+import stat
+import subprocess
+import sys
+import threading
+import time
+
+
+class ScriptError(Exception):
+    pass
+
+
+class ScriptOutput:
+    """stdout команды-источника как файл только для чтения.
+
+    Данные читаются прямо из канала: пока архиватор не забрал очередной
+    блок, команда упирается в заполненный канал и ждёт (обратное давление).
+    На конце потока проверяется код завершения: если он не равен
+    ScriptExitCode или команда не уложилась в Timeout, чтение падает с
+    ScriptError, и бэкап не считается успешным.
+    """
+
+    def __init__(self, process, command, exit_code, timeout=None):
+        self._process = process
+        self._command = command
+        self._exit_code = exit_code
+        self._timed_out = False
+        self._finished = False
+        self._timer = None
+        if timeout:
+            self._timer = threading.Timer(timeout, self._kill)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _kill(self):
+        self._timed_out = True
+        self._process.kill()
+
+    def read(self, size=-1):
+        data = self._process.stdout.read(size)
+        if not data and size != 0 and not self._finished:
+            self._finished = True
+            self._finish()
+        return data
+
+    def _finish(self):
+        return_code = self._process.wait()
+        if self._timer:
+            self._timer.cancel()
+        if self._timed_out:
+            raise ScriptError(f"Команда '{self._command}' не уложилась в отведённое время")
+        if return_code != self._exit_code:
+            raise ScriptError(f"Команда '{self._command}' завершилась с кодом {return_code}, ожидался {self._exit_code}")
+
+    def close(self):
+        if self._timer:
+            self._timer.cancel()
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.stdout.close()
+        self._process.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ScriptSource:
+    """Запись архива, содержимое которой - stdout команды SourceCommand блока <Scripts>.
+
+    Команда запускается только когда архиватор дошёл до этой записи, так
+    что дамп базы не попадает на диск целиком.
+    """
+
+    def __init__(self, runner, command):
+        self._runner = runner
+        self._command = command
+
+    def open(self):
+        return self._runner.open_output(self._command)
+
+    def __str__(self):
+        return self._command
+
+
+class ScriptRunner:
+    """Выполняет команды одного блока <Scripts>: BeforeCommand, AfterCommand и SourceCommand.
+
+    Команды ищутся в Dir блока (скрипты .py запускаются текущим
+    интерпретатором), выполняются в нём же и проверяются по ScriptExitCode
+    и Timeout. Вывод BeforeCommand и AfterCommand идёт в лог процесса.
+    """
+
+    def __init__(self, scripts):
+        self._scripts = scripts
+
+    def _args(self, command):
+        args = shlex.split(command)
+        script_dir = self._scripts.get_dir()
+        if script_dir and os.path.isfile(os.path.join(script_dir, args[0])):
+            args[0] = os.path.abspath(os.path.join(script_dir, args[0]))
+        if args[0].endswith(".py"):
+            args.insert(0, sys.executable)
+        return args
+
+    def _cwd(self):
+        return self._scripts.get_dir() or None
+
+    def run(self, command):
+        """Выполняет команду и ждёт её завершения; ScriptError при неверном коде или таймауте."""
+        print(f"Выполняю команду: {command}")
+        try:
+            result = subprocess.run(self._args(command), cwd=self._cwd(), timeout=self._scripts.get_timeout())
+        except subprocess.TimeoutExpired:
+            raise ScriptError(f"Команда '{command}' не уложилась в {self._scripts.get_timeout()} с")
+        except OSError as e:
+            raise ScriptError(f"Не удалось запустить команду '{command}': {e}")
+
+        if result.returncode != self._scripts.get_script_exit_code():
+            raise ScriptError(
+                f"Команда '{command}' завершилась с кодом {result.returncode}, ожидался {self._scripts.get_script_exit_code()}")
+
+    def run_before(self):
+        if self._scripts.get_before_command():
+            self.run(self._scripts.get_before_command())
+
+    def run_after(self):
+        if self._scripts.get_after_command():
+            self.run(self._scripts.get_after_command())
+
+    def open_output(self, command):
+        print(f"Архивирую вывод команды: {command}")
+        try:
+            process = subprocess.Popen(self._args(command), cwd=self._cwd(), stdout=subprocess.PIPE,
+                                       stdin=subprocess.DEVNULL)
+        except OSError as e:
+            raise ScriptError(f"Не удалось запустить команду '{command}': {e}")
+        return ScriptOutput(process, command, self._scripts.get_script_exit_code(), self._scripts.get_timeout())
+
+    def get_source_entry(self):
+        """Тройка (источник, имя в архиве, stat) для архиватора или None, если SourceCommand не задана."""
+        command = self._scripts.get_source_command()
+        if not command:
+            return None
+        now = time.time()
+        source_stat = os.stat_result((stat.S_IFREG | 0o640, 0, 0, 1, 0, 0, 0, now, now, now))
+        return ScriptSource(self, command), self._scripts.get_source_name(), source_stat
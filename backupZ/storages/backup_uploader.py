@@ -1,10 +1,106 @@
 import os
+import re
+import threading
+import urllib.request
 from abc import ABC, abstractmethod
 
+from backupZ.storages.remote_inventory import RemoteInventory
+
+# Тома многотомного бэкапа ("name.zip.001"), их индекс ("name.zip.volumes.json"), индекс файлов архива
+# ("name.zip.index.json") и описание локального снимка ("name.zip.snapshot.json")
+VOLUME_NAME_RE = re.compile(r"^(?P<backup>.+)\.(?:\d{3,}|volumes\.json|index\.json|snapshot\.json)$")
+
+
 class BackupUploader(ABC):
+    inventory = None  # RemoteInventory; без него каждый запрос идёт в сервис
+    retries = 0  # Сколько раз загрузчик повторял запросы после сбоев, для метрик запуска
+    _retries_lock = threading.Lock()
+
+    @classmethod
+    def from_storage(cls, storage, state_dir=None):
+        """Создаёт загрузчик по параметрам блока хранилища (backup_config.Storage).
+
+        state_dir - папка для локального состояния загрузчика, например незавершённых загрузок.
+        """
+        raise NotImplementedError
+
+    def set_inventory(self, inventory):
+        self.inventory = inventory
+
+    def _add_retries(self, count):
+        """Учитывает повторы запросов; тома загружаются одним загрузчиком из нескольких потоков."""
+        if count:
+            with self._retries_lock:
+                self.retries += count
+
+    @staticmethod
+    def _shared_inventory(storage, key):
+        """Общий кеш инвентаря для аккаунта key; срок жизни задаёт директива InventoryTTL (секунды)."""
+        return RemoteInventory.shared(key, int(storage.get_param("InventoryTTL", 300)))
+
     @abstractmethod
     def upload_file(self, file_path, remote_path=None):
-        """Абстрактный метод для загрузки файла."""
+        """Абстрактный метод для загрузки файла; возвращает описание файла (как в _get_files_sorted_by_date) или None."""
+        pass
+
+    @abstractmethod
+    def upload_stream(self, stream, file_name, remote_path=None):
+        """Абстрактный метод для загрузки потока (файловый объект с read()) под именем file_name.
+
+        Возвращает описание файла (как в _get_files_sorted_by_date) или None.
+        """
+        pass
+
+    @abstractmethod
+    def download_stream(self, file_name, remote_path, fileobj):
+        """Абстрактный метод для скачивания файла file_name в файловый объект."""
+        pass
+
+    @abstractmethod
+    def download_range(self, file_name, remote_path, offset, length):
+        """Абстрактный метод: возвращает length байт файла file_name начиная с offset (запрос диапазона).
+
+        Может вызываться из нескольких потоков одновременно.
+        """
+        pass
+
+    @staticmethod
+    def _read_http_range(url, headers, offset, length, timeout=120):
+        """GET с заголовком Range; если сервер диапазон не поддержал и отдал файл целиком, нужный кусок вырезается."""
+        request = urllib.request.Request(url, headers=dict(headers, Range=f"bytes={offset}-{offset + length - 1}"))
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            if response.status == 206:
+                data = response.read()
+            else:
+                # Начало файла пропускается кусками, чтобы не держать его в памяти целиком
+                skipped = 0
+                while skipped < offset:
+                    skip = response.read(min(offset - skipped, 1024 * 1024))
+                    if not skip:
+                        break
+                    skipped += len(skip)
+                data = response.read(length)
+        if len(data) != length:
+            raise IOError(f"Получено {len(data)} байт вместо {length} (диапазон с {offset})")
+        return data
+
+    @abstractmethod
+    def list_file_names(self, remote_path):
+        """Абстрактный метод для получения множества имён файлов в папке."""
+        pass
+
+    @abstractmethod
+    def ensure_dir(self, name, remote_path):
+        """Абстрактный метод: создаёт (если нужно) вложенную папку и возвращает её путь или ID."""
+        pass
+
+    @abstractmethod
+    def get_checksums(self, file_name, remote_path):
+        """Абстрактный метод: размер и хеши файла из метаданных хранилища.
+
+        Возвращает словарь с ключами size, md5 и sha256 (None, если хранилище
+        хеш не отдаёт) или None, если файла нет. Файл при этом не скачивается.
+        """
         pass
 
     @abstractmethod
@@ -14,7 +110,10 @@ class BackupUploader(ABC):
 
     @abstractmethod
     def _get_files_sorted_by_date(self, remote_path):
-        """Абстрактный метод для получения списка файлов, отсортированных по дате."""
+        """Абстрактный метод: все файлы папки от старых к новым.
+
+        Каждый файл - словарь с ключами id, name, size, modified и checksum (MD5 или None).
+        """
         pass
 
     @abstractmethod
@@ -22,34 +121,157 @@ class BackupUploader(ABC):
         """Абстрактный метод для удаления файла."""
         pass
 
+    def _delete_files(self, file_ids):
+        """Удаляет несколько файлов и возвращает множество ID, которые удалить не удалось.
+
+        Хранилища переопределяют его пакетными или параллельными запросами.
+        """
+        failed = set()
+        for file_id in file_ids:
+            try:
+                self._delete_file(file_id)
+            except Exception as e:
+                print(f"Failed to delete {file_id}: {e}")
+                failed.add(file_id)
+        return failed
+
+    def _get_free_space_cached(self):
+        if self.inventory is None:
+            return self.get_free_space()
+        free_space = self.inventory.get_free_space()
+        if free_space is None:
+            free_space = self.get_free_space()
+            self.inventory.set_free_space(free_space)
+        return free_space
+
+    def _get_files_cached(self, remote_path):
+        if self.inventory is None:
+            return self._get_files_sorted_by_date(remote_path)
+        files = self.inventory.get_files(remote_path)
+        if files is None:
+            files = self._get_files_sorted_by_date(remote_path)
+            self.inventory.set_files(remote_path, files)
+        return files
+
+    def _record_upload(self, remote_path, file, size):
+        if self.inventory is None:
+            return
+        if file is None:
+            self.inventory.invalidate(remote_path)
+            return
+        file = dict(file, size=file.get('size') or size)
+        self.inventory.add_file(remote_path, file)
+        self.inventory.change_free_space(-file['size'])
+
+    def _invalidate_inventory(self, remote_path):
+        if self.inventory is not None:
+            self.inventory.invalidate(remote_path)
+
+    def prepare_space(self, required_size, remote_path=None):
+        """Удаляет старые бэкапы, если свободного места меньше required_size байт."""
+        free_space = self._get_free_space_cached()
+
+        if required_size > free_space:
+            print(f"Not enough space. Required: {required_size} bytes, available: {free_space} bytes.")
+            self._delete_oldest_files(required_size - free_space, remote_path)
+
     def upload_file_with_cleanup(self, file_path, remote_path=None):
         """Загружает файл, удаляя старые бэкапы, если не хватает места."""
         file_size = os.path.getsize(file_path)
-        free_space = self.get_free_space()
+        self.prepare_space(file_size, remote_path)
 
-        if file_size > free_space:
-            print(f"Not enough space. Required: {file_size} bytes, available: {free_space} bytes.")
-            self._delete_oldest_files(file_size - free_space, remote_path)
+        try:
+            file = self.upload_file(file_path, remote_path)
+        except Exception:
+            self._invalidate_inventory(remote_path)
+            raise
+        self._record_upload(remote_path, file, file_size)
 
-        self.upload_file(file_path, remote_path)
+    def upload_stream_with_cleanup(self, stream, file_name, remote_path=None, expected_size=0):
+        """Загружает поток, заранее освобождая место под expected_size байт."""
+        self.prepare_space(expected_size, remote_path)
+        self.upload_stream_recorded(stream, file_name, remote_path, expected_size)
 
-    def _delete_oldest_files(self, required_space, remote_path):
-        """Удаляет самые старые файлы, пока не освободится достаточно места."""
-        files = self._get_files_sorted_by_date(remote_path)
-        deleted_size = 0
+    def upload_stream_recorded(self, stream, file_name, remote_path=None, expected_size=0):
+        """Загружает поток без очистки места и учитывает файл в инвентаре."""
+        try:
+            file = self.upload_stream(stream, file_name, remote_path)
+        except Exception:
+            self._invalidate_inventory(remote_path)
+            raise
+        self._record_upload(remote_path, file, stream.tell() if hasattr(stream, 'tell') else expected_size)
+
+    def upload_named_file(self, file_path, file_name, remote_path=None):
+        """Загружает локальный файл под именем file_name в папку remote_path.
+
+        По умолчанию через upload_stream; хранилища с возобновляемой загрузкой файлов переопределяют.
+        """
+        with open(file_path, 'rb') as file:
+            return self.upload_stream(file, file_name, remote_path)
+
+    def upload_volume(self, file_path, file_name, remote_path=None):
+        """Загружает файл из набора бэкапа (том, индекс); место под весь набор заранее освобождает prepare_space.
 
+        Может вызываться из нескольких потоков одновременно.
+        """
+        file_size = os.path.getsize(file_path)
+        try:
+            file = self.upload_named_file(file_path, file_name, remote_path)
+        except Exception:
+            self._invalidate_inventory(remote_path)
+            raise
+        self._record_upload(remote_path, file, file_size)
+
+    @staticmethod
+    def _backup_name(file_name):
+        match = VOLUME_NAME_RE.match(file_name or "")
+        return match.group("backup") if match else file_name
+
+    @classmethod
+    def _select_files_to_delete(cls, files, required_space):
+        """За один проход выбирает самые старые бэкапы, которые вместе освобождают required_space байт.
+
+        Тома многотомного бэкапа и его индекс считаются одним бэкапом и удаляются вместе.
+        """
+        backups = {}
         for file in files:
-            if deleted_size >= required_space:
+            backups.setdefault(cls._backup_name(file['name']), []).append(file)
+
+        selected = []
+        selected_size = 0
+        for backup_files in backups.values():
+            if selected_size >= required_space:
                 break
-            file_size = self._get_file_size(file)
-            self._delete_file(file)
-            deleted_size += file_size
-            print(f"Deleted old backup: {file} ({file_size} bytes)")
+            selected.extend(backup_files)
+            selected_size += sum(cls._freed_size(file) for file in backup_files)
+        return selected
 
-        print(f"Freed up {deleted_size} bytes.")
+    @staticmethod
+    def _freed_size(file):
+        """Сколько места освободит удаление файла; хранилища с дорогим подсчётом переопределяют."""
+        return file['size']
 
-    @abstractmethod
-    def _get_file_size(self, file_id):
-        """Абстрактный метод для получения размера файла."""
-        pass
+    def _delete_oldest_files(self, required_space, remote_path):
+        """Удаляет самые старые файлы, пока не освободится достаточно места.
+
+        Размеры приходят вместе со списком файлов, поэтому набор на удаление
+        считается локально, а удаление идёт пакетами без запроса на каждый файл.
+        """
+        files = self._select_files_to_delete(self._get_files_cached(remote_path), required_space)
+        failed = self._delete_files([file['id'] for file in files])
+        deleted_size = 0
 
+        for file in files:
+            if file['id'] in failed:
+                continue
+            deleted_size += file['size']
+            print(f"Deleted old backup: {file['name']} ({file['size']} bytes)")
+
+        if self.inventory is not None:
+            if failed:
+                self.inventory.invalidate(remote_path)
+            else:
+                self.inventory.remove_files(remote_path, [file['id'] for file in files])
+                self.inventory.change_free_space(deleted_size)
+
+        print(f"Freed up {deleted_size} bytes.")
@@ -1,19 +1,56 @@
 import os
+import threading
 
 from google.auth.transport import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.http import MediaIoBaseDownload
 
 from backupZ.storages.backup_uploader import BackupUploader
+from backupZ.storages.resumable_upload import ResumableUpload
+
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+UPLOAD_URL = 'https://www.googleapis.com/upload/drive/v3/files'
+DOWNLOAD_URL = 'https://www.googleapis.com/drive/v3/files'
+FILE_FIELDS = 'id, name, size, createdTime, md5Checksum, sha256Checksum'
+BATCH_SIZE = 100  # Ограничение Drive API на число запросов в одном batch
 
 
 class GoogleDriveUploader(BackupUploader):
-    def __init__(self, credentials_file='credentials.json', token_file='token.json'):
+    def __init__(self, credentials_file='credentials.json', token_file='token.json',
+                 chunk_size=8 * 1024 * 1024, state_dir=None, upload_url=UPLOAD_URL):
         self.credentials_file = credentials_file
         self.token_file = token_file
-        self.service = self._authenticate()
+        self.chunk_size = chunk_size
+        self.state_dir = state_dir
+        self.upload_url = upload_url
+        self._creds = None
+        self._service = None
+        self._service_lock = threading.Lock()
+        self._file_ids = {}
+        self._lookup_lock = threading.Lock()
+
+    @classmethod
+    def from_storage(cls, storage, state_dir=None):
+        uploader = cls(
+            credentials_file=storage.get_param("CredentialsJson", "credentials.json"),
+            token_file=storage.get_param("TokenJson", "token.json"),
+            chunk_size=int(storage.get_param("ChunkSizeMB", 8)) * 1024 * 1024,
+            state_dir=os.path.join(state_dir, "uploads") if state_dir else None
+        )
+        uploader.set_inventory(cls._shared_inventory(storage, ("GoogleDrive", os.path.abspath(uploader.token_file))))
+        return uploader
+
+    @property
+    def service(self):
+        """Авторизация выполняется при первом обращении к API, а не при создании загрузчика."""
+        if self._service is None:
+            with self._service_lock:
+                if self._service is None:
+                    self._service = self._authenticate()
+        return self._service
 
     def _authenticate(self):
         SCOPES = ['https://www.googleapis.com/auth/drive']
@@ -32,17 +69,125 @@ class GoogleDriveUploader(BackupUploader):
             with open(self.token_file, 'w') as token:
                 token.write(creds.to_json())
 
+        self._creds = creds
         return build('drive', 'v3', credentials=creds)
 
+    def _auth_headers(self):
+        """Заголовки для прямых HTTP-запросов загрузки; истёкший токен обновляется."""
+        self.service  # Авторизация при первом обращении
+        with self._service_lock:
+            if not self._creds.valid:
+                self._creds.refresh(Request())
+            return {"Authorization": f"Bearer {self._creds.token}"}
+
     def upload_file(self, file_path, folder_id=None):
-        file_name = os.path.basename(file_path)
+        return self.upload_named_file(file_path, os.path.basename(file_path), folder_id)
+
+    def upload_named_file(self, file_path, file_name, folder_id=None):
         file_metadata = {'name': file_name}
         if folder_id:
             file_metadata['parents'] = [folder_id]
 
-        media = MediaFileUpload(file_path, resumable=True)
-        file = self.service.files().create(body=file_metadata, media_body=media, fields='id').execute()
+        upload = ResumableUpload(self.upload_url, self._auth_headers, self.chunk_size, self.state_dir, fields=FILE_FIELDS)
+        try:
+            file = upload.upload_file(file_path, file_metadata)
+        finally:
+            upload.close()
+            self._add_retries(upload.retries)
         print(f"File '{file_name}' uploaded to Google Drive with ID: {file.get('id')}")
+        return self._file_info(file)
+
+    def upload_stream(self, stream, file_name, folder_id=None):
+        file_metadata = {'name': file_name}
+        if folder_id:
+            file_metadata['parents'] = [folder_id]
+
+        upload = ResumableUpload(self.upload_url, self._auth_headers, self.chunk_size, fields=FILE_FIELDS)
+        try:
+            file = upload.upload_stream(stream, file_metadata)
+        finally:
+            upload.close()
+            self._add_retries(upload.retries)
+        print(f"Stream '{file_name}' uploaded to Google Drive with ID: {file.get('id')}")
+        return self._file_info(file)
+
+    @staticmethod
+    def _file_info(file):
+        return {
+            'id': file['id'],
+            'name': file.get('name'),
+            'size': int(file.get('size', 0)),
+            'modified': file.get('createdTime'),
+            'checksum': file.get('md5Checksum')
+        }
+
+    def _list_folder(self, folder_id, query=None, fields="id, name", order_by=None):
+        """Постранично перебирает все файлы папки."""
+        q = f"'{folder_id or 'root'}' in parents and trashed = false"
+        if query:
+            q = f"{q} and {query}"
+
+        page_token = None
+        while True:
+            results = self.service.files().list(
+                q=q,
+                fields=f"nextPageToken, files({fields})",
+                pageSize=1000,
+                orderBy=order_by,
+                pageToken=page_token
+            ).execute()
+            yield from results.get('files', [])
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+
+    def _find_file_id(self, file_name, folder_id):
+        name = file_name.replace("'", "\\'")
+        for file in self._list_folder(folder_id, query=f"name = '{name}'"):
+            return file['id']
+        raise FileNotFoundError(f"File '{file_name}' not found in Google Drive folder '{folder_id}'")
+
+    def download_stream(self, file_name, folder_id, fileobj):
+        request = self.service.files().get_media(fileId=self._find_file_id(file_name, folder_id))
+        downloader = MediaIoBaseDownload(fileobj, request)
+        done = False
+        while not done:
+            _, done = downloader.next_chunk()
+
+    def download_range(self, file_name, folder_id, offset, length):
+        # Клиент googleapiclient не потокобезопасен, поэтому диапазоны читаются прямыми HTTP-запросами
+        key = (folder_id, file_name)
+        with self._lookup_lock:
+            file_id = self._file_ids.get(key)
+            if file_id is None:
+                file_id = self._find_file_id(file_name, folder_id)
+                self._file_ids[key] = file_id
+        return self._read_http_range(f"{DOWNLOAD_URL}/{file_id}?alt=media", self._auth_headers(), offset, length)
+
+    def list_file_names(self, folder_id):
+        return {file['name'] for file in self._list_folder(folder_id, query=f"mimeType != '{FOLDER_MIME_TYPE}'")}
+
+    def ensure_dir(self, name, folder_id):
+        try:
+            return self._find_file_id(name, folder_id)
+        except FileNotFoundError:
+            pass
+
+        file_metadata = {'name': name, 'mimeType': FOLDER_MIME_TYPE}
+        if folder_id:
+            file_metadata['parents'] = [folder_id]
+        folder = self.service.files().create(body=file_metadata, fields='id').execute()
+        return folder.get('id')
+
+    def get_checksums(self, file_name, folder_id):
+        name = file_name.replace("'", "\\'")
+        for file in self._list_folder(folder_id, query=f"name = '{name}'", fields="id, size, md5Checksum, sha256Checksum"):
+            return {
+                'size': int(file.get('size', 0)),
+                'md5': file.get('md5Checksum'),
+                'sha256': file.get('sha256Checksum')
+            }
+        return None
 
     def get_free_space(self):
         about = self.service.about().get(fields="storageQuota").execute()
@@ -53,23 +198,39 @@ class GoogleDriveUploader(BackupUploader):
         return free_space
 
     def _get_files_sorted_by_date(self, folder_id):
-        """Возвращает список файлов в папке, отсортированных по дате создания (от старых к новым)."""
-        query = f"'{folder_id}' in parents"
-        results = self.service.files().list(
-            q=query,
-            fields="files(id, name, createdTime)",
-            orderBy="createdTime"
-        ).execute()
-        files = results.get('files', [])
-        return files
+        """Возвращает все файлы папки, отсортированные по дате создания (от старых к новым), вместе с размерами."""
+        files = self._list_folder(
+            folder_id,
+            query=f"mimeType != '{FOLDER_MIME_TYPE}'",
+            fields=FILE_FIELDS,
+            order_by="createdTime"
+        )
+        return [self._file_info(file) for file in files]
 
     def _delete_file(self, file_id):
         """Удаляет файл по его ID."""
         self.service.files().delete(fileId=file_id).execute()
         print(f"Deleted file with ID: {file_id}")
 
-    def _get_file_size(self, file_id):
-        """Возвращает размер файла по его ID."""
-        file = self.service.files().get(fileId=file_id, fields="size").execute()
-        return int(file.get('size', 0))
-
+    def _delete_files(self, file_ids):
+        """Удаляет файлы batch-запросами по BATCH_SIZE штук."""
+        failed = set()
+
+        def callback(request_id, response, exception):
+            if exception is not None:
+                print(f"Failed to delete file with ID {request_id}: {exception}")
+                failed.add(request_id)
+
+        for start in range(0, len(file_ids), BATCH_SIZE):
+            batch_ids = file_ids[start:start + BATCH_SIZE]
+            batch = self.service.new_batch_http_request(callback=callback)
+            for file_id in batch_ids:
+                batch.add(self.service.files().delete(fileId=file_id), request_id=file_id)
+            try:
+                batch.execute()
+            except Exception as e:
+                # Пакет не выполнился целиком: ни одно удаление из него не подтверждено
+                print(f"Failed to delete batch of {len(batch_ids)} files: {e}")
+                failed.update(batch_ids)
+
+        return failed
@@ -0,0 +1,399 @@
+import errno
+import json
+import os
+import re
+import shutil
+import threading
+import zipfile
+from datetime import datetime, timezone
+
+from backupZ.archive.large_file_reader import write_sparse
+from backupZ.integrity.archive_digest import ArchiveDigest
+from backupZ.restore.archive_index import ArchiveIndex
+from backupZ.storages.backup_uploader import BackupUploader
+
+SNAPSHOT_SUFFIX = ".snapshot.json"
+VOLUMES_SUFFIX = ".volumes.json"
+VOLUME_RE = re.compile(r"^(?P<backup>.+)\.(?P<number>\d{3,})$")
+COPY_SIZE = 1024 * 1024
+
+
+def copy_range(src, dst, offset, length, dst_offset):
+    """Копирует length байт файла src с offset в dst с dst_offset.
+
+    Через copy_file_range данные не проходят через процесс, а на btrfs/xfs
+    копия делается ссылкой на те же блоки; где он не поддерживается - pread/pwrite.
+    """
+    try:
+        while length > 0:
+            count = os.copy_file_range(src.fileno(), dst.fileno(), length, offset, dst_offset)
+            if not count:
+                return
+            offset += count
+            dst_offset += count
+            length -= count
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EOPNOTSUPP, errno.EINVAL):
+            raise
+        while length > 0:
+            data = os.pread(src.fileno(), min(length, COPY_SIZE), offset)
+            if not data:
+                return
+            os.pwrite(dst.fileno(), data, dst_offset)
+            offset += len(data)
+            dst_offset += len(data)
+            length -= len(data)
+
+
+def copy_file(src_path, dst_path):
+    """Копирует файл по участкам данных (SEEK_DATA/SEEK_HOLE): дыры разреженного файла остаются дырами."""
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        size = os.fstat(src.fileno()).st_size
+        offset = 0
+        while offset < size:
+            try:
+                start = os.lseek(src.fileno(), offset, os.SEEK_DATA)
+                end = os.lseek(src.fileno(), start, os.SEEK_HOLE)
+            except OSError as e:
+                if e.errno == errno.ENXIO:
+                    break
+                start, end = offset, size
+            copy_range(src, dst, start, end - start, start)
+            offset = end
+        dst.truncate(size)
+
+
+class LocalSnapshotUploader(BackupUploader):
+    """Локальные снимки бэкапов на диске для быстрого восстановления.
+
+    Архив бэкапа не хранится, а распаковывается в папку "<Dir>/<имя архива>".
+    Файлы, которые не изменились с прошлого снимка (тот же размер, CRC,
+    время изменения и права), не распаковываются, а становятся жёсткими
+    ссылками на файлы прошлого снимка, как в rsync --link-dest: снимок
+    занимает на диске примерно столько, сколько изменившиеся данные.
+
+    Архив и тома пишутся прямо в папку хранилища под скрытым временным
+    именем (".<имя>.part", в список файлов не попадает): хранимые файлы
+    затем переименовываются на место, а тома, когда приходит индекс томов,
+    дописываются в первый том и распаковываются. Размеры и хеши архива и
+    томов запоминаются в "<имя архива>.snapshot.json" для проверки бэкапа.
+    Файлы, которые не являются zip-архивом (индексы, блоки дедупликации),
+    хранятся как есть. Keep ограничивает число хранимых снимков, а при
+    нехватке места старые снимки удаляются как обычно (_delete_oldest_files).
+    """
+
+    def __init__(self, root, keep=0):
+        self._root = root
+        self._keep = keep
+        self._volumes = {}
+        self._volumes_lock = threading.Lock()
+
+    @classmethod
+    def from_storage(cls, storage, state_dir=None):
+        return cls(storage.get_dir(), int(storage.get_param("Keep", 0)))
+
+    @staticmethod
+    def _snapshot_file(backup, remote_path):
+        return os.path.join(remote_path, f"{backup}{SNAPSHOT_SUFFIX}")
+
+    @staticmethod
+    def _part_path(name, remote_path):
+        os.makedirs(remote_path, exist_ok=True)
+        return os.path.join(remote_path, f".{name}.part")
+
+    def _load_snapshot(self, backup, remote_path):
+        try:
+            with open(self._snapshot_file(backup, remote_path)) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def _latest_snapshot(self, remote_path):
+        snapshots = [file for file in self._list(remote_path) if file['snapshot']]
+        return self._load_snapshot(snapshots[-1]['name'], remote_path) if snapshots else None
+
+    def upload_file(self, file_path, remote_path=None):
+        return self.upload_named_file(file_path, os.path.basename(file_path), remote_path)
+
+    def upload_stream(self, stream, file_name, remote_path=None):
+        staged_path = self._part_path(file_name, remote_path)
+        digest = ArchiveDigest()
+        try:
+            with open(staged_path, "wb") as file:
+                while True:
+                    data = stream.read(COPY_SIZE)
+                    if not data:
+                        break
+                    digest.update(data)
+                    file.write(data)
+            return self._store(staged_path, file_name, remote_path, {file_name: digest.to_dict()})
+        finally:
+            if os.path.exists(staged_path):
+                os.remove(staged_path)
+
+    def upload_named_file(self, file_path, file_name, remote_path=None):
+        match = VOLUME_RE.match(file_name)
+        if match:
+            return self._stage_volume(file_path, file_name, match.group("backup"), remote_path)
+        if file_name.endswith(VOLUMES_SUFFIX):
+            self._copy_plain(file_path, file_name, remote_path)
+            return self._assemble_volumes(file_name[:-len(VOLUMES_SUFFIX)], remote_path)
+        with open(file_path, "rb") as file:
+            return self.upload_stream(file, file_name, remote_path)
+
+    def _copy_plain(self, file_path, file_name, remote_path):
+        dst_path = os.path.join(remote_path, file_name)
+        copy_file(file_path, f"{dst_path}.part")
+        os.replace(f"{dst_path}.part", dst_path)
+
+    def _stage_volume(self, file_path, file_name, backup, remote_path):
+        """Копирует том под временным именем, считая его хеши; снимок собирается после последнего тома."""
+        staged_path = self._part_path(file_name, remote_path)
+        digest = ArchiveDigest()
+        with open(file_path, "rb") as src, open(staged_path, "wb") as dst:
+            while True:
+                data = src.read(COPY_SIZE)
+                if not data:
+                    break
+                digest.update(data)
+                dst.write(data)
+        with self._volumes_lock:
+            self._volumes.setdefault((remote_path, backup), {})[file_name] = digest.to_dict()
+        print(f"Volume '{file_name}' staged for local snapshot in '{remote_path}'")
+        return self._file_info(staged_path, file_name)
+
+    def _assemble_volumes(self, backup, remote_path):
+        """Дописывает тома в первый через copy_file_range и распаковывает получившийся архив в снимок.
+
+        Каждый том удаляется сразу после копирования, поэтому сверх архива
+        место нужно только под один том, а не под вторую копию архива.
+        """
+        with self._volumes_lock:
+            volumes = self._volumes.pop((remote_path, backup), {})
+        if not volumes:
+            raise FileNotFoundError(f"No staged volumes for '{backup}' in '{remote_path}'")
+
+        names = sorted(volumes, key=lambda name: int(VOLUME_RE.match(name).group("number")))
+        staged_path = self._part_path(names[0], remote_path)
+        try:
+            with open(staged_path, "r+b") as dst:
+                offset = volumes[names[0]]["size"]
+                for name in names[1:]:
+                    volume_path = self._part_path(name, remote_path)
+                    with open(volume_path, "rb") as src:
+                        copy_range(src, dst, 0, volumes[name]["size"], offset)
+                    offset += volumes[name]["size"]
+                    os.remove(volume_path)
+            return self._store(staged_path, backup, remote_path, volumes)
+        finally:
+            for name in names:
+                if os.path.exists(self._part_path(name, remote_path)):
+                    os.remove(self._part_path(name, remote_path))
+
+    def _store(self, staged_path, file_name, remote_path, checksums):
+        if not zipfile.is_zipfile(staged_path):
+            dst_path = os.path.join(remote_path, file_name)
+            os.replace(staged_path, dst_path)
+            print(f"File '{file_name}' stored in '{remote_path}'")
+            return self._file_info(dst_path, file_name)
+
+        snapshot = self._create_snapshot(staged_path, file_name, remote_path, checksums)
+        if self._keep:
+            self._delete_extra_snapshots(remote_path)
+        return snapshot
+
+    def _create_snapshot(self, archive_path, name, remote_path, checksums):
+        previous = self._latest_snapshot(remote_path)
+        previous_entries = previous["entries"] if previous else {}
+        previous_dir = os.path.join(remote_path, previous["archive"]) if previous else None
+
+        tree_path = os.path.join(remote_path, f".{name}.tree")
+        if os.path.exists(tree_path):
+            shutil.rmtree(tree_path)
+        entries = {}
+        linked = 0
+        extracted_size = 0
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                path = ArchiveIndex.safe_path(info.filename)
+                key = [info.file_size, info.CRC, list(info.date_time), info.external_attr >> 16]
+                entries[path] = key
+                target = os.path.join(tree_path, *path.split("/"))
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                if previous_entries.get(path) == key and self._link(os.path.join(previous_dir, *path.split("/")), target):
+                    linked += 1
+                    continue
+                self._extract(archive, info, target)
+                extracted_size += info.file_size
+
+        snapshot_dir = os.path.join(remote_path, name)
+        if os.path.exists(snapshot_dir):
+            shutil.rmtree(snapshot_dir)
+        os.rename(tree_path, snapshot_dir)
+        # Время снимка - время его создания: по нему выбираются прошлый снимок и старые снимки на удаление
+        os.utime(snapshot_dir)
+
+        snapshot = {
+            "archive": name,
+            "created": datetime.now(timezone.utc).isoformat(),
+            "files": checksums,
+            "entries": entries
+        }
+        snapshot_file = self._snapshot_file(name, remote_path)
+        with open(f"{snapshot_file}.part", "w") as file:
+            json.dump(snapshot, file)
+        os.replace(f"{snapshot_file}.part", snapshot_file)
+
+        print(f"Snapshot '{name}' created in '{remote_path}': {len(entries) - linked} files extracted "
+              f"({extracted_size} bytes), {linked} hardlinked to the previous snapshot")
+        # Новый снимок занимает ровно распакованное: остальное - ссылки на прошлый снимок
+        return dict(self._file_info(snapshot_dir, name), size=extracted_size)
+
+    @staticmethod
+    def _link(src_path, dst_path):
+        try:
+            os.link(src_path, dst_path)
+            return True
+        except OSError:
+            # Файл прошлого снимка удалён или у него кончился лимит ссылок - распакуем заново
+            return False
+
+    @staticmethod
+    def _extract(archive, info, target):
+        with archive.open(info) as src, open(target, "wb") as dst:
+            while True:
+                data = src.read(COPY_SIZE)
+                if not data:
+                    break
+                write_sparse(dst, data)
+            dst.truncate(info.file_size)
+        mode = info.external_attr >> 16
+        if mode:
+            os.chmod(target, mode & 0o7777)
+        mtime = datetime(*info.date_time).timestamp()
+        os.utime(target, (mtime, mtime))
+
+    def restore_snapshot(self, archive, remote_path, target_dir, paths=None):
+        """Копирует снимок (или только paths из него) в target_dir; возвращает число файлов."""
+        snapshot = self._load_snapshot(archive, remote_path)
+        if snapshot is None:
+            raise FileNotFoundError(f"Snapshot '{archive}' not found in '{remote_path}'")
+        names = ArchiveIndex(archive, [{"name": name} for name in snapshot["entries"]]).select(paths)
+        if paths and not names:
+            raise FileNotFoundError(f"Snapshot '{archive}' has no {', '.join(paths)}")
+
+        for entry in names:
+            parts = entry["name"].split("/")
+            target = os.path.join(target_dir, *parts)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            source = os.path.join(remote_path, archive, *parts)
+            copy_file(source, f"{target}.part")
+            shutil.copystat(source, f"{target}.part")
+            os.replace(f"{target}.part", target)
+
+        print(f"Restored {len(names)} files from snapshot '{archive}' to '{target_dir}'")
+        return len(names)
+
+    def download_stream(self, file_name, remote_path, fileobj):
+        with open(os.path.join(remote_path, file_name), "rb") as file:
+            shutil.copyfileobj(file, fileobj, COPY_SIZE)
+
+    def download_range(self, file_name, remote_path, offset, length):
+        with open(os.path.join(remote_path, file_name), "rb") as file:
+            data = os.pread(file.fileno(), length, offset)
+        if len(data) != length:
+            raise IOError(f"Read {len(data)} bytes instead of {length} (range from {offset})")
+        return data
+
+    def list_file_names(self, remote_path):
+        return {file['name'] for file in self._list(remote_path)}
+
+    def ensure_dir(self, name, remote_path):
+        path = os.path.join(remote_path, name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def get_checksums(self, file_name, remote_path):
+        snapshot = self._load_snapshot(self._backup_name(file_name), remote_path)
+        if snapshot is not None and file_name in snapshot["files"]:
+            return snapshot["files"][file_name]
+
+        path = os.path.join(remote_path, file_name)
+        if not os.path.isfile(path):
+            return None
+        digest = ArchiveDigest()
+        with open(path, "rb") as file:
+            for data in iter(lambda: file.read(COPY_SIZE), b""):
+                digest.update(data)
+        return digest.to_dict()
+
+    def get_free_space(self):
+        os.makedirs(self._root, exist_ok=True)
+        return shutil.disk_usage(self._root).free
+
+    @staticmethod
+    def _unique_size(path):
+        """Сколько места освободит удаление снимка: файлы, на которые не ссылаются другие снимки."""
+        size = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                stat = os.lstat(os.path.join(root, name))
+                if stat.st_nlink == 1:
+                    size += stat.st_blocks * 512
+        return size
+
+    @classmethod
+    def _freed_size(cls, file):
+        # Обход дерева снимка дорогой: он делается, только когда снимок выбирают на удаление, и запоминается
+        if file['size'] is None:
+            file['size'] = cls._unique_size(file['id'])
+        return file['size']
+
+    @staticmethod
+    def _file_info(path, name):
+        """Описание файла или снимка; размер снимка (None) считает _freed_size, когда он нужен."""
+        stat = os.stat(path)
+        is_snapshot = os.path.isdir(path)
+        return {
+            'id': path,
+            'name': name,
+            'size': None if is_snapshot else stat.st_size,
+            'modified': datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+            'checksum': None,
+            'snapshot': is_snapshot
+        }
+
+    def _list(self, remote_path):
+        """Снимки и файлы папки от старых к новым; скрытые (временные .part и .tree) пропускаются."""
+        if not os.path.isdir(remote_path):
+            return []
+        files = [
+            self._file_info(os.path.join(remote_path, name), name)
+            for name in os.listdir(remote_path) if not name.startswith(".")
+        ]
+        files.sort(key=lambda x: x['modified'])
+        return files
+
+    def _get_files_sorted_by_date(self, remote_path):
+        return self._list(remote_path)
+
+    def _delete_file(self, path):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+        print(f"Deleted: {path}")
+
+    def _delete_extra_snapshots(self, remote_path):
+        """Удаляет самые старые снимки сверх Keep вместе с их индексами."""
+        files = self._list(remote_path)
+        backups = {}
+        for file in files:
+            backups.setdefault(self._backup_name(file['name']), []).append(file)
+        snapshots = [backup for backup in backups.values() if any(file['snapshot'] for file in backup)]
+        for backup in snapshots[:max(0, len(snapshots) - self._keep)]:
+            failed = self._delete_files([file['id'] for file in backup])
+            if not failed:
+                print(f"Deleted old snapshot: {self._backup_name(backup[0]['name'])}")
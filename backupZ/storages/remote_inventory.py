@@ -0,0 +1,99 @@
+import threading
+import time
+
+
+class RemoteInventory:
+    """Локальная копия списка файлов хранилища и его свободного места.
+
+    Папка или квота запрашиваются у сервиса заново, только когда запись
+    старше ttl секунд или сброшена после ошибки. Свои загрузки и удаления
+    вносятся в кеш сразу, поэтому обычный запуск обходится без повторных
+    листингов, проверок существования и запросов квоты.
+
+    Загрузчики создаются на каждую операцию, поэтому кеш общий для всех
+    загрузчиков одного аккаунта и берётся через shared(key).
+    """
+
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, ttl=300):
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._folders = {}
+        self._free_space = None
+        self._free_space_synced_at = 0
+
+    @classmethod
+    def shared(cls, key, ttl=300):
+        with cls._shared_lock:
+            inventory = cls._shared.get(key)
+            if inventory is None:
+                inventory = cls._shared[key] = cls(ttl)
+            inventory._ttl = ttl
+            return inventory
+
+    @staticmethod
+    def _key(remote_path):
+        # "/backups/" и "/backups" - одна папка
+        if isinstance(remote_path, str) and len(remote_path) > 1:
+            return remote_path.rstrip("/")
+        return remote_path
+
+    def _fresh(self, synced_at):
+        return time.monotonic() - synced_at < self._ttl
+
+    def get_files(self, remote_path):
+        """Файлы папки от старых к новым или None, если кеш устарел."""
+        with self._lock:
+            folder = self._folders.get(self._key(remote_path))
+            if folder is None or not self._fresh(folder["synced_at"]):
+                return None
+            return list(folder["files"].values())
+
+    def set_files(self, remote_path, files):
+        with self._lock:
+            self._folders[self._key(remote_path)] = {
+                "synced_at": time.monotonic(),
+                "files": {file['id']: file for file in files}
+            }
+
+    def add_file(self, remote_path, file):
+        with self._lock:
+            folder = self._folders.get(self._key(remote_path))
+            if folder is not None:
+                # Новый файл самый свежий - в конец списка
+                folder["files"].pop(file['id'], None)
+                folder["files"][file['id']] = file
+
+    def remove_files(self, remote_path, file_ids):
+        with self._lock:
+            folder = self._folders.get(self._key(remote_path))
+            if folder is not None:
+                for file_id in file_ids:
+                    folder["files"].pop(file_id, None)
+
+    def get_free_space(self):
+        with self._lock:
+            if self._free_space is None or not self._fresh(self._free_space_synced_at):
+                return None
+            return self._free_space
+
+    def set_free_space(self, free_space):
+        with self._lock:
+            self._free_space = free_space
+            self._free_space_synced_at = time.monotonic()
+
+    def change_free_space(self, delta):
+        with self._lock:
+            if self._free_space is not None:
+                self._free_space += delta
+
+    def invalidate(self, remote_path=None):
+        """Сбрасывает папку (или весь кеш) и квоту; следующий запрос пойдёт в сервис."""
+        with self._lock:
+            if remote_path is None:
+                self._folders.clear()
+            else:
+                self._folders.pop(self._key(remote_path), None)
+            self._free_space = None
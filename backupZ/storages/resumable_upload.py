@@ -0,0 +1,331 @@
+import hashlib
+import http.client
+import json
+import os
+import random
+import time
+from urllib.parse import urlencode, urljoin, urlsplit
+
+
+class ResumableUploadError(Exception):
+    pass
+
+
+class ResumableUpload:
+    """Загрузка файла по протоколу resumable upload Google Drive, переживающая падение процесса.
+
+    Сессия открывается POST-запросом, данные уходят PUT-запросами по
+    chunk_size байт с заголовком Content-Range, сервер подтверждает
+    принятое ответом 308 и заголовком Range. URI сессии и подтверждённое
+    смещение сохраняются в state_dir после каждого куска, поэтому после
+    рестарта загрузка продолжается с последнего подтверждённого байта.
+
+    Сетевые ошибки и ответы 5xx/429 повторяются с экспоненциальной
+    задержкой; перед повтором у сервера запрашивается, сколько байт он
+    уже принял. Истёкшая сессия (404/410) начинается заново.
+    """
+
+    CHUNK_GRANULARITY = 256 * 1024
+    RETRY_STATUSES = (401, 408, 429, 500, 502, 503, 504)
+    STATE_MAX_AGE = 7 * 24 * 3600
+
+    def __init__(self, upload_url, get_headers, chunk_size=8 * 1024 * 1024, state_dir=None,
+                 max_retries=8, backoff=1.0, max_backoff=60.0, timeout=120, fields='id'):
+        if chunk_size <= 0 or chunk_size % self.CHUNK_GRANULARITY:
+            raise ValueError(f"Размер куска должен быть кратен {self.CHUNK_GRANULARITY} байт")
+        self._upload_url = upload_url
+        self._get_headers = get_headers
+        self._chunk_size = chunk_size
+        self._state_dir = state_dir
+        self._max_retries = max_retries
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._timeout = timeout
+        self._fields = fields
+        self._connections = {}
+        self.retries = 0
+
+    def _request(self, method, url, headers, body=b""):
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        connection = self._connections.get(key)
+        if connection is None:
+            connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+            connection = connection_class(parts.netloc, timeout=self._timeout)
+            self._connections[key] = connection
+
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            return response.status, response.headers, response.read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            del self._connections[key]
+            raise
+
+    def close(self):
+        for connection in self._connections.values():
+            connection.close()
+        self._connections.clear()
+
+    # Локальное состояние загрузок
+
+    def _state_file(self, file_path, size, metadata):
+        """Состояние ищется по месту назначения и содержимому, а не по пути файла.
+
+        Тома пишутся в новую временную папку при каждом запуске, поэтому путь
+        и mtime после рестарта другие, а папка, имя, размер и отпечаток
+        совпадают. Отпечаток читает только начало и конец файла; уже
+        принятую сервером часть целиком сверяет _upload при продолжении.
+        """
+        if not self._state_dir:
+            return None
+        key = json.dumps([metadata.get('parents'), metadata.get('name'), size, self._file_fingerprint(file_path, size)])
+        return os.path.join(self._state_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+    @staticmethod
+    def _file_fingerprint(file_path, size, sample=64 * 1024):
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as file:
+            digest.update(file.read(sample))
+            file.seek(max(0, size - sample))
+            digest.update(file.read(sample))
+        return digest.hexdigest()
+
+    def _remove_stale_states(self):
+        # Сессия загрузки Drive живёт неделю: состояния старше уже не продолжить
+        if not self._state_dir:
+            return
+        expired = time.time() - self.STATE_MAX_AGE
+        with os.scandir(self._state_dir) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file() and entry.stat().st_mtime < expired:
+                        os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    @staticmethod
+    def _load_state(state_file):
+        if not state_file:
+            return None
+        try:
+            with open(state_file, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _save_state(state_file, session_uri, offset, digest):
+        if not state_file:
+            return
+        os.makedirs(os.path.dirname(state_file), exist_ok=True)
+        tmp_file = f"{state_file}.tmp"
+        with open(tmp_file, 'w') as file:
+            json.dump({"session_uri": session_uri, "offset": offset, "sha256": digest}, file)
+        os.replace(tmp_file, state_file)
+
+    @staticmethod
+    def _remove_state(state_file):
+        if state_file:
+            try:
+                os.remove(state_file)
+            except FileNotFoundError:
+                pass
+
+    # Протокол
+
+    def _start_session(self, metadata, size, mimetype):
+        url = f"{self._upload_url}?{urlencode({'uploadType': 'resumable', 'fields': self._fields})}"
+        headers = dict(self._get_headers())
+        headers.update({
+            "Content-Type": "application/json; charset=UTF-8",
+            "X-Upload-Content-Type": mimetype
+        })
+        if size is not None:
+            headers["X-Upload-Content-Length"] = str(size)
+        status, response_headers, body = self._request("POST", url, headers, json.dumps(metadata).encode("utf-8"))
+        if status == 200 and response_headers.get("Location"):
+            return status, urljoin(url, response_headers["Location"]), body
+        return status, None, body
+
+    def _send(self, source, session_uri, offset, status_only):
+        headers = dict(self._get_headers())
+        data = b"" if status_only else source.read(offset, self._chunk_size)
+        # Пока поток не дочитан, его полный размер неизвестен и передаётся как "*"
+        total = "*" if source.size is None else source.size
+        if not data:
+            # Пустой PUT с "bytes */size" возвращает, сколько байт сервер уже принял, или завершает загрузку
+            headers.update({"Content-Length": "0", "Content-Range": f"bytes */{total}"})
+            return self._request("PUT", session_uri, headers)
+
+        headers.update({
+            "Content-Length": str(len(data)),
+            "Content-Range": f"bytes {offset}-{offset + len(data) - 1}/{total}"
+        })
+        return self._request("PUT", session_uri, headers, data)
+
+    @staticmethod
+    def _confirmed_offset(headers):
+        # Range: bytes=0-N, где N - последний принятый байт; без заголовка не принято ничего
+        value = headers.get("Range")
+        if not value:
+            return 0
+        return int(value.rsplit("-", 1)[1]) + 1
+
+    def _sleep(self, attempt):
+        delay = min(self._max_backoff, self._backoff * 2 ** (attempt - 1))
+        time.sleep(delay * random.uniform(0.5, 1.0))
+
+    def upload_file(self, file_path, metadata, mimetype='application/octet-stream'):
+        """Загружает файл и возвращает JSON-ответ Drive о созданном файле."""
+        size = os.path.getsize(file_path)
+        state_file = self._state_file(file_path, size, metadata)
+        with open(file_path, 'rb') as file:
+            result = self._upload(_FileSource(file, size), metadata, mimetype, file_path, state_file)
+        self._remove_stale_states()
+        return result
+
+    def upload_stream(self, stream, metadata, mimetype='application/octet-stream'):
+        """Загружает поток неизвестной длины и возвращает JSON-ответ Drive о созданном файле.
+
+        Ещё не подтверждённые сервером байты держатся в памяти (не больше
+        chunk_size) и после обрыва или частичного 308 отправляются заново.
+        Состояние не сохраняется: после рестарта процесса потока уже нет.
+        """
+        return self._upload(_StreamSource(stream), metadata, mimetype, metadata.get('name'), None)
+
+    def _upload(self, source, metadata, mimetype, name, state_file):
+        state = self._load_state(state_file)
+        if state:
+            # Принятая сервером часть должна совпадать с файлом, иначе загрузка начинается заново
+            source.confirm(state["offset"])
+            if source.digest() != state.get("sha256"):
+                print(f"Saved upload state of '{name}' does not match the file, starting over")
+                source.confirm(0)
+                state = None
+        if state:
+            session_uri, offset, status_only = state["session_uri"], state["offset"], True
+            print(f"Resuming upload of '{name}' from byte {offset}")
+        else:
+            session_uri, offset, status_only = None, 0, False
+
+        attempt = 0
+        while True:
+            error = None
+            try:
+                if session_uri is None:
+                    status, session_uri, body = self._start_session(metadata, source.size, mimetype)
+                    if session_uri:
+                        offset, status_only, attempt = 0, False, 0
+                        source.confirm(offset)
+                        self._save_state(state_file, session_uri, offset, source.digest())
+                        continue
+                else:
+                    status, headers, body = self._send(source, session_uri, offset, status_only)
+                    if status in (200, 201):
+                        self._remove_state(state_file)
+                        return json.loads(body) if body else {}
+                    if status == 308:
+                        confirmed = self._confirmed_offset(headers)
+                        if confirmed > offset:
+                            # Счётчик повторов сбрасывается только при продвижении, а не на ответ на запрос статуса
+                            attempt = 0
+                        offset, status_only = confirmed, False
+                        source.confirm(offset)
+                        self._save_state(state_file, session_uri, offset, source.digest())
+                        continue
+                    if status in (404, 410):
+                        print(f"Upload session for '{name}' expired, starting over")
+                        session_uri = None
+                        continue
+            except (OSError, http.client.HTTPException) as e:
+                error = e
+            else:
+                if status not in self.RETRY_STATUSES:
+                    self._remove_state(state_file)
+                    raise ResumableUploadError(f"Upload of '{name}' failed: HTTP {status} {body[:200]!r}")
+                error = ResumableUploadError(f"HTTP {status}")
+
+            attempt += 1
+            self.retries += 1
+            if attempt > self._max_retries:
+                raise ResumableUploadError(f"Upload of '{name}' failed after {self._max_retries} retries") from error
+            print(f"Upload of '{name}' interrupted at byte {offset} ({error}), retry {attempt}")
+            self._sleep(attempt)
+            status_only = True
+
+
+class _FileSource:
+    """Файл для загрузки; ведёт sha256 подтверждённой сервером части для сверки при продолжении."""
+
+    def __init__(self, file, size):
+        self._file = file
+        self.size = size
+        self._digest = hashlib.sha256()
+        self._confirmed = 0
+        self._sent = (0, b"")
+
+    def read(self, offset, length):
+        self._file.seek(offset)
+        data = self._file.read(length)
+        self._sent = (offset, data)
+        return data
+
+    def confirm(self, offset):
+        if offset < self._confirmed:
+            # Сессия начата заново
+            self._digest = hashlib.sha256()
+            self._confirmed = 0
+        start, data = self._sent
+        if start <= self._confirmed and offset <= start + len(data):
+            # Подтверждённые байты только что отправлены, файл заново не читается
+            self._digest.update(data[self._confirmed - start:offset - start])
+        else:
+            self._file.seek(self._confirmed)
+            position = self._confirmed
+            while position < offset:
+                data = self._file.read(min(offset - position, 1024 * 1024))
+                if not data:
+                    break
+                self._digest.update(data)
+                position += len(data)
+        self._confirmed = offset
+
+    def digest(self):
+        return self._digest.hexdigest()
+
+
+class _StreamSource:
+    """Поток для загрузки: в памяти остаётся только не подтверждённая сервером часть."""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._buffer = bytearray()
+        self._start = 0
+        self.size = None
+
+    def read(self, offset, length):
+        if offset < self._start:
+            # Сессию пришлось начать заново, а подтверждённые данные потока уже отброшены
+            raise ResumableUploadError(f"Stream data before byte {self._start} is no longer available")
+        end = offset - self._start + length
+        while self.size is None and len(self._buffer) < end:
+            data = self._stream.read(end - len(self._buffer))
+            if not data:
+                self.size = self._start + len(self._buffer)
+                break
+            self._buffer += data
+        return bytes(self._buffer[offset - self._start:end])
+
+    def confirm(self, offset):
+        if offset > self._start:
+            del self._buffer[:offset - self._start]
+            self._start = offset
+
+    def digest(self):
+        # Состояние потока не сохраняется, сверять нечего
+        return None
@@ -0,0 +1,53 @@
+import importlib
+import threading
+
+
+class StorageRegistry:
+    """Сопоставляет имена блоков внутри <Storages> с реализациями BackupUploader.
+
+    Модуль хранилища импортируется только при первом обращении к нему:
+    клиент Google Drive тянет googleapiclient и google.auth, а это сотни
+    миллисекунд и десятки МБ даже там, где настроен только <YandexDisk>.
+    """
+
+    _backends = {
+        "YandexDisk": ("backupZ.storages.yandex_disk", "YandexDiskUploader"),
+        "GoogleDrive": ("backupZ.storages.google_drive", "GoogleDriveUploader"),
+        "LocalSnapshot": ("backupZ.storages.local_snapshot", "LocalSnapshotUploader"),
+    }
+    _classes = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def register(cls, name, module_name, class_name):
+        with cls._lock:
+            cls._backends[name] = (module_name, class_name)
+            cls._classes.pop(name, None)
+
+    @classmethod
+    def is_registered(cls, name):
+        return name in cls._backends
+
+    @classmethod
+    def get_names(cls):
+        return sorted(cls._backends)
+
+    @classmethod
+    def get_class(cls, name):
+        uploader_class = cls._classes.get(name)
+        if uploader_class is not None:
+            return uploader_class
+
+        if name not in cls._backends:
+            raise ValueError(f"Неизвестное хранилище: {name}")
+
+        with cls._lock:
+            if name not in cls._classes:
+                module_name, class_name = cls._backends[name]
+                cls._classes[name] = getattr(importlib.import_module(module_name), class_name)
+            return cls._classes[name]
+
+    @classmethod
+    def create_uploader(cls, storage, state_dir=None):
+        """Создаёт загрузчик для Storage; подключение к сервису откладывается до первого запроса."""
+        return cls.get_class(storage.get_name()).from_storage(storage, state_dir)
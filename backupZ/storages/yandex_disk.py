@@ -1,21 +1,108 @@
-from datetime import datetime
+import hashlib
+import os
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 
 import yadisk
 
 from backupZ.storages.backup_uploader import BackupUploader
 
+DELETE_WORKERS = 8
+
 
 class YandexDiskUploader(BackupUploader):
     def __init__(self, token):
-        self.client = yadisk.YaDisk(token=token)
+        self._token = token
+        self._client = None
+        self._download_links = {}
+
+    @classmethod
+    def from_storage(cls, storage, state_dir=None):
+        uploader = cls(storage.get_param("Token"))
+        token_hash = hashlib.sha256((uploader._token or "").encode("utf-8")).hexdigest()
+        uploader.set_inventory(cls._shared_inventory(storage, ("YandexDisk", token_hash)))
+        return uploader
+
+    @property
+    def client(self):
+        """Клиент создаётся при первом запросе к Яндекс.Диску."""
+        if self._client is None:
+            self._client = yadisk.YaDisk(token=self._token)
+        return self._client
+
+    def _exists(self, path):
+        """Проверяет существование файла по кешу инвентаря, если он свежий, иначе запросом."""
+        files = self.inventory.get_files(posixpath.dirname(path)) if self.inventory else None
+        if files is None:
+            return self.client.exists(path)
+        name = posixpath.basename(path)
+        return any(file['name'] == name for file in files)
 
     def upload_file(self, file_path, remote_path):
-        if not self.client.exists(remote_path):
+        if not self._exists(remote_path):
             self.client.upload(file_path, remote_path)
             print(f"File '{file_path}' uploaded to Yandex.Disk at '{remote_path}'")
+            return self._uploaded_file_info(remote_path, os.path.getsize(file_path))
         else:
             print(f"File '{remote_path}' already exists on Yandex.Disk")
 
+    def upload_stream(self, stream, file_name, remote_path):
+        """Загружает поток без промежуточного файла; повторы отключены, т.к. поток не перематывается."""
+        dst_path = posixpath.join(remote_path, file_name)
+        self.client.upload(stream, dst_path, n_retries=0)
+        print(f"Stream '{file_name}' uploaded to Yandex.Disk at '{dst_path}'")
+        return self._uploaded_file_info(dst_path, None)
+
+    def upload_named_file(self, file_path, file_name, remote_path=None):
+        """Загружает локальный файл; в отличие от потока его можно повторять при сбоях."""
+        dst_path = posixpath.join(remote_path, file_name)
+        self.client.upload(file_path, dst_path, overwrite=True)
+        print(f"File '{file_path}' uploaded to Yandex.Disk at '{dst_path}'")
+        return self._uploaded_file_info(dst_path, os.path.getsize(file_path))
+
+    @staticmethod
+    def _file_info(item):
+        return {'id': item.path, 'name': item.name, 'size': item.size or 0, 'modified': item.modified, 'checksum': item.md5}
+
+    @staticmethod
+    def _uploaded_file_info(path, size):
+        # Размер потока заранее неизвестен - его подставит upload_stream_recorded
+        return {
+            'id': path,
+            'name': posixpath.basename(path),
+            'size': size,
+            'modified': datetime.now(timezone.utc),
+            'checksum': None
+        }
+
+    def download_stream(self, file_name, remote_path, fileobj):
+        self.client.download(posixpath.join(remote_path, file_name), fileobj)
+
+    def download_range(self, file_name, remote_path, offset, length):
+        path = posixpath.join(remote_path, file_name)
+        link = self._download_links.get(path)
+        if link is None:
+            link = self.client.get_download_link(path)
+            self._download_links[path] = link
+        return self._read_http_range(link, {}, offset, length)
+
+    def list_file_names(self, remote_path):
+        return {item.name for item in self.client.listdir(remote_path) if item.type == 'file'}
+
+    def ensure_dir(self, name, remote_path):
+        path = posixpath.join(remote_path, name)
+        if not self.client.exists(path):
+            self.client.mkdir(path)
+        return path
+
+    def get_checksums(self, file_name, remote_path):
+        try:
+            meta = self.client.get_meta(posixpath.join(remote_path, file_name), fields=["size", "md5", "sha256"])
+        except yadisk.exceptions.PathNotFoundError:
+            return None
+        return {'size': meta.size, 'md5': meta.md5, 'sha256': meta.sha256}
+
     def get_free_space(self):
         disk_info = self.client.get_disk_info()
         total_space = disk_info.total_space  # Общий объем пространства
@@ -24,25 +111,23 @@ class YandexDiskUploader(BackupUploader):
         return free_space
 
     def _get_files_sorted_by_date(self, remote_path):
-        """Возвращает список файлов в папке, отсортированных по дате изменения (от старых к новым)."""
-        files = []
-        for item in self.client.listdir(remote_path):
-            if item.type == 'file':
-                files.append({
-                    'path': item.path,
-                    'modified': item.modified
-                })
-        # Сортируем по дате изменения
-        files.sort(key=lambda x: datetime.fromisoformat(x['modified']))
-        return [file['path'] for file in files]
+        """Возвращает список файлов в папке, отсортированных по дате изменения (от старых к новым), с размерами."""
+        files = [self._file_info(item) for item in self.client.listdir(remote_path) if item.type == 'file']
+        files.sort(key=lambda x: x['modified'])
+        return files
 
     def _delete_file(self, file_path):
         """Удаляет файл по его пути."""
         self.client.remove(file_path)
         print(f"Deleted file: {file_path}")
 
-    def _get_file_size(self, file_path):
-        """Возвращает размер файла по его пути."""
-        file_info = self.client.get_meta(file_path)
-        return file_info.size
-
+    def _delete_files(self, file_paths):
+        """Удаляет файлы параллельно: у Яндекс.Диска нет пакетного удаления."""
+        failed = set()
+        with ThreadPoolExecutor(max_workers=DELETE_WORKERS) as pool:
+            futures = {pool.submit(self._delete_file, path): path for path in file_paths}
+            for future, path in futures.items():
+                if future.exception() is not None:
+                    print(f"Failed to delete {path}: {future.exception()}")
+                    failed.add(path)
+        return failed
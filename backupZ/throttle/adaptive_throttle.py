@@ -0,0 +1,216 @@
+import os
+import threading
+import time
+
+
+class PressureSampler:
+    """Снимает показатели нагрузки: load average на ядро, PSI по вводу-выводу и задержку диска с Dir.
+
+    Недоступный показатель (нет /proc/pressure, Dir не на блочном
+    устройстве) возвращается как None и в решениях не участвует.
+    """
+
+    PSI_FILE = "/proc/pressure/io"
+    DISKSTATS_FILE = "/proc/diskstats"
+
+    def __init__(self, path):
+        try:
+            st_dev = os.stat(path).st_dev
+            self._device = (os.major(st_dev), os.minor(st_dev))
+        except OSError:
+            self._device = None
+        self._last_disk = None
+
+    @staticmethod
+    def load_per_cpu():
+        try:
+            return os.getloadavg()[0] / (os.cpu_count() or 1)
+        except OSError:
+            return None
+
+    def io_pressure(self):
+        """Доля времени (%) за последние 10 с, когда хоть одна задача ждала ввода-вывода."""
+        try:
+            with open(self.PSI_FILE) as file:
+                for line in file:
+                    if line.startswith("some "):
+                        fields = dict(field.split("=") for field in line.split()[1:])
+                        return float(fields["avg10"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _read_disk(self):
+        if self._device is None:
+            return None
+        try:
+            with open(self.DISKSTATS_FILE) as file:
+                for line in file:
+                    fields = line.split()
+                    if (int(fields[0]), int(fields[1])) == self._device:
+                        # завершённые чтения и записи, мс на чтения и записи
+                        return int(fields[3]) + int(fields[7]), int(fields[6]) + int(fields[10])
+        except (OSError, ValueError, IndexError):
+            pass
+        return None
+
+    def disk_latency(self):
+        """Средняя задержка запроса к диску (мс) с прошлого вызова."""
+        current = self._read_disk()
+        previous, self._last_disk = self._last_disk, current
+        if current is None or previous is None:
+            return None
+        requests = current[0] - previous[0]
+        if requests <= 0:
+            return 0.0
+        return (current[1] - previous[1]) / requests
+
+    def sample(self):
+        return {"load": self.load_per_cpu(), "io_pressure": self.io_pressure(), "latency": self.disk_latency()}
+
+
+class AdaptiveThrottle:
+    """Подстраивает скорость бэкапа под нагрузку на систему.
+
+    Раз в interval секунд фоновый поток сравнивает показатели
+    PressureSampler с порогами (limits: load, io_pressure, latency). Если
+    хоть один превышен, коэффициент скорости уменьшается вдвое (но не ниже
+    min_factor), если все ниже 80% порога - растёт на 0.1 до 1.
+    Коэффициент ограничивает:
+      - скорость чтения файлов и вывода команд (throttle("read", ...));
+      - скорость записи архива или загрузки блоков dedup, т.е. отдачи в хранилища (throttle("upload", ...));
+      - число блоков, сжимаемых одновременно (allowed_workers).
+    Базовая скорость для каждого вида - сглаженная скорость, замеренная,
+    пока ограничения не было; при коэффициенте 1 ничего не замедляется.
+    """
+
+    DECREASE = 0.5
+    INCREASE = 0.1
+    HYSTERESIS = 0.8
+
+    def __init__(self, source_dir, limits, min_factor=0.1, interval=2.0, sampler=None):
+        self._limits = {key: value for key, value in limits.items() if value is not None}
+        self._min_factor = min_factor
+        self._interval = interval
+        self._sampler = sampler or PressureSampler(source_dir)
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._factor = 1.0
+
+        self._window_bytes = {}
+        self._base_rates = {}
+        self._next_times = {}
+        self._waited = {}
+        self._lowest_factor = 1.0
+        self._adjustments = 0
+        self._window_started = time.monotonic()
+
+    @property
+    def factor(self):
+        return self._factor
+
+    def start(self):
+        self._sampler.sample()
+        self._thread = threading.Thread(target=self._run, name="backup-throttle", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop_event.wait(self._interval):
+            self.adjust(self._sampler.sample())
+
+    def _is_over(self, sample, ratio=1.0):
+        return any(sample.get(key) is not None and sample[key] > limit * ratio for key, limit in self._limits.items())
+
+    def adjust(self, sample):
+        """Пересчитывает коэффициент по свежему замеру и обновляет базовые скорости."""
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._window_started
+            self._window_started = now
+            if self._factor >= 1.0 and elapsed > 0:
+                for kind, window_bytes in self._window_bytes.items():
+                    if window_bytes:
+                        rate = window_bytes / elapsed
+                        base = self._base_rates.get(kind)
+                        self._base_rates[kind] = rate if base is None else 0.7 * base + 0.3 * rate
+            self._window_bytes = dict.fromkeys(self._window_bytes, 0)
+
+            factor = self._factor
+            if self._is_over(sample):
+                factor = max(self._min_factor, factor * self.DECREASE)
+            elif not self._is_over(sample, self.HYSTERESIS):
+                factor = min(1.0, factor + self.INCREASE)
+            if factor != self._factor:
+                self._adjustments += 1
+                if self._factor >= 1.0 or factor >= 1.0:
+                    state = "снято" if factor >= 1.0 else f"{factor:.0%} скорости"
+                    print(f"Ограничение бэкапа по нагрузке: {state} ({self._format_sample(sample)})")
+                self._factor = factor
+                self._lowest_factor = min(self._lowest_factor, factor)
+
+    @staticmethod
+    def _format_sample(sample):
+        return ", ".join(f"{key}={value:.2f}" for key, value in sample.items() if value is not None)
+
+    def throttle(self, kind, size):
+        """Учитывает size байт вида kind и, если скорость ограничена, ждёт своей очереди."""
+        with self._lock:
+            self._window_bytes[kind] = self._window_bytes.get(kind, 0) + size
+            base = self._base_rates.get(kind)
+            if self._factor >= 1.0 or not base:
+                return
+            now = time.monotonic()
+            start = max(now, self._next_times.get(kind, now))
+            self._next_times[kind] = start + size / (base * self._factor)
+            delay = start - now
+            self._waited[kind] = self._waited.get(kind, 0.0) + delay
+        if delay > 0:
+            time.sleep(delay)
+
+    def allowed_workers(self, workers):
+        return max(1, round(workers * self._factor))
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "factor": self._factor,
+                "lowest_factor": self._lowest_factor,
+                "adjustments": self._adjustments,
+                "waited": dict(self._waited)
+            }
+
+
+class ThrottledWriter:
+    """Файловый объект, который перед записью спрашивает у AdaptiveThrottle разрешения."""
+
+    def __init__(self, fileobj, throttle, kind="upload"):
+        self._fileobj = fileobj
+        self._throttle = throttle
+        self._kind = kind
+
+    def write(self, data):
+        self._throttle.throttle(self._kind, len(data))
+        return self._fileobj.write(data)
+
+    def flush(self):
+        self._fileobj.flush()
+
+
+class ThrottledReader:
+    """Файловый объект, который после каждого чтения учитывает прочитанное в AdaptiveThrottle."""
+
+    def __init__(self, fileobj, throttle, kind="read"):
+        self._fileobj = fileobj
+        self._throttle = throttle
+        self._kind = kind
+
+    def read(self, size=-1):
+        data = self._fileobj.read(size)
+        self._throttle.throttle(self._kind, len(data))
+        return data
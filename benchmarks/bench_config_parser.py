@@ -0,0 +1,72 @@
+"""Время разбора сгенерированных конфигов на 1k, 10k и 100k блоков <Backup>.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_config_parser --blocks 1000 10000 100000
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from backupZ.config_parser import ConfigParser
+
+BLOCK_TEMPLATE = """<Backup>
+    Dir "/data/{file}/{index}"
+    Day "1"
+    Time "04:{minute:02}"
+    FileName "backup-{file}-{index} %Y-%m-%d %H:%M:%S.zip"
+    # Комментарий
+    <Scripts>
+        Dir "./scripts"
+        BeforeCommand "before.py"
+        AfterCommand "after.py"
+        ScriptExitCode "0"
+    </Scripts>
+    <Storages>
+        <YandexDisk>
+            Token ${{OS}}
+            Dir "/backups/{index}/"
+        </YandexDisk>
+    </Storages>
+</Backup>
+"""
+
+
+def generate(directory, blocks, files):
+    per_file = blocks // files
+    for file in range(files):
+        with open(os.path.join(directory, f"generated{file:03}.conf"), "w") as out:
+            for index in range(per_file):
+                out.write(BLOCK_TEMPLATE.format(file=file, index=index, minute=index % 60))
+
+
+def parse(directory, workers):
+    parser = ConfigParser()
+    parser.variables = {"OS": "Linux"}
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        parser.parse_directory(directory, workers=workers)
+    elapsed = time.perf_counter() - started
+    return elapsed, len(parser.get_config().blocks)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--blocks", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--files", type=int, default=16)
+    args = parser.parse_args()
+
+    cpu_count = os.cpu_count() or 1
+    print(f"{'блоков':>8} {'1 процесс, с':>14} {f'{cpu_count} процессов, с':>16} {'блоков/с':>10}")
+    for blocks in args.blocks:
+        with tempfile.TemporaryDirectory() as directory:
+            generate(directory, blocks, args.files)
+            serial, parsed = parse(directory, 1)
+            parallel, _ = parse(directory, cpu_count)
+            print(f"{parsed:>8} {serial:>14.3f} {parallel:>16.3f} {parsed / min(serial, parallel):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
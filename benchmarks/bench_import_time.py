@@ -0,0 +1,54 @@
+"""Время импорта и память процесса при старте с разными хранилищами.
+
+Каждый замер идёт в отдельном интерпретаторе, чтобы кеш модулей не
+искажал результат. Запуск из корня репозитория:
+    python -m benchmarks.bench_import_time --repeat 5
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+CHILD = """
+import json, resource, sys, time
+started = time.perf_counter()
+import backupZ.backups_manager
+from backupZ.storages.storage_registry import StorageRegistry
+for name in sys.argv[1:]:
+    StorageRegistry.get_class(name)
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "maxrss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  "modules": len(sys.modules)}))
+"""
+
+SCENARIOS = [
+    ("без хранилищ", []),
+    ("YandexDisk", ["YandexDisk"]),
+    ("GoogleDrive", ["GoogleDrive"]),
+    ("оба", ["YandexDisk", "GoogleDrive"]),
+]
+
+
+def measure(backends):
+    output = subprocess.run([sys.executable, "-c", CHILD, *backends], capture_output=True, text=True, check=True)
+    return json.loads(output.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'хранилища':>14} {'импорт, мс':>11} {'RSS, МБ':>9} {'модулей':>9}")
+    for title, backends in SCENARIOS:
+        try:
+            runs = [measure(backends) for _ in range(args.repeat)]
+        except subprocess.CalledProcessError as e:
+            print(f"{title:>14} не удалось: {e.stderr.strip().splitlines()[-1]}")
+            continue
+        best = min(runs, key=lambda run: run["seconds"])
+        print(f"{title:>14} {best['seconds'] * 1000:>11.1f} {best['maxrss_kb'] / 1024:>9.1f} {best['modules']:>9}")
+
+
+if __name__ == "__main__":
+    main()
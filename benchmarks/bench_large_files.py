@@ -0,0 +1,106 @@
+"""Упаковка больших разреженных файлов: обычное чтение против LargeFileReader.
+
+Генерирует разреженный файл (как образ ВМ, где занята малая часть) и
+упаковывает его дважды: обычным open() и через LargeFileReader. Для каждого
+способа печатает время, процессорное время (вместе с процессами сжатия),
+сколько байт прочитано из файла (rchar из /proc/self/io) и пиковую память.
+Запуск из корня репозитория:
+    python -m benchmarks.bench_large_files --size-gb 4 --data-percent 10
+    python -m benchmarks.bench_large_files --file /var/lib/libvirt/images/vm.qcow2
+"""
+import argparse
+import os
+import random
+import resource
+import tempfile
+import time
+
+from backupZ.archive.parallel_zip_archiver import ParallelZipArchiver
+
+
+class CountingSink:
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+        return len(data)
+
+
+def make_sparse_file(path, size_gb, data_percent, extent_mb=4):
+    """Файл size_gb ГБ, в котором заняты data_percent процентов случайными участками по extent_mb МБ."""
+    size = size_gb * 1024 ** 3
+    extent = extent_mb * 1024 * 1024
+    extents = size // extent
+    words = [os.urandom(random.randint(2, 8)).hex().encode() for _ in range(5000)]
+    data = b" ".join(random.choice(words) for _ in range(extent // 10))[:extent]
+    with open(path, "wb") as file:
+        file.truncate(size)
+        for number in sorted(random.sample(range(extents), max(1, extents * data_percent // 100))):
+            file.seek(number * extent)
+            file.write(data)
+
+
+def read_chars():
+    try:
+        with open("/proc/self/io") as file:
+            for line in file:
+                if line.startswith("rchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def measure(path, large_file_size, workers):
+    stat = os.stat(path)
+    sink = CountingSink()
+    cpu = cpu_seconds()
+    chars = read_chars()
+    started = time.perf_counter()
+    archiver = ParallelZipArchiver("deflate", 6, workers, large_file_size=large_file_size)
+    archiver.write_archive(sink, [(path, os.path.basename(path), stat)])
+    elapsed = time.perf_counter() - started
+    return elapsed, cpu_seconds() - cpu, read_chars() - chars, sink.size
+
+
+def run(path, workers):
+    size = os.stat(path).st_size
+    allocated = os.stat(path).st_blocks * 512
+    print(f"Файл: {size / 2 ** 30:.1f} ГБ, занято на диске {allocated / 2 ** 30:.2f} ГБ, процессов {workers}")
+    print(f"{'чтение':>16} {'сек':>8} {'ЦП, с':>8} {'ЦП с/ГБ':>8} {'прочитано, МБ':>14} {'архив, МБ':>10}")
+    # 0 отключает LargeFileReader, 1 включает его для любого файла
+    for name, large_file_size in (("open()", 0), ("LargeFileReader", 1)):
+        elapsed, cpu, chars, archive_size = measure(path, large_file_size, workers)
+        print(f"{name:>16} {elapsed:>8.2f} {cpu:>8.2f} {cpu / (size / 2 ** 30):>8.2f} "
+              f"{chars / 2 ** 20:>14.0f} {archive_size / 2 ** 20:>10.1f}")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"Пиковая память процесса: {peak / 1024:.0f} МБ")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-gb", type=int, default=4)
+    parser.add_argument("--data-percent", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--file", help="Упаковать существующий файл вместо сгенерированного")
+    args = parser.parse_args()
+    workers = args.workers or os.cpu_count() or 1
+
+    if args.file:
+        run(args.file, workers)
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "disk.img")
+        make_sparse_file(path, args.size_gb, args.data_percent)
+        run(path, workers)
+
+
+if __name__ == "__main__":
+    main()
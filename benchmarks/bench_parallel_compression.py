@@ -0,0 +1,67 @@
+"""Скорость многоядерного сжатия архива в зависимости от числа процессов.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_parallel_compression --size-mb 256
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from backupZ.archive.parallel_zip_archiver import ParallelZipArchiver
+from backupZ.archive.stream_archiver import walk_files
+
+
+class CountingSink:
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+        return len(data)
+
+
+def make_dataset(directory, size_mb):
+    """Текстоподобные данные: сжимаются примерно в 3-4 раза, как логи и дампы."""
+    words = [os.urandom(random.randint(2, 8)).hex().encode() for _ in range(5000)]
+    file_size = 16 * 1024 * 1024
+    written = 0
+    index = 0
+    while written < size_mb * 1024 * 1024:
+        with open(os.path.join(directory, f"file{index:04}.log"), "wb") as file:
+            data = b" ".join(random.choice(words) for _ in range(file_size // 10))[:file_size]
+            file.write(data)
+            written += len(data)
+        index += 1
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--level", type=int, default=6)
+    args = parser.parse_args()
+
+    cpu_count = os.cpu_count() or 1
+    workers_list = sorted({1, 2, 4, 8, 16, cpu_count} & set(range(1, cpu_count + 1)))
+
+    with tempfile.TemporaryDirectory() as directory:
+        total = make_dataset(directory, args.size_mb)
+        files = list(walk_files(directory))
+        print(f"Данные: {total / 2 ** 20:.0f} МБ, файлов {len(files)}, ядер {cpu_count}")
+        print(f"{'процессов':>10} {'сек':>8} {'МБ/с':>8} {'ускорение':>10} {'сжатие':>8}")
+
+        baseline = None
+        for workers in workers_list:
+            sink = CountingSink()
+            started = time.perf_counter()
+            ParallelZipArchiver("deflate", args.level, workers).write_archive(sink, files)
+            elapsed = time.perf_counter() - started
+            baseline = baseline or elapsed
+            print(f"{workers:>10} {elapsed:>8.2f} {total / 2 ** 20 / elapsed:>8.1f} "
+                  f"{baseline / elapsed:>9.2f}x {total / sink.size:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Скорость обхода Dir: os.walk + stat против ParallelScanner с разным числом потоков.
+
+На локальном SSD выигрыш небольшой, основной эффект - на сетевых томах
+(NFS, SMB), где каждый stat ждёт ответа сервера. Запуск из корня репозитория:
+    python -m benchmarks.bench_scanner --files 200000
+    python -m benchmarks.bench_scanner --dir /mnt/nfs/data
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from backupZ.scan.parallel_scanner import ParallelScanner
+
+
+def make_tree(directory, files, per_dir=100):
+    for index in range(files):
+        subdir = os.path.join(directory, f"d{index // (per_dir * per_dir):03}", f"d{index // per_dir % per_dir:03}")
+        if index % per_dir == 0:
+            os.makedirs(subdir, exist_ok=True)
+        with open(os.path.join(subdir, f"f{index:07}"), "wb") as file:
+            file.write(b"x" * (index % 512))
+
+
+def walk_with_stat(directory):
+    count = 0
+    for root, _, files in os.walk(directory):
+        for file in files:
+            os.stat(os.path.join(root, file))
+            count += 1
+    return count
+
+
+def measure(function):
+    started = time.perf_counter()
+    count = function()
+    return time.perf_counter() - started, count
+
+
+def run(directory):
+    elapsed, count = measure(lambda: walk_with_stat(directory))
+    print(f"{'os.walk':>12} {elapsed:>8.2f} {count / elapsed:>12.0f}")
+    for workers in (1, 4, 8, 16, 32):
+        elapsed, count = measure(lambda: sum(1 for _ in ParallelScanner(directory, workers=workers).scan()))
+        print(f"{f'{workers} потоков':>12} {elapsed:>8.2f} {count / elapsed:>12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=200000)
+    parser.add_argument("--dir", help="Обойти существующую папку вместо сгенерированной")
+    args = parser.parse_args()
+
+    print(f"{'обход':>12} {'сек':>8} {'файлов/с':>12}")
+    if args.dir:
+        run(args.dir)
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        make_tree(directory, args.files)
+        run(directory)
+
+
+if __name__ == "__main__":
+    main()
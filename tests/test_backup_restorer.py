@@ -0,0 +1,170 @@
+import io
+import os
+import re
+import struct
+import tempfile
+import threading
+import unittest
+import urllib.request
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backupZ.restore.archive_index import ArchiveIndex
+from backupZ.restore.backup_restorer import BackupRestorer
+from backupZ.storages.backup_uploader import BackupUploader
+
+ARCHIVE = "backup.zip"
+RANGE_SIZE = 64 * 1024
+
+
+class RangeServer:
+    """Отдаёт файлы из памяти с поддержкой Range; ignore_range - отвечать на диапазон всем файлом (200)."""
+
+    def __init__(self, files, ignore_range=False):
+        self.files = files
+        self.ignore_range = ignore_range
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                data = server.files[self.path.lstrip("/")]
+                match = re.fullmatch(r"bytes=(\d+)-(\d+)", self.headers.get("Range", ""))
+                server.requests.append((self.path.lstrip("/"), self.headers.get("Range")))
+                if match and not server.ignore_range:
+                    start, end = int(match.group(1)), int(match.group(2))
+                    self.send_response(206)
+                    data = data[start:end + 1]
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class HttpStorage:
+    """Хранилище с теми же download_stream/download_range, что у загрузчиков, поверх RangeServer."""
+
+    def __init__(self, url):
+        self._url = url
+
+    def download_stream(self, file_name, remote_path, fileobj):
+        with urllib.request.urlopen(f"{self._url}/{file_name}") as response:
+            fileobj.write(response.read())
+
+    def download_range(self, file_name, remote_path, offset, length):
+        return BackupUploader._read_http_range(f"{self._url}/{file_name}", {}, offset, length)
+
+
+def build_archive(files):
+    """zip-архив и записи индекса, как их составляет архиватор."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, (data, method) in files.items():
+            info = zipfile.ZipInfo(name, date_time=(2024, 1, 2, 3, 4, 6))
+            info.compress_type = method
+            info.external_attr = 0o100640 << 16
+            archive.writestr(info, data)
+    data = buffer.getvalue()
+
+    entries = []
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        for info in archive.infolist():
+            name_length, extra_length = struct.unpack("<HH", data[info.header_offset + 26:info.header_offset + 30])
+            entries.append({
+                "name": info.filename,
+                "data_offset": info.header_offset + 30 + name_length + extra_length,
+                "compressed_size": info.compress_size,
+                "size": info.file_size,
+                "crc": info.CRC,
+                "method": info.compress_type,
+                "mode": info.external_attr >> 16,
+                "mtime": 1700000000
+            })
+    return data, entries
+
+
+class BackupRestorerTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.target = tmp.name
+        self.files = {
+            "big/image.raw": (os.urandom(300 * 1024) + bytes(1024 * 1024) + os.urandom(5000), zipfile.ZIP_DEFLATED),
+            "docs/a.txt": (b"alpha\n" * 1000, zipfile.ZIP_DEFLATED),
+            "docs/b.bin": (os.urandom(20000), zipfile.ZIP_STORED),
+            "docs/empty": (b"", zipfile.ZIP_STORED),
+        }
+        self.archive, entries = build_archive(self.files)
+        self.entries = entries
+
+    def _serve(self, volume_size=0, ignore_range=False):
+        index = ArchiveIndex(ARCHIVE, self.entries, len(self.archive), volume_size)
+        files = {index.index_name(ARCHIVE): index.to_json().encode()}
+        if volume_size:
+            for number, offset in enumerate(range(0, len(self.archive), volume_size), 1):
+                files[f"{ARCHIVE}.{number:03}"] = self.archive[offset:offset + volume_size]
+        else:
+            files[ARCHIVE] = self.archive
+        server = RangeServer(files, ignore_range)
+        self.addCleanup(server.close)
+        return server
+
+    def _restorer(self, server):
+        return BackupRestorer(HttpStorage(server.url), "", workers=3, range_size=RANGE_SIZE)
+
+    def _assert_restored(self, names):
+        for name in names:
+            with open(os.path.join(self.target, name), "rb") as file:
+                self.assertEqual(file.read(), self.files[name][0], name)
+            self.assertEqual(os.stat(os.path.join(self.target, name)).st_mtime, 1700000000)
+
+    def test_full_restore_from_volumes(self):
+        server = self._serve(volume_size=100 * 1024)
+        self.assertEqual(self._restorer(server).restore(ARCHIVE, self.target), len(self.files))
+        self._assert_restored(self.files)
+
+        ranges = [(name, value) for name, value in server.requests if value]
+        self.assertEqual(len(ranges), len(server.requests) - 1)  # всё, кроме индекса, читается диапазонами
+        # Большой файл пересекает границы томов: его куски читаются из нескольких томов
+        self.assertGreater(len({name for name, _ in ranges}), 1)
+        for _, value in ranges:
+            start, end = map(int, value[len("bytes="):].split("-"))
+            self.assertLessEqual(end - start + 1, RANGE_SIZE)
+
+    def test_selected_file_reads_only_its_range(self):
+        server = self._serve()
+        self.assertEqual(self._restorer(server).restore(ARCHIVE, self.target, ["docs/b.bin"]), 1)
+        self._assert_restored(["docs/b.bin"])
+        self.assertFalse(os.path.exists(os.path.join(self.target, "big")))
+
+        entry = next(entry for entry in self.entries if entry["name"] == "docs/b.bin")
+        start = entry["data_offset"]
+        self.assertEqual(server.requests[1:], [(ARCHIVE, f"bytes={start}-{start + entry['compressed_size'] - 1}")])
+
+    def test_server_without_range_support(self):
+        server = self._serve(ignore_range=True)
+        self._restorer(server).restore(ARCHIVE, self.target, ["docs", "big/image.raw"])
+        self._assert_restored(self.files)
+
+    def test_missing_path(self):
+        server = self._serve()
+        with self.assertRaises(FileNotFoundError):
+            self._restorer(server).restore(ARCHIVE, self.target, ["nothing"])
+
+
+if __name__ == "__main__":
+    unittest.main()
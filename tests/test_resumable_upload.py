@@ -0,0 +1,186 @@
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backupZ.storages.resumable_upload import ResumableUpload, ResumableUploadError
+
+CHUNK_SIZE = ResumableUpload.CHUNK_GRANULARITY
+
+
+class DriveStub:
+    """Сервер resumable upload: первый кусок принимает частично, на втором рвёт соединение."""
+
+    def __init__(self, partial=100000, drop_on_put=2, fail_from_put=None):
+        self.partial = partial
+        self.drop_on_put = drop_on_put
+        self.fail_from_put = fail_from_put
+        self.data = bytearray()
+        self.sessions = 0
+        self.puts = 0
+        self.ranges = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers["Content-Length"]))
+                stub.sessions += 1
+                stub.data.clear()
+                self._reply(200, {"Location": f"/session/{stub.sessions}"})
+
+            def do_PUT(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                stub.ranges.append(self.headers["Content-Range"])
+                match = re.fullmatch(r"bytes (?:(\d+)-(\d+)|\*)/(\d+|\*)", self.headers["Content-Range"])
+                total = None if match.group(3) == "*" else int(match.group(3))
+                if body:
+                    stub.puts += 1
+                    if stub.puts == stub.drop_on_put:
+                        # Данные не приняты, ответа нет
+                        self.close_connection = True
+                        return
+                    if stub.fail_from_put and stub.puts >= stub.fail_from_put:
+                        self._reply(503)
+                        return
+                    assert int(match.group(1)) == len(stub.data), "кусок отправлен не с подтверждённого байта"
+                    if stub.puts == 1:
+                        body = body[:stub.partial]
+                    stub.data += body
+                if total is not None and len(stub.data) == total:
+                    self._reply(201, body=json.dumps({"id": "file-id", "size": str(total)}).encode())
+                elif stub.data:
+                    self._reply(308, {"Range": f"bytes=0-{len(stub.data) - 1}"})
+                else:
+                    self._reply(308)
+
+            def _reply(self, status, headers=None, body=b""):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/upload"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class ResumableUploadTest(unittest.TestCase):
+    def setUp(self):
+        self.stub = DriveStub()
+        self.addCleanup(self.stub.close)
+        self.payload = os.urandom(3 * CHUNK_SIZE + 12345)
+
+    def _upload(self, state_dir=None, max_retries=8):
+        return ResumableUpload(self.stub.url, lambda: {}, CHUNK_SIZE, state_dir, max_retries=max_retries, backoff=0)
+
+    def _write(self, directory):
+        path = os.path.join(directory, "001")
+        os.makedirs(directory)
+        with open(path, "wb") as file:
+            file.write(self.payload)
+        return path
+
+    def test_stream_resends_unconfirmed_bytes(self):
+        upload = self._upload()
+        try:
+            file = upload.upload_stream(io.BytesIO(self.payload), {"name": "backup.zip"})
+        finally:
+            upload.close()
+
+        self.assertEqual(file["id"], "file-id")
+        self.assertEqual(bytes(self.stub.data), self.payload)
+        self.assertEqual(self.stub.sessions, 1)
+        self.assertEqual(upload.retries, 1)
+        # Пока поток не дочитан, размер неизвестен; последний кусок сообщает его
+        self.assertTrue(self.stub.ranges[0].endswith("/*"))
+        self.assertTrue(self.stub.ranges[-1].endswith(f"/{len(self.payload)}"))
+
+    def test_file_resends_unconfirmed_bytes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = self._write(os.path.join(tmp, "spool"))
+            upload = self._upload(os.path.join(tmp, "state"))
+            try:
+                file = upload.upload_file(path, {"name": "backup.zip.001", "parents": ["folder"]})
+            finally:
+                upload.close()
+            self.assertEqual(os.listdir(os.path.join(tmp, "state")), [])
+
+        self.assertEqual(file["id"], "file-id")
+        self.assertEqual(bytes(self.stub.data), self.payload)
+        self.assertEqual(upload.retries, 1)
+
+    def test_file_resumes_after_restart_from_new_spool_dir(self):
+        metadata = {"name": "backup.zip.001", "parents": ["folder"]}
+        with tempfile.TemporaryDirectory() as tmp:
+            state_dir = os.path.join(tmp, "state")
+            upload = self._upload(state_dir, max_retries=0)
+            with self.assertRaises(ResumableUploadError):
+                upload.upload_file(self._write(os.path.join(tmp, "spool-1")), metadata)
+            upload.close()
+
+            # Тот же том после рестарта лежит в другой временной папке
+            upload = self._upload(state_dir)
+            try:
+                file = upload.upload_file(self._write(os.path.join(tmp, "spool-2")), metadata)
+            finally:
+                upload.close()
+
+        self.assertEqual(file["id"], "file-id")
+        self.assertEqual(bytes(self.stub.data), self.payload)
+        self.assertEqual(self.stub.sessions, 1)
+        self.assertEqual(self.stub.ranges[2], f"bytes */{len(self.payload)}")
+
+    def test_restart_with_changed_file_starts_over(self):
+        metadata = {"name": "backup.zip.001", "parents": ["folder"]}
+        with tempfile.TemporaryDirectory() as tmp:
+            state_dir = os.path.join(tmp, "state")
+            upload = self._upload(state_dir, max_retries=0)
+            with self.assertRaises(ResumableUploadError):
+                upload.upload_file(self._write(os.path.join(tmp, "spool-1")), metadata)
+            upload.close()
+
+            # Отпечаток (начало и конец файла) тот же, но принятая сервером часть изменилась
+            payload = bytearray(self.payload)
+            payload[80000] ^= 0xFF
+            self.payload = bytes(payload)
+            upload = self._upload(state_dir)
+            try:
+                file = upload.upload_file(self._write(os.path.join(tmp, "spool-2")), metadata)
+            finally:
+                upload.close()
+
+        self.assertEqual(file["id"], "file-id")
+        self.assertEqual(bytes(self.stub.data), self.payload)
+        self.assertEqual(self.stub.sessions, 2)
+
+    def test_failing_chunk_gives_up_after_max_retries(self):
+        self.stub.fail_from_put = 3
+        upload = self._upload(max_retries=3)
+        try:
+            with self.assertRaises(ResumableUploadError):
+                upload.upload_stream(io.BytesIO(self.payload), {"name": "backup.zip"})
+        finally:
+            upload.close()
+
+        # Обрыв на втором куске, затем 503 на каждом повторе: ответы 308 на запрос статуса счётчик не сбрасывают
+        self.assertEqual(upload.retries, 4)
+        self.assertEqual(self.stub.puts, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()